@@ -105,6 +105,7 @@ def build_console_version(logger):
             '--clean',
             '--onefile', 
             '--name=ExcelCode-Console',
+            '--exclude-module=tkinter',  # Console 版本不需要 Tk，縮小執行檔並加快啟動
             'console.py'
         ])
         
@@ -1,24 +1,121 @@
 # code_generator.py - 更新版本
 import re
-import pandas as pd
-import numpy as np
 import os
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from tkinter.scrolledtext import ScrolledText
-from utils import format_cell_value
+from utils import format_cell_value, excel_notation_to_index
+from render_cache import hash_frame_region
+from table_ops import (numeric_matrix, infer_ctype, find_overflow, ctype_limits, cumulative_sums, format_values,
+                       alias_tables, csr_structure, DEFAULT_SPARSE_DENSITY, LAYOUT_AXES, layout_tensor,
+                       reorder_axes, nested_initializer, parse_fixed_scale, fixed_point, numeric_array)
+
+class GenerationContext:
+    """
+    單次程式碼生成的內容: 資料、範圍、讀取方向與選項
+
+    每次生成使用獨立的 context，生成過程中的暫存資料也保存在這裡，
+    不同執行緒的生成不會互相影響。
+
+    Args:
+        excel_files (list): Excel 檔案路徑列表
+        dfs: 檔案路徑對應資料框的對應
+        selected_ranges (list): 範圍資訊字典列表
+        selected_range (dict): 第一個範圍 (向下相容)，未提供時使用 selected_ranges[0]
+        named_ranges (dict): 命名範圍 {名稱: "A1:B2"}
+        template_direction (str): 讀取方向 "row"、"column"，None 表示依樣板中的方向標記
+        log_function (callable): 記錄日誌的函數
+        error_function (callable): 回報錯誤的函數，未提供時只記錄日誌
+        render_cache (RenderCache): 渲染快取，None 表示停用
+        cancel_token (CancelToken): 取消標記，生成過程中定期檢查並回報進度
+        stream (bool): 串流模式，參數區塊依檔案順序處理，每個檔案只讀取一次
+    """
+
+    def __init__(self, excel_files, dfs, selected_ranges=None, selected_range=None, named_ranges=None,
+                 template_direction=None, log_function=None, error_function=None, render_cache=None,
+                 cancel_token=None, stream=False):
+        self.excel_files = list(excel_files or [])
+        self.dfs = dfs
+        self.selected_ranges = list(selected_ranges or [])
+        if selected_range is None and self.selected_ranges:
+            selected_range = self.selected_ranges[0]
+        self.selected_range = selected_range
+        self.named_ranges = dict(named_ranges or {})
+        self.template_direction = template_direction
+        self.log_function = log_function
+        self.error_function = error_function
+        self.render_cache = render_cache
+        self.cancel_token = cancel_token
+        self.stream = stream
+        self.range_hash_memo = {}  # 單次生成內的範圍雜湊暫存
+        self.numeric_memo = {}  # 單次生成內的範圍數值矩陣暫存
+        self.table_memo = {}  # 單次生成內的衍生表格 (alias 表等) 暫存
+        self.fixed_point_errors = {}  # 循環中定點數轉換的最大捨入誤差 (依比例)
+        self.rows_rendered = 0
+
+    @classmethod
+    def from_host(cls, host, excel_files, dfs, selected_ranges, selected_range=None, render_cache=None,
+                  cancel_token=None):
+        """以宿主 (GUI) 目前的命名範圍與讀取方向建立快照"""
+        return cls(
+            excel_files,
+            dfs,
+            selected_ranges,
+            selected_range,
+            named_ranges=getattr(host, 'named_ranges', None),
+            template_direction=getattr(host, 'template_direction', None),
+            log_function=getattr(host, 'log', None),
+            error_function=getattr(host, 'show_error', None),
+            render_cache=render_cache,
+            cancel_token=cancel_token
+        )
+
+    def log(self, message):
+        if self.log_function:
+            self.log_function(message)
+
+    def report_error(self, message):
+        """
+        回報生成錯誤，由宿主決定處理方式
+        (GUI 顯示錯誤對話框，程式庫模式引發 GenerationError)
+        """
+        if self.error_function:
+            self.error_function(message)
+        else:
+            self.log(f"錯誤: {message}")
+
+    def release_file(self, file_path):
+        """丟棄檔案的暫存資料 (串流模式下檔案資料釋放時呼叫)"""
+        for memo in (self.range_hash_memo, self.numeric_memo, self.table_memo):
+            for key in [key for key in memo if isinstance(key, tuple) and file_path in key]:
+                del memo[key]
+        # 累計值只保留最近一個範圍，範圍資料框屬於哪個檔案無從得知，一律丟棄
+        self.numeric_memo.pop("cumulative", None)
+
+    def check_cancelled(self):
+        """生成已取消時引發 TaskCancelled"""
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    def row_rendered(self):
+        """每生成一行資料呼叫一次: 檢查是否已取消並定期回報進度"""
+        self.rows_rendered += 1
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+            if self.rows_rendered % 500 == 0:
+                self.cancel_token.report(f"已生成 {self.rows_rendered} 行資料...")
 
-import threading
 
 class CodeGenerator:
-    def __init__(self, gui_instance):
-        self.gui = gui_instance  # 保存對主GUI實例的引用
+    def __init__(self, gui_instance=None):
+        self.gui = gui_instance  # 保存對主GUI實例的引用 (僅用於 generate_code 與樣板驗證)，程式庫模式為 None
+        self.render_cache = None  # generate_code 使用的內容定址渲染快取 (RenderCache)，None 表示停用
     
-    def validate_template(self, template, selected_ranges=None):
+    def validate_template(self, template, selected_ranges=None, log_function=None):
         """
         Validate template syntax and check if all placeholders are supported
         驗證模板語法並檢查所有佔位符是否被支援
+
+        log_function 未提供時使用 GUI 的日誌，沒有 GUI 時不記錄
         """
+        log = log_function or getattr(self.gui, 'log', None) or (lambda message: None)
         unsupported_tags = []
         # Check for unsupported template tags
         # 檢查不支援的模板標記
@@ -31,7 +128,8 @@ class CodeGenerator:
             'FILE_NAME', 'FILE_INDEX', 'FILE_COUNT', 'ROW_COUNT', 'COL_COUNT',
             'FILES_LOOP_START', 'FILES_LOOP_END', 'RANGES_LOOP_START', 'RANGES_LOOP_END',
             'RANGE_LOOP_START', 'RANGE_LOOP_END', 'RANGE_DATA_LOOP_START', 'RANGE_DATA_LOOP_END',
-            'MAX_ROW_COUNT', 'MAX_COL_COUNT', 'RANGE_COUNT'
+            'MAX_ROW_COUNT', 'MAX_COL_COUNT', 'RANGE_COUNT', 'FILES_CTYPE', 'ROW_TOTAL', 'COL_TOTAL',
+            'SOA_START', 'SOA_END', 'SOA_COL'
         ]
         
         for match in matches:
@@ -57,6 +155,18 @@ class CodeGenerator:
             # 檢查編號範圍標記
             elif re.match(r'RANGE:\d+_', match):
                 is_supported = True
+            # Check fixed-point loop tags like ALL_COLUMNS_FIXED:16
+            # 檢查定點數標記
+            elif re.match(r'ALL_(COLUMNS|ROWS)_FIXED:\w+$', match):
+                is_supported = True
+            # Check layout tags like LAYOUT_DATA:COL,FILE,RANGE,ROW
+            # 檢查資料排列標記
+            elif re.match(r'LAYOUT_(DATA|DEFINES):[\w,]+$', match):
+                is_supported = True
+            # Check dedup block tags like DEDUP_START:name, DEDUP_NAME_LIST:name
+            # 檢查去除重複區塊標記
+            elif re.match(r'DEDUP_(START|END|NAME_LIST|INDEX_LIST|COUNT):\w+$', match) or match == 'DEDUP_NAME':
+                is_supported = True
             
             if not is_supported:
                 unsupported_tags.append(match)
@@ -64,376 +174,12 @@ class CodeGenerator:
         # Log validation results
         # 記錄驗證結果
         if unsupported_tags:
-            self.gui.log(f"發現不支援的模板標記: {', '.join(unsupported_tags)}")
+            log(f"發現不支援的模板標記: {', '.join(unsupported_tags)}")
             return False, unsupported_tags
         else:
-            self.gui.log("模板語法驗證通過")
+            log("模板語法驗證通過")
             return True, []
     
-    def load_template_from_file(self, file_path):
-        """從檔案載入樣板內容"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                template_content = f.read()
-            return template_content
-        except Exception as e:
-            messagebox.showerror("錯誤", f"無法讀取樣板檔案: {str(e)}")
-            return None
-
-    def set_template(self):
-        """設置自訂程式碼樣板，並提供方向選擇"""
-        # 建立樣板設定窗口
-        template_dialog = tk.Toplevel(self.gui.root)
-        template_dialog.title("設定程式碼樣板")
-        template_dialog.geometry("700x700")  # 增加高度以容納更多說明
-        template_dialog.grab_set()  # 模态窗口
-        template_dialog.minsize(700, 700)  # 設定最小尺寸
-        
-        # 样板说明
-        instruction_frame = ttk.Frame(template_dialog)
-        instruction_frame.pack(fill="x", padx=10, pady=5)
-        
-        ttk.Label(instruction_frame, text="程式碼樣板說明：", font=("Arial", 10, "bold")).pack(anchor="w")
-        instruction_text = """
-在樣板中，您可以使用以下標記：
-
-基本標記:
-- {{LOOP_START}} - 資料迴圈開始 (使用第一個選擇的範圍)
-- {{LOOP_END}} - 資料迴圈結束
-- {{VALUE}} - 當前儲存格值
-- {{ROW_INDEX}} - 當前資料列索引
-- {{COL_INDEX}} - 當前資料行索引
-- {{ALL_COLUMNS}} - 當前行的所有欄位值
-- {{ALL_ROWS}} - 當前列的所有行值 (直向讀取模式)
-
-方向控制標記:
-- {{DIRECTION:ROW}} - 指定為橫向讀取模式 (預設)
-- {{DIRECTION:COLUMN}} - 指定為直向讀取模式
-
-多範圍精確標記:
-- {{RANGE[範圍名稱]_LOOP_START}} - 指定範圍的資料迴圈開始
-- {{RANGE[範圍名稱]_LOOP_END}} - 指定範圍的資料迴圈結束
-- {{RANGE[範圍名稱]_ROW_COUNT}} - 指定範圍的資料列數
-- {{RANGE[範圍名稱]_COL_COUNT}} - 指定範圍的資料行數
-- {{RANGE[範圍名稱]_VALUE[行,列]}} - 指定範圍的特定儲存格值
-
-檔案相關標記:
-- {{FILE_NAME}} - 當前處理的檔案名稱
-- {{FILE_INDEX}} - 當前檔案索引
-- {{FILE_COUNT}} - 總檔案數量
-
-範例: 
-{{RANGE[左上]_VALUE[0,0]}} - 讀取名為"左上"的範圍中第一列第一行的值
-{{RANGE[權重表]_LOOP_START}} - 開始迴圈處理名為"權重表"的範圍
-"""
-            
-        instruction_box = ScrolledText(instruction_frame, height=15, font=("Courier New", 9))
-        instruction_box.pack(fill="x", pady=5)
-        instruction_box.insert("1.0", instruction_text)
-        instruction_box.config(state="disabled")
-        
-        # 讀取方向選擇 (新增)
-        direction_frame = ttk.LabelFrame(template_dialog, text="資料讀取方向")
-        direction_frame.pack(fill="x", padx=10, pady=5)
-        
-        self.direction_var = tk.StringVar(value="row")  # 預設為橫向讀取
-        
-        ttk.Radiobutton(
-            direction_frame, 
-            text="橫向讀取 (Row by Row)",
-            variable=self.direction_var,
-            value="row"
-        ).pack(side="left", padx=20, pady=5)
-        
-        ttk.Radiobutton(
-            direction_frame, 
-            text="直向讀取 (Column by Column)",
-            variable=self.direction_var,
-            value="column"
-        ).pack(side="left", padx=20, pady=5)
-        
-        # 範圍定義區域
-        range_frame = ttk.LabelFrame(template_dialog, text="範圍定義")
-        range_frame.pack(fill="x", padx=10, pady=5)
-        
-        range_list_frame = ttk.Frame(range_frame)
-        range_list_frame.pack(fill="x", padx=5, pady=5)
-        
-        # 顯示已定義的範圍
-        ttk.Label(range_list_frame, text="已定義的範圍:").pack(side="left", padx=5)
-        
-        range_names = tk.StringVar()
-        range_entry = ttk.Entry(range_list_frame, textvariable=range_names, width=40, state="readonly")
-        range_entry.pack(side="left", padx=5, fill="x", expand=True)
-        
-        # 初始化顯示已有的命名範圍
-        if hasattr(self.gui, 'named_ranges'):
-            range_names.set(", ".join(self.gui.named_ranges.keys()))
-        
-        # 範圍定義按鈕
-        def define_range():
-            # 建立範圍定義對話框
-            range_dialog = tk.Toplevel(template_dialog)
-            range_dialog.title("定義範圍")
-            range_dialog.geometry("400x200")
-            range_dialog.grab_set()
-            
-            ttk.Label(range_dialog, text="範圍名稱:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-            name_var = tk.StringVar()
-            name_entry = ttk.Entry(range_dialog, textvariable=name_var, width=20)
-            name_entry.grid(row=0, column=1, padx=5, pady=5, sticky="we")
-            
-            ttk.Label(range_dialog, text="Excel 範圍 (例如: A1:G10):").grid(row=1, column=0, padx=5, pady=5, sticky="w")
-            range_var = tk.StringVar()
-            range_entry = ttk.Entry(range_dialog, textvariable=range_var, width=20)
-            range_entry.grid(row=1, column=1, padx=5, pady=5, sticky="we")
-            
-            # 定義範圍字典 (如果尚未存在)
-            if not hasattr(self.gui, 'named_ranges'):
-                self.gui.named_ranges = {}
-            
-            def save_range():
-                name = name_var.get().strip()
-                range_str = range_var.get().strip()
-                
-                if not name:
-                    messagebox.showerror("錯誤", "請輸入範圍名稱", parent=range_dialog)
-                    return
-                    
-                if not range_str:
-                    messagebox.showerror("錯誤", "請輸入有效的Excel範圍", parent=range_dialog)
-                    return
-                    
-                try:
-                    # 驗證範圍格式
-                    if ":" in range_str:
-                        start, end = range_str.split(":")
-                        # 這裡可以加入更多驗證邏輯
-                    else:
-                        messagebox.showerror("錯誤", "範圍格式不正確，請使用如 A1:G10 的格式", parent=range_dialog)
-                        return
-                    
-                    # 存儲範圍定義
-                    self.gui.named_ranges[name] = range_str
-                    
-                    # 更新範圍列表顯示
-                    range_names.set(", ".join(self.gui.named_ranges.keys()))
-                    
-                    # 關閉對話框
-                    range_dialog.destroy()
-                    
-                except Exception as e:
-                    messagebox.showerror("錯誤", f"處理範圍時出錯: {str(e)}", parent=range_dialog)
-            
-            # 確認和取消按鈕
-            btn_frame = ttk.Frame(range_dialog)
-            btn_frame.grid(row=2, column=0, columnspan=2, pady=10)
-            
-            ttk.Button(btn_frame, text="儲存範圍", command=save_range).pack(side="left", padx=5)
-            ttk.Button(btn_frame, text="取消", command=range_dialog.destroy).pack(side="left", padx=5)
-            
-            # 設置初始焦點
-            name_entry.focus_set()
-        
-        # 刪除範圍功能
-        def delete_range():
-            if not hasattr(self.gui, 'named_ranges') or not self.gui.named_ranges:
-                messagebox.showinfo("提示", "沒有定義的範圍可刪除", parent=template_dialog)
-                return
-                
-            # 建立範圍選擇對話框
-            select_dialog = tk.Toplevel(template_dialog)
-            select_dialog.title("選擇要刪除的範圍")
-            select_dialog.geometry("300x200")
-            select_dialog.grab_set()
-            
-            ttk.Label(select_dialog, text="選擇要刪除的範圍:").pack(padx=5, pady=5, anchor="w")
-            
-            # 建立範圍列表框
-            range_listbox = tk.Listbox(select_dialog)
-            range_listbox.pack(fill="both", expand=True, padx=5, pady=5)
-            
-            # 填充範圍列表
-            for name in self.gui.named_ranges.keys():
-                range_listbox.insert(tk.END, name)
-            
-            def confirm_delete():
-                selected = range_listbox.curselection()
-                if not selected:
-                    messagebox.showinfo("提示", "請選擇要刪除的範圍", parent=select_dialog)
-                    return
-                    
-                # 獲取選擇的範圍名稱
-                selected_idx = selected[0]
-                selected_name = range_listbox.get(selected_idx)
-                
-                # 確認刪除
-                if messagebox.askyesno("確認", f"確定要刪除範圍 '{selected_name}' 嗎?", parent=select_dialog):
-                    # 刪除範圍
-                    del self.gui.named_ranges[selected_name]
-                    
-                    # 更新範圍列表顯示
-                    range_names.set(", ".join(self.gui.named_ranges.keys()))
-                    
-                    # 關閉對話框
-                    select_dialog.destroy()
-            
-            # 確認和取消按鈕
-            btn_frame = ttk.Frame(select_dialog)
-            btn_frame.pack(pady=10)
-            
-            ttk.Button(btn_frame, text="刪除", command=confirm_delete).pack(side="left", padx=5)
-            ttk.Button(btn_frame, text="取消", command=select_dialog.destroy).pack(side="left", padx=5)
-        
-        # 範圍操作按鈕
-        btn_frame = ttk.Frame(range_frame)
-        btn_frame.pack(fill="x", pady=5)
-        
-        ttk.Button(btn_frame, text="定義新範圍", command=define_range).pack(side="left", padx=5)
-        ttk.Button(btn_frame, text="刪除範圍", command=delete_range).pack(side="left", padx=5)
-        
-        # 新增「從檔案載入」按鈕
-        load_frame = ttk.Frame(template_dialog)
-        load_frame.pack(fill="x", padx=10, pady=5)
-        
-        def load_template_file():
-            file_path = filedialog.askopenfilename(
-                title="選擇樣板檔案",
-                filetypes=[("文字檔案", "*.txt"), ("C/C++檔案", "*.c;*.cpp;*.h"), ("所有檔案", "*.*")],
-                parent=template_dialog
-            )
-            if file_path:
-                template_content = self.load_template_from_file(file_path)
-                if template_content:
-                    template_text.delete("1.0", tk.END)
-                    template_text.insert("1.0", template_content)
-                    
-        ttk.Button(load_frame, text="從檔案載入樣板", command=load_template_file).pack(side="left", padx=5)
-        
-        # 样板编辑区域标题
-        ttk.Separator(template_dialog, orient="horizontal").pack(fill="x", padx=10, pady=5)
-        ttk.Label(template_dialog, text="請在下方編輯程式碼樣板：", font=("Arial", 10, "bold")).pack(anchor="w", padx=10, pady=5)
-        
-        # 样板编辑区域
-        template_frame = ttk.Frame(template_dialog)
-        template_frame.pack(fill="both", expand=True, padx=10, pady=5)
-        
-        template_text = ScrolledText(template_frame, font=("Courier New", 10))
-        template_text.pack(fill="both", expand=True, padx=5, pady=5)
-        
-        # 如果已经有样板，就显示
-        if self.gui.code_template:
-            template_text.insert("1.0", self.gui.code_template)
-        else:
-            # 預設範例樣板 - 添加命名範圍支持和方向控制
-            default_template = """// 資料處理範例 - 支援橫向與直向讀取
-{{DIRECTION:ROW}}  // 設定為橫向讀取模式 (預設，可改為 {{DIRECTION:COLUMN}} 進行直向讀取)
-
-#define LEFT_TOP_ROWS {{RANGE[左上]_ROW_COUNT}}
-#define LEFT_TOP_COLS {{RANGE[左上]_COL_COUNT}}
-
-// 左上角區域數據 - 橫向讀取 (Row by Row)
-unsigned int left_top_area[LEFT_TOP_ROWS][LEFT_TOP_COLS] = {
-{{RANGE[左上]_LOOP_START}}
-    { {{ALL_COLUMNS}} },  // Row {{ROW_INDEX}}
-{{RANGE[左上]_LOOP_END}}
-};
-
-// 特定儲存格值參考
-int first_value = {{RANGE[左上]_VALUE[0,0]}};
-int second_value = {{RANGE[左上]_VALUE[1,1]}};
-
-// 使用 ALL_ROWS 示範直向讀取
-void process_column_data() {
-{{DIRECTION:COLUMN}}  // 切換為直向讀取
-{{RANGE[左上]_LOOP_START}}
-    int column_{{COL_INDEX}}_data[] = { {{ALL_ROWS}} };  // Column {{COL_INDEX}}
-{{RANGE[左上]_LOOP_END}}
-}
-"""
-            template_text.insert("1.0", default_template)
-        
-        # 按鈕區域
-        btn_frame = ttk.Frame(template_dialog)
-        btn_frame.pack(fill="x", padx=10, pady=(10, 20))  # 增加底部間距
-        
-        # 儲存到檔案按鈕
-        def save_template_to_file():
-            template_content = template_text.get("1.0", tk.END).strip()
-            if not template_content:
-                messagebox.showerror("錯誤", "樣板不能為空", parent=template_dialog)
-                return
-                
-            file_path = filedialog.asksaveasfilename(
-                title="儲存樣板至檔案",
-                defaultextension=".txt",
-                filetypes=[("文字檔案", "*.txt"), ("C檔案", "*.c"), ("C++檔案", "*.cpp"), ("所有檔案", "*.*")],
-                parent=template_dialog
-            )
-            
-            if file_path:
-                try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(template_content)
-                    messagebox.showinfo("成功", f"樣板已儲存至 {file_path}", parent=template_dialog)
-                except Exception as e:
-                    messagebox.showerror("錯誤", f"儲存樣板時發生錯誤: {str(e)}", parent=template_dialog)
-        
-        # 确认按钮
-        def confirm_template():
-            template_content = template_text.get("1.0", tk.END).strip()
-            if not template_content:
-                messagebox.showerror("錯誤", "樣板不能為空", parent=template_dialog)
-                return
-            
-            # Add template validation
-            # 加入模板驗證
-            is_valid, unsupported_tags = self.validate_template(template_content)
-            if not is_valid:
-                result = messagebox.askyesno(
-                    "模板驗證警告", 
-                    f"發現不支援的標記: {', '.join(unsupported_tags)}\n\n是否仍要繼續使用此模板？",
-                    parent=template_dialog
-                )
-                if not result:
-                    return
-            
-            # 設定模板内容
-            self.gui.code_template = template_content
-            
-            # 記錄讀取方向設定
-            self.gui.template_direction = self.direction_var.get()
-            self.gui.log(f"已設定模板讀取方向: {self.gui.template_direction}")
-            
-            # 檢查樣板中的方向標記
-            if "{{DIRECTION:ROW}}" in template_content:
-                self.gui.template_direction = "row"
-                self.gui.log("模板中指定橫向讀取模式")
-            elif "{{DIRECTION:COLUMN}}" in template_content:
-                self.gui.template_direction = "column"
-                self.gui.log("模板中指定直向讀取模式")
-            
-            self.gui.template_preview.config(text="已設定自訂樣板")
-            self.gui.generate_button.config(state="normal")
-            template_dialog.destroy()
-        
-        # 儲存至檔案按鈕
-        save_file_btn = ttk.Button(btn_frame, text="儲存至檔案", command=save_template_to_file, width=15)
-        save_file_btn.pack(side="left", padx=5)
-        
-        # 放置明显的确认按钮
-        confirm_btn = ttk.Button(btn_frame, text="確認樣板", command=confirm_template, width=15)
-        confirm_btn.pack(side="right", padx=5)
-        
-        # 取消按钮
-        cancel_btn = ttk.Button(btn_frame, text="取消", command=template_dialog.destroy, width=10)
-        cancel_btn.pack(side="right", padx=5)
-        
-        # 在所有元件都加入後，使視窗自適應內容大小
-        template_dialog.update_idletasks()
-        # 重置視窗大小以適應所有內容
-        template_dialog.geometry("")
-    
     def get_default_template(self, template_name):
         """獲取預設樣板內容"""
         if template_name == "陣列初始化":
@@ -717,7 +463,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         else:
             return ""
 
-    def convert_range_notation_to_indices(self, range_name):
+    def convert_range_notation_to_indices(self, context, range_name):
         """
         將範圍名稱轉換為索引資訊
         
@@ -728,29 +474,29 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             tuple: (start_row, start_col, end_row, end_col) 或 None 如果範圍不存在
         """
         # 檢查範圍是否存在
-        if not hasattr(self.gui, 'named_ranges') or range_name not in self.gui.named_ranges:
-            self.gui.log(f"警告: 未找到命名範圍 '{range_name}'")
+        if range_name not in context.named_ranges:
+            context.log(f"警告: 未找到命名範圍 '{range_name}'")
             return None
         
         # 獲取範圍
-        range_str = self.gui.named_ranges[range_name]
+        range_str = context.named_ranges[range_name]
         
         try:
             # 解析範圍
             start, end = range_str.split(":")
             from utils import excel_notation_to_index
-            start_row, start_col = excel_notation_to_index(start, self.gui)
-            end_row, end_col = excel_notation_to_index(end, self.gui)
+            start_row, start_col = excel_notation_to_index(start)
+            end_row, end_col = excel_notation_to_index(end)
 
-            self.gui.log(f"範圍 {range_name}: 原始輸入 {range_str}")
-            self.gui.log(f"範圍 {range_name}: 轉換後索引 start_row={start_row}, start_col={start_col}, end_row={end_row}, end_col={end_col}")
+            context.log(f"範圍 {range_name}: 原始輸入 {range_str}")
+            context.log(f"範圍 {range_name}: 轉換後索引 start_row={start_row}, start_col={start_col}, end_row={end_row}, end_col={end_col}")
             
             return (start_row, start_col, end_row, end_col)
         except Exception as e:
-            self.gui.log(f"解析範圍 '{range_name}' 時出錯: {str(e)}")
+            context.log(f"解析範圍 '{range_name}' 時出錯: {str(e)}")
             return None
 
-    def process_named_range_value(self, template, dfs, excel_files):
+    def process_named_range_value(self, context, template, dfs, excel_files):
         """處理模板中的命名範圍特定值引用"""
         # 正則表達式匹配所有命名範圍的值引用，例如 {{RANGE[範圍名]_VALUE[0,0]}}
         value_pattern = r'{{RANGE\[([^\]]+)\]_VALUE\[(\d+),(\d+)\]}}'
@@ -762,13 +508,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             placeholder = f"{{{{RANGE[{range_name}]_VALUE[{row_idx},{col_idx}]}}}}"
             
             # 檢查命名範圍是否存在
-            if not hasattr(self.gui, 'named_ranges') or range_name not in self.gui.named_ranges:
+            if range_name not in context.named_ranges:
                 # 範圍未定義，保留原始標記
-                self.gui.log(f"警告: 未找到命名範圍 '{range_name}'")
+                context.log(f"警告: 未找到命名範圍 '{range_name}'")
                 continue
                 
             # 獲取範圍
-            range_indices = self.convert_range_notation_to_indices(range_name)
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
             if not range_indices:
                 continue
             
@@ -781,7 +527,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 
                 # 檢查位置是否在範圍內
                 if target_row > end_row or target_col > end_col:
-                    self.gui.log(f"警告: 位置 [{row_idx},{col_idx}] 超出範圍 '{range_name}' 的界限")
+                    context.log(f"警告: 位置 [{row_idx},{col_idx}] 超出範圍 '{range_name}' 的界限")
                     continue
                 
                 # 使用第一個文件的資料
@@ -794,13 +540,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                     formatted_value = format_cell_value(value)
                     result = result.replace(placeholder, formatted_value)
                 else:
-                    self.gui.log(f"警告: 位置 [{target_row},{target_col}] 超出資料範圍")
+                    context.log(f"警告: 位置 [{target_row},{target_col}] 超出資料範圍")
             except Exception as e:
-                self.gui.log(f"處理命名範圍值時出錯: {str(e)}")
+                context.log(f"處理命名範圍值時出錯: {str(e)}")
         
         return result
 
-    def process_named_range_metadata(self, template):
+    def process_named_range_metadata(self, context, template):
         """
         處理模板中的命名範圍元數據，如行數、列數和範圍全名
         
@@ -820,7 +566,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             placeholder = f"{{{{RANGE[{range_name}]_ROW_COUNT}}}}"
             
             # 檢查命名範圍是否存在
-            range_indices = self.convert_range_notation_to_indices(range_name)
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
             if not range_indices:
                 continue
                 
@@ -833,7 +579,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 # 替換標記
                 result = result.replace(placeholder, str(row_count))
             except Exception as e:
-                self.gui.log(f"處理命名範圍 {range_name} 行數時出錯: {str(e)}")
+                context.log(f"處理命名範圍 {range_name} 行數時出錯: {str(e)}")
         
         # 處理列數
         col_count_pattern = r'{{RANGE\[([^\]]+)\]_COL_COUNT}}'
@@ -843,7 +589,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             placeholder = f"{{{{RANGE[{range_name}]_COL_COUNT}}}}"
             
             # 檢查命名範圍是否存在
-            range_indices = self.convert_range_notation_to_indices(range_name)
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
             if not range_indices:
                 continue
                 
@@ -856,7 +602,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 # 替換標記
                 result = result.replace(placeholder, str(col_count))
             except Exception as e:
-                self.gui.log(f"處理命名範圍 {range_name} 列數時出錯: {str(e)}")
+                context.log(f"處理命名範圍 {range_name} 列數時出錯: {str(e)}")
         
         # 處理範圍全名 (新增功能)
         full_name_pattern = r'{{RANGE\[([^\]]+)\]_FULL_NAME}}'
@@ -866,25 +612,414 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             placeholder = f"{{{{RANGE[{range_name}]_FULL_NAME}}}}"
             
             # 檢查命名範圍是否存在
-            if not hasattr(self.gui, 'named_ranges') or range_name not in self.gui.named_ranges:
-                self.gui.log(f"警告: 未找到命名範圍 '{range_name}'")
+            if range_name not in context.named_ranges:
+                context.log(f"警告: 未找到命名範圍 '{range_name}'")
                 result = result.replace(placeholder, range_name)
                 continue
             
             try:
                 # 獲取實際範圍字串
-                range_str = self.gui.named_ranges[range_name]
+                range_str = context.named_ranges[range_name]
                 full_name = f"{range_name} ({range_str})"
                 
                 # 替換標記
                 result = result.replace(placeholder, full_name)
             except Exception as e:
-                self.gui.log(f"處理命名範圍 {range_name} 全名時出錯: {str(e)}")
+                context.log(f"處理命名範圍 {range_name} 全名時出錯: {str(e)}")
                 result = result.replace(placeholder, range_name)
         
         return result
 
-    def process_named_range_loops(self, template, dfs, excel_files):
+    def get_numeric_region(self, context, file_path, range_indices):
+        """
+        取得檔案中範圍資料的數值矩陣 (同一次生成中重複使用)
+        
+        Returns:
+            tuple: (float64 矩陣, 文字儲存格遮罩)
+        """
+        memo_key = (file_path, tuple(range_indices))
+        if memo_key not in context.numeric_memo:
+            start_row, start_col, end_row, end_col = range_indices
+            region = context.dfs[file_path].iloc[start_row:end_row+1, start_col:end_col+1]
+            context.numeric_memo[memo_key] = numeric_matrix(region)
+        return context.numeric_memo[memo_key]
+
+    def resolve_ctype(self, context, label, excel_files, range_indices_list, declared_type):
+        """
+        推斷範圍資料的 C 型別，或檢查資料是否超出宣告的型別
+        
+        Args:
+            label (str): 用於日誌與錯誤訊息的範圍名稱
+            range_indices_list (list): (start_row, start_col, end_row, end_col) 列表
+            declared_type (str): 宣告的型別，None 表示自動推斷
+            
+        Returns:
+            tuple: (C 型別名稱, 超出宣告型別時的錯誤訊息或 None)
+        """
+        matrices = []
+        text_count = 0
+        for file_path in excel_files:
+            context.check_cancelled()
+            for range_indices in range_indices_list:
+                matrix, text = self.get_numeric_region(context, file_path, range_indices)
+                matrices.append((file_path, range_indices, matrix))
+                text_count += int(text.sum())
+        
+        if text_count:
+            context.log(f"警告: {label} 中有 {text_count} 個非數值儲存格，不列入型別推斷")
+        
+        if declared_type is None:
+            ctype = infer_ctype([matrix for _, _, matrix in matrices])
+            context.log(f"{label} 推斷型別: {ctype}")
+            return ctype, None
+        
+        if ctype_limits(declared_type) is None:
+            context.log(f"警告: 無法檢查 {label} 的型別 {declared_type} (不支援的型別)")
+            return declared_type, None
+        
+        # 檢查每個檔案的資料是否超出宣告的型別
+        for file_path, (start_row, start_col, _, _), matrix in matrices:
+            count, position, value = find_overflow(matrix, declared_type)
+            if count:
+                cell = f"{self.get_column_letter(start_col + position[1])}{start_row + position[0] + 1}"
+                return declared_type, (f"{label} 有 {count} 個數值超出宣告型別 {declared_type}，"
+                                       f"例如 {os.path.basename(file_path)} 的 {cell} = {value:.10g}")
+        return declared_type, None
+
+    def process_ctype_tags(self, context, template, excel_files, selected_ranges):
+        """
+        處理資料型別標記
+        
+        {{RANGE[名稱]_CTYPE}} 與 {{FILES_CTYPE}} (所有選定範圍) 依所有檔案的資料
+        替換為能容納所有數值的最小型別；加上宣告型別 (例如 {{RANGE[名稱]_CTYPE:uint8_t}})
+        時輸出該型別，並在有數值超出型別時回報錯誤。
+        """
+        result = template
+        
+        for range_name, declared_type in set(re.findall(r'{{RANGE\[([^\]]+)\]_CTYPE(?::([\w ]+))?}}', result)):
+            placeholder = f"{{{{RANGE[{range_name}]_CTYPE{':' + declared_type if declared_type else ''}}}}}"
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
+            if not range_indices:
+                continue
+            try:
+                ctype, overflow_error = self.resolve_ctype(context, f"範圍 {range_name}", excel_files,
+                                                           [range_indices], declared_type or None)
+            except Exception as e:
+                context.log(f"處理命名範圍 {range_name} 型別時出錯: {str(e)}")
+                continue
+            if overflow_error:
+                context.report_error(overflow_error)
+            result = result.replace(placeholder, ctype)
+        
+        for declared_type in set(re.findall(r'{{FILES_CTYPE(?::([\w ]+))?}}', result)):
+            placeholder = f"{{{{FILES_CTYPE{':' + declared_type if declared_type else ''}}}}}"
+            if not selected_ranges:
+                context.log("警告: 沒有選定範圍，無法推斷 FILES_CTYPE")
+                continue
+            range_indices_list = [
+                (r['start_row'], r['start_col'], r['end_row'], r['end_col']) for r in selected_ranges
+            ]
+            try:
+                ctype, overflow_error = self.resolve_ctype(context, "選定範圍", excel_files,
+                                                           range_indices_list, declared_type or None)
+            except Exception as e:
+                context.log(f"處理 FILES_CTYPE 時出錯: {str(e)}")
+                continue
+            if overflow_error:
+                context.report_error(overflow_error)
+            result = result.replace(placeholder, ctype)
+        
+        return result
+
+    def replace_block_placeholder(self, text, placeholder, rows):
+        """將標記替換為多行內容，後續各行使用與標記所在行相同的縮排"""
+        position = text.find(placeholder)
+        while position != -1:
+            line_start = text.rfind("\n", 0, position) + 1
+            prefix = text[line_start:position]
+            indent = prefix[:len(prefix) - len(prefix.lstrip())]
+            block = (",\n" + indent).join(rows)
+            text = text[:position] + block + text[position + len(placeholder):]
+            position = text.find(placeholder, position + len(block))
+        return text
+
+    def process_alias_tags(self, context, template, file_path, is_column_mode):
+        """
+        處理 alias 表標記 (O(1) 加權隨機取樣)
+        
+        命名範圍的每一行 (直向讀取時每一列) 是一個權重分布，以整數運算建立 Walker/Vose alias 表:
+        {{RANGE[名稱]_ALIAS_PROB}} / {{RANGE[名稱]_ALIAS_INDEX}} 為每個分布一行的 prob 與 alias 陣列，
+        {{RANGE[名稱]_ALIAS_TOTAL}} 為各分布的總權重 (prob 的比較上限)，
+        {{RANGE[名稱]_ALIAS_SIZE}} 與 {{RANGE[名稱]_ALIAS_COUNT}} 為每個分布的項目數與分布數。
+        """
+        alias_pattern = r'{{RANGE\[([^\]]+)\]_ALIAS_(?:PROB|INDEX|TOTAL|SIZE|COUNT)}}'
+        result = template
+        
+        for range_name in dict.fromkeys(re.findall(alias_pattern, result)):
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
+            if not range_indices:
+                continue
+            
+            memo_key = ("alias", file_path, range_indices, is_column_mode)
+            if memo_key not in context.table_memo:
+                matrix, text = self.get_numeric_region(context, file_path, range_indices)
+                if text.any():
+                    context.report_error(f"範圍 {range_name} 有非數值儲存格，無法建立 alias 表")
+                    continue
+                try:
+                    context.table_memo[memo_key] = alias_tables(matrix.T if is_column_mode else matrix)
+                except ValueError as e:
+                    context.report_error(f"範圍 {range_name} 無法建立 alias 表: {str(e)}")
+                    continue
+                context.log(f"範圍 {range_name} 已建立 alias 表 ({os.path.basename(file_path)})")
+            prob, alias, totals = context.table_memo[memo_key]
+            
+            if (totals == 0).any():
+                context.log(f"警告: 範圍 {range_name} 有總權重為 0 的分布")
+            
+            tag = f"{{{{RANGE[{range_name}]_ALIAS_"
+            result = self.replace_block_placeholder(
+                result, f"{tag}PROB}}}}", ["{ " + ", ".join(format_values(row)) + " }" for row in prob])
+            result = self.replace_block_placeholder(
+                result, f"{tag}INDEX}}}}", ["{ " + ", ".join(format_values(row)) + " }" for row in alias])
+            result = result.replace(f"{tag}TOTAL}}}}", ", ".join(format_values(totals)))
+            result = result.replace(f"{tag}SIZE}}}}", str(prob.shape[1]))
+            result = result.replace(f"{tag}COUNT}}}}", str(prob.shape[0]))
+        
+        return result
+
+    def process_sparse_tags(self, context, template, file_path, is_column_mode):
+        """
+        處理稀疏 (CSR) 格式標記
+        
+        {{RANGE[名稱]_CSR_VALUES}} / {{RANGE[名稱]_CSR_COL_INDEX}} 依行輸出非零值與其欄索引，
+        {{RANGE[名稱]_CSR_ROW_PTR}} 為每行非零值的起始位置 (行數 + 1 個)，{{RANGE[名稱]_NNZ}} 為非零值數量，
+        {{RANGE[名稱]_CSR_DEFINES:前綴}} 輸出密集維度與非零值數量的巨集。直向讀取時以列為行。
+        
+        {{RANGE[名稱]_SPARSE_START}}...{{RANGE[名稱]_SPARSE_END}} 與
+        {{RANGE[名稱]_DENSE_START}}...{{RANGE[名稱]_DENSE_END}} 依非零比例只保留其中一個區塊；
+        SPARSE_START 可指定比例上限，例如 {{RANGE[名稱]_SPARSE_START:0.5}}。
+        """
+        sparse_pattern = r'{{RANGE\[([^\]]+)\]_(?:CSR_\w+|NNZ|SPARSE_START|DENSE_START)'
+        result = template
+        
+        for range_name in dict.fromkeys(re.findall(sparse_pattern, result)):
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
+            if not range_indices:
+                continue
+            
+            start_row, start_col, end_row, end_col = range_indices
+            memo_key = ("csr", file_path, range_indices, is_column_mode)
+            if memo_key not in context.table_memo:
+                matrix, text = self.get_numeric_region(context, file_path, range_indices)
+                raw_values = context.dfs[file_path].iloc[start_row:end_row+1, start_col:end_col+1].to_numpy(dtype=object)
+                if is_column_mode:
+                    matrix, text, raw_values = matrix.T, text.T, raw_values.T
+                row_ptr, rows, cols = csr_structure(matrix, text)
+                
+                # 數值以向量化格式化，文字儲存格保留原文字
+                values = format_values(matrix[rows, cols])
+                for position in text[rows, cols].nonzero()[0]:
+                    values[position] = format_cell_value(raw_values[rows[position], cols[position]])
+                context.table_memo[memo_key] = (matrix.shape, row_ptr, values, [str(col) for col in cols.tolist()])
+            (row_count, col_count), row_ptr, values, col_strs = context.table_memo[memo_key]
+            nnz = len(values)
+            density = nnz / (row_count * col_count) if row_count * col_count else 0.0
+            
+            # 依非零比例選擇 SPARSE 或 DENSE 區塊 (連同標記後的換行一起移除)
+            tag = f"{{{{RANGE[{range_name}]_"
+            threshold_match = re.search(re.escape(tag) + r'SPARSE_START:([\d.]+)}}', result)
+            threshold = float(threshold_match.group(1)) if threshold_match else DEFAULT_SPARSE_DENSITY
+            use_sparse = density <= threshold
+            if "SPARSE_START" in result or "DENSE_START" in result:
+                context.log(f"範圍 {range_name} 非零比例 {density:.1%}，使用{'稀疏' if use_sparse else '密集'}格式")
+            keep, drop = ("SPARSE", "DENSE") if use_sparse else ("DENSE", "SPARSE")
+            result = re.sub(re.escape(tag) + drop + r'_START(?::[\d.]+)?}}.*?' + re.escape(tag) + drop + r'_END}}\n?',
+                            "", result, flags=re.DOTALL)
+            result = re.sub(re.escape(tag) + keep + r'_(?:START(?::[\d.]+)?|END)}}\n?', "", result)
+            
+            if nnz == 0:
+                context.log(f"警告: 範圍 {range_name} 沒有非零值，CSR 陣列以單一 0 填補")
+            
+            # 非零值與欄索引依行分行輸出
+            value_rows = []
+            col_rows = []
+            for row in range(row_count):
+                if row_ptr[row] < row_ptr[row + 1]:
+                    value_rows.append(", ".join(values[row_ptr[row]:row_ptr[row + 1]]))
+                    col_rows.append(", ".join(col_strs[row_ptr[row]:row_ptr[row + 1]]))
+            result = self.replace_block_placeholder(result, f"{tag}CSR_VALUES}}}}", value_rows or ["0"])
+            result = self.replace_block_placeholder(result, f"{tag}CSR_COL_INDEX}}}}", col_rows or ["0"])
+            result = result.replace(f"{tag}CSR_ROW_PTR}}}}", ", ".join(format_values(row_ptr)))
+            result = result.replace(f"{tag}NNZ}}}}", str(nnz))
+            for prefix in dict.fromkeys(re.findall(re.escape(tag) + r'CSR_DEFINES:(\w+)}}', result)):
+                defines = (f"#define {prefix}_ROWS {row_count}\n"
+                           f"#define {prefix}_COLS {col_count}\n"
+                           f"#define {prefix}_NNZ {max(nnz, 1)}")
+                result = result.replace(f"{tag}CSR_DEFINES:{prefix}}}}}", defines)
+        
+        return result
+
+    def build_layout_tensor(self, context, excel_files, selected_ranges):
+        """將所有檔案、所有選定範圍的資料組成 [檔案][範圍][行][欄] 的格式化字串陣列"""
+        if "layout" in context.table_memo:
+            return context.table_memo["layout"]
+        
+        row_count = max(r['end_row'] - r['start_row'] + 1 for r in selected_ranges)
+        col_count = max(r['end_col'] - r['start_col'] + 1 for r in selected_ranges)
+        blocks = {}
+        for file_idx, file_path in enumerate(excel_files):
+            context.check_cancelled()
+            df = context.dfs[file_path]
+            for range_idx, r in enumerate(selected_ranges):
+                range_indices = (r['start_row'], r['start_col'], r['end_row'], r['end_col'])
+                matrix, text = self.get_numeric_region(context, file_path, range_indices)
+                
+                # 數值以向量化格式化，文字儲存格保留原文字
+                block = format_values(matrix)
+                for position in text.ravel().nonzero()[0]:
+                    row, col = divmod(int(position), matrix.shape[1])
+                    block[position] = format_cell_value(df.iat[r['start_row'] + row, r['start_col'] + col])
+                blocks[(file_idx, range_idx)] = (block, matrix.shape)
+        
+        tensor = layout_tensor(blocks, len(excel_files), len(selected_ranges), row_count, col_count)
+        context.table_memo["layout"] = tensor
+        return tensor
+
+    def replace_layout_data(self, context, text, tensor, axes):
+        """替換 {{LAYOUT_DATA:軸順序}} 標記為依該順序排列的巢狀初始化列表"""
+        for order in dict.fromkeys(re.findall(r'{{LAYOUT_DATA:([\w,]+)}}', text)):
+            placeholder = f"{{{{LAYOUT_DATA:{order}}}}}"
+            try:
+                arranged = reorder_axes(tensor, [axis.strip().upper() for axis in order.split(",")], axes)
+            except ValueError as e:
+                context.report_error(f"資料排列標記 {placeholder} 無效: {str(e)}")
+                continue
+            
+            # 巢狀初始化列表沿用標記所在行的縮排
+            position = text.find(placeholder)
+            while position != -1:
+                line_start = text.rfind("\n", 0, position) + 1
+                prefix = text[line_start:position]
+                block = nested_initializer(arranged, prefix[:len(prefix) - len(prefix.lstrip())])
+                text = text[:position] + block + text[position + len(placeholder):]
+                position = text.find(placeholder, position + len(block))
+        return text
+
+    def process_layout_tags(self, context, template, excel_files, selected_ranges):
+        """
+        處理多範圍資料的排列標記
+        
+        {{LAYOUT_DATA:COL,FILE,RANGE,ROW}} 將 [檔案][範圍][行][欄] 資料依指定的軸順序轉置後輸出，
+        {{SOA_START}}...{{SOA_END}} 區塊依每一欄重複 (struct-of-arrays)，區塊中的 {{SOA_COL}} 為欄索引，
+        {{LAYOUT_DATA:...}} 省略 COL 軸並只輸出該欄的資料。
+        {{LAYOUT_DEFINES:前綴}} 輸出各軸大小與每欄陣列的平面索引巨集。較小的範圍以 0 補齊。
+        """
+        if not selected_ranges:
+            context.log("警告: 沒有選定範圍，無法處理資料排列標記")
+            return template
+        
+        tensor = self.build_layout_tensor(context, excel_files, selected_ranges)
+        file_count, range_count, row_count, col_count = tensor.shape
+        result = template
+        
+        # struct-of-arrays: 每一欄輸出一次區塊
+        soa_axes = tuple(axis for axis in LAYOUT_AXES if axis != "COL")
+        for soa_content in re.findall(r'{{SOA_START}}(.*?){{SOA_END}}', result, re.DOTALL):
+            column_blocks = []
+            for col_idx in range(col_count):
+                column_content = soa_content.replace("{{SOA_COL}}", str(col_idx))
+                column_blocks.append(self.replace_layout_data(context, column_content, tensor[..., col_idx], soa_axes))
+            result = result.replace(f"{{{{SOA_START}}}}{soa_content}{{{{SOA_END}}}}", "".join(column_blocks))
+        
+        result = self.replace_layout_data(context, result, tensor, LAYOUT_AXES)
+        
+        for prefix in dict.fromkeys(re.findall(r'{{LAYOUT_DEFINES:(\w+)}}', result)):
+            defines = "\n".join([
+                f"#define {prefix}_FILE_COUNT {file_count}",
+                f"#define {prefix}_RANGE_COUNT {range_count}",
+                f"#define {prefix}_ROW_COUNT {row_count}",
+                f"#define {prefix}_COL_COUNT {col_count}",
+                f"#define {prefix}_SOA_INDEX(file, range, row) "
+                f"((((file) * {prefix}_RANGE_COUNT) + (range)) * {prefix}_ROW_COUNT + (row))",
+            ])
+            result = result.replace(f"{{{{LAYOUT_DEFINES:{prefix}}}}}", defines)
+        
+        context.log(f"資料排列: {file_count} 個檔案 x {range_count} 個範圍 x {row_count} 行 x {col_count} 欄")
+        return result
+
+    def convert_fixed_point(self, context, values, spec, label):
+        """
+        將數值轉為定點整數
+        
+        Returns:
+            tuple: (int64 陣列, 最大捨入誤差, 比例, 小數位元數)，無法轉換時回報錯誤並返回 None
+        """
+        try:
+            scale, frac_bits = parse_fixed_scale(spec)
+            fixed, max_error = fixed_point(values, scale)
+        except ValueError as e:
+            error = f"{label} 無法轉為定點數: {str(e)}"
+        else:
+            return fixed, max_error, scale, frac_bits
+        context.report_error(error)
+        return None
+
+    def process_fixed_tags(self, context, template, file_path, is_column_mode):
+        """
+        處理定點數標記 (無浮點運算器的目標)
+        
+        {{RANGE[名稱]_FIXED:比例}} 將範圍的數值乘以比例後四捨五入，依行 (直向讀取時依列) 輸出整數陣列，
+        比例為小數位元數 (例如 16 表示 2^16) 或 D 加十進位位數 (例如 D4 表示 10^4)。
+        {{RANGE[名稱]_FIXED_DEFINES:前綴:比例}} 輸出比例巨集 (二進位比例另輸出小數位元數) 。
+        """
+        fixed_pattern = r'{{RANGE\[([^\]]+)\]_FIXED(_DEFINES:\w+)?:(\w+)}}'
+        result = template
+        
+        for range_name, defines, spec in dict.fromkeys(re.findall(fixed_pattern, result)):
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
+            if not range_indices:
+                continue
+            
+            memo_key = ("fixed", file_path, range_indices, spec)
+            if memo_key not in context.table_memo:
+                matrix, text = self.get_numeric_region(context, file_path, range_indices)
+                if text.any():
+                    context.report_error(f"範圍 {range_name} 有非數值儲存格，無法轉為定點數")
+                    continue
+                converted = self.convert_fixed_point(context, matrix, spec, f"範圍 {range_name}")
+                if converted is None:
+                    continue
+                context.table_memo[memo_key] = converted
+                context.log(f"範圍 {range_name} 已轉為定點數 (比例 {converted[2]}，"
+                            f"最大捨入誤差 {converted[1]:.6g}，{os.path.basename(file_path)})")
+            fixed, max_error, scale, frac_bits = context.table_memo[memo_key]
+            
+            if defines:
+                prefix = defines[len("_DEFINES:"):]
+                lines = [f"#define {prefix}_SCALE {scale}"]
+                if frac_bits is not None:
+                    lines.append(f"#define {prefix}_FRAC_BITS {frac_bits}")
+                result = result.replace(f"{{{{RANGE[{range_name}]_FIXED{defines}:{spec}}}}}", "\n".join(lines))
+            else:
+                rows = fixed.T if is_column_mode else fixed
+                result = self.replace_block_placeholder(
+                    result, f"{{{{RANGE[{range_name}]_FIXED:{spec}}}}}",
+                    ["{ " + ", ".join(format_values(row)) + " }" for row in rows])
+        
+        return result
+
+    def process_derived_tables(self, context, template, file_path, is_column_mode):
+        """處理由範圍資料計算的衍生表格標記 (alias 表、稀疏格式、定點數)"""
+        if "]_FIXED" in template:
+            template = self.process_fixed_tags(context, template, file_path, is_column_mode)
+        if "_ALIAS_" in template:
+            template = self.process_alias_tags(context, template, file_path, is_column_mode)
+        if "_CSR_" in template or "_NNZ}}" in template or "_SPARSE_START" in template or "_DENSE_START" in template:
+            template = self.process_sparse_tags(context, template, file_path, is_column_mode)
+        return template
+
+    def process_named_range_loops(self, context, template, dfs, excel_files):
         """處理模板中的命名範圍循環"""
         # 找出所有命名範圍循環
         loop_pattern = r'{{RANGE\[([^\]]+)\]_LOOP_START}}(.*?){{RANGE\[(\1)\]_LOOP_END}}'
@@ -898,9 +1033,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             full_pattern = f"{start_tag}{loop_content}{end_tag}"
             
             # 檢查命名範圍是否存在
-            range_indices = self.convert_range_notation_to_indices(range_name)
+            range_indices = self.convert_range_notation_to_indices(context, range_name)
             if not range_indices:
                 continue
+            
+            # 定點數比例在循環外檢查，錯誤不會被下方處理個別資料錯誤的 except 攔截
+            if not self.check_fixed_specs(context, loop_content):
+                continue
                 
             start_row, start_col, end_row, end_col = range_indices
             
@@ -913,7 +1052,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
                 
                 # 檢查是否為直向讀取模式
-                is_column_mode = self.check_direction_mode(loop_content)
+                is_column_mode = self.check_direction_mode(context, loop_content)
                 
                 # 生成循環內容
                 loop_result = []
@@ -922,26 +1061,26 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                     # 直向讀取模式 - 按列處理
                     for col_idx in range(selected_data.shape[1]):
                         column_data = selected_data.iloc[:, col_idx]
-                        line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                        line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                         loop_result.append(line)
                 else:
                     # 橫向讀取模式 - 按行處理
                     for row_idx in range(selected_data.shape[0]):
                         row_data = selected_data.iloc[row_idx, :]
-                        line = self.process_row_data(row_data, loop_content, start_row, row_idx, selected_data.shape[0])
+                        line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, selected_data.shape[0], selected_data)
                         loop_result.append(line)
                 
                 # 替換整個循環區塊
                 result = result.replace(full_pattern, "".join(loop_result))
                 
             except Exception as e:
-                self.gui.log(f"處理命名範圍循環時出錯: {str(e)}")
+                context.log(f"處理命名範圍循環時出錯: {str(e)}")
                 import traceback
-                self.gui.log(traceback.format_exc())
+                context.log(traceback.format_exc())
         
         return result
 
-    def check_direction_mode(self, template_section):
+    def check_direction_mode(self, context, template_section):
         """
         檢查模板片段中是否指定了直向讀取模式
         
@@ -956,13 +1095,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             return True
             
         # 如果沒有明確指定，檢查全域設定
-        if hasattr(self.gui, 'template_direction') and self.gui.template_direction == "column":
+        if context.template_direction == "column":
             return True
             
         # 預設為橫向讀取
         return False
 
-    def process_range_data_loop(self, content, df, range_indices, is_column_mode=False):
+    def process_range_data_loop(self, context, content, df, range_indices, is_column_mode=False):
         """
         Process RANGE_DATA_LOOP tags in template content
         處理模板中的 RANGE_DATA_LOOP 標記
@@ -989,35 +1128,363 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             # 直向讀取
             for col_idx in range(selected_data.shape[1]):
                 column_data = selected_data.iloc[:, col_idx]
-                line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                 loop_result.append(line)
         else:
             # Row-wise reading
             # 橫向讀取
             for row_idx in range(selected_data.shape[0]):
                 row_data = selected_data.iloc[row_idx, :]
-                line = self.process_row_data(row_data, loop_content, start_row, row_idx, selected_data.shape[0])
+                line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, selected_data.shape[0], selected_data)
                 loop_result.append(line)
         
         return before_loop + "".join(loop_result) + after_loop
 
+    def resolve_range_indices(self, context, range_names):
+        """解析命名範圍為索引 (不記錄日誌，供快取鍵計算使用)"""
+        named_ranges = context.named_ranges
+        range_indices = []
+        for range_name in range_names:
+            range_str = named_ranges.get(range_name)
+            if not range_str:
+                continue
+            try:
+                start, end = range_str.split(":")
+                start_row, start_col = excel_notation_to_index(start)
+                end_row, end_col = excel_notation_to_index(end)
+                range_indices.append((start_row, start_col, end_row, end_col))
+            except Exception:
+                continue
+        return range_indices
+
+    def get_data_dependencies(self, context, excel_files, dfs, range_indices, include_full_sheet=False):
+        """
+        計算輸出所依賴的資料雜湊
+        
+        Args:
+            excel_files: 檔案列表
+            dfs: 檔案路徑對應資料框的字典
+            range_indices: (start_row, start_col, end_row, end_col) 列表
+            include_full_sheet: 是否包含整個工作表 (樣板可能讀取範圍以外的資料時)
+            
+        Returns:
+            list: 每個檔案的名稱與範圍雜湊
+        """
+        dependencies = []
+        for file_path in excel_files:
+            context.check_cancelled()
+            dependencies.append(self.get_file_dependencies(
+                context, file_path, dfs[file_path], range_indices, include_full_sheet
+            ))
+        return dependencies
+
+    def get_file_dependencies(self, context, file_path, df, range_indices, include_full_sheet=False):
+        """計算單一檔案的名稱與範圍雜湊 (見 get_data_dependencies)"""
+        file_hashes = []
+        indices_list = list(range_indices)
+        if include_full_sheet:
+            indices_list.append((0, 0, df.shape[0] - 1, df.shape[1] - 1))
+        for indices in indices_list:
+            memo_key = (file_path, indices)
+            if memo_key not in context.range_hash_memo:
+                context.range_hash_memo[memo_key] = hash_frame_region(df, *indices)
+            file_hashes.append(context.range_hash_memo[memo_key])
+        return [os.path.basename(file_path), file_hashes]
+
     def generate_code(self, excel_files, dfs, selected_ranges, code_template, selected_range):
-        """生成程式碼"""
+        """生成程式碼 (以宿主目前的命名範圍與讀取方向建立生成內容)"""
+        context = GenerationContext.from_host(
+            self.gui, excel_files, dfs, selected_ranges, selected_range, render_cache=self.render_cache
+        )
+        return self.render(context, code_template)
+
+    def render(self, context, code_template):
+        """
+        依生成內容生成程式碼
+        
+        所有資料、範圍與選項都由 context 提供，不讀取宿主也不修改 CodeGenerator 的狀態，
+        因此同一個 CodeGenerator 可同時在多個執行緒中生成程式碼
+        """
+        excel_files = context.excel_files
+        dfs = context.dfs
+        selected_ranges = context.selected_ranges
+        selected_range = context.selected_range
+        
         # 首先檢查是否有檔案和範圍
         if not excel_files:
-            messagebox.showerror("錯誤", "請先選擇文件和資料範圍")
+            context.report_error("請先選擇文件和資料範圍")
             return code_template
         
+        if context.render_cache is not None and context.stream and context.render_cache.cache_outputs:
+            # 整份輸出的快取鍵需要先讀取所有檔案，串流模式下只使用依檔案計算的片段快取
+            context.log("串流模式: 不使用整份輸出的渲染快取")
+        if context.render_cache is None or not context.render_cache.cache_outputs or context.stream:
+            return self.generate_code_uncached(context, excel_files, dfs, selected_ranges, code_template, selected_range)
+        
+        # 內容定址快取: 資料、樣板與選項均未變更時直接使用先前的結果
+        named_ranges = context.named_ranges
+        range_indices = [
+            (r['start_row'], r['start_col'], r['end_row'], r['end_col'])
+            for r in (selected_ranges or [])
+        ]
+        if selected_range:
+            range_indices.append((selected_range['start_row'], selected_range['start_col'],
+                                  selected_range['end_row'], selected_range['end_col']))
+        range_indices.extend(self.resolve_range_indices(context, named_ranges.keys()))
+        
+        # 參數區塊中的標準迴圈會讀取整個工作表
+        include_full_sheet = "{{ARGUMENT_START:" in code_template and "{{LOOP_START}}" in code_template
+        
+        cache_key = context.render_cache.make_key(
+            "output",
+            code_template,
+            context.template_direction,
+            named_ranges,
+            selected_ranges or [],
+            selected_range,
+            self.get_data_dependencies(context, excel_files, dfs, sorted(set(range_indices)), include_full_sheet)
+        )
+        cached_code = context.render_cache.get(cache_key)
+        if cached_code is not None:
+            context.log("渲染快取命中: 資料與樣板均未變更，略過程式碼生成")
+            return cached_code
+        
+        final_code = self.generate_code_uncached(context, excel_files, dfs, selected_ranges, code_template, selected_range)
+        context.render_cache.put(cache_key, final_code)
+        return final_code
+
+    def render_dedup_instance(self, context, content, file_path, file_idx, range_info, range_idx, is_column_mode):
+        """以單一檔案 (與單一選定範圍) 的資料生成去除重複區塊的內容"""
+        df = context.dfs[file_path]
+        rendered = content.replace("{{FILE_INDEX}}", str(file_idx))
+        rendered = rendered.replace("{{FILE_NAME}}", os.path.basename(file_path))
+        
+        if range_info is not None:
+            range_indices = (range_info['start_row'], range_info['start_col'],
+                             range_info['end_row'], range_info['end_col'])
+            rendered = rendered.replace("{{RANGE_INDEX}}", str(range_idx))
+            rendered = rendered.replace("{{RANGE_STR}}", range_info['range_str'])
+            rendered = rendered.replace("{{RANGE_LOOP_START}}", "{{RANGE_DATA_LOOP_START}}")
+            rendered = rendered.replace("{{RANGE_LOOP_END}}", "{{RANGE_DATA_LOOP_END}}")
+            rendered = self.process_range_data_loop(context, rendered, df, range_indices, is_column_mode)
+        
+        range_names = list(dict.fromkeys(re.findall(r'{{RANGE\[([^\]]+)\]_LOOP_START}}', rendered)))
+        return self.process_argument(context, rendered, [file_path], {file_path: df}, range_names, is_column_mode)
+
+    def process_dedup_blocks(self, context, template, excel_files, selected_ranges, is_column_mode):
+        """
+        處理去除重複區塊 {{DEDUP_START:名稱}} ... {{DEDUP_END:名稱}}
+        
+        區塊內容依每個檔案 (含 {{RANGE_LOOP_START}} 時依每個檔案的每個選定範圍) 生成，
+        內容相同的只輸出一次，{{DEDUP_NAME}} 替換為 名稱_編號。
+        樣板中的 {{DEDUP_NAME_LIST:名稱}} 與 {{DEDUP_INDEX_LIST:名稱}} 依 [檔案][範圍] 順序
+        替換為各實例對應的陣列名稱與編號，{{DEDUP_COUNT:名稱}} 替換為不重複的區塊數。
+        """
+        result = template
+        dedup_pattern = r'{{DEDUP_START:(\w+)}}(.*?){{DEDUP_END:\1}}'
+        
+        for block_name, content in re.findall(dedup_pattern, result, re.DOTALL):
+            per_range = "{{RANGE_LOOP_START}}" in content
+            instances = [
+                (file_idx, file_path, range_idx, range_info)
+                for file_idx, file_path in enumerate(excel_files)
+                for range_idx, range_info in (enumerate(selected_ranges) if per_range else [(0, None)])
+            ]
+            
+            unique_blocks = {}  # 生成內容 -> 不重複編號 (以內容雜湊比對)
+            instance_indices = []
+            for file_idx, file_path, range_idx, range_info in instances:
+                context.check_cancelled()
+                rendered = self.render_dedup_instance(
+                    context, content, file_path, file_idx, range_info, range_idx, is_column_mode
+                )
+                instance_indices.append(unique_blocks.setdefault(rendered, len(unique_blocks)))
+            
+            context.log(f"去除重複區塊 {block_name}: {len(instances)} 個實例中有 {len(unique_blocks)} 個不重複")
+            
+            blocks_output = "".join(
+                rendered.replace("{{DEDUP_NAME}}", f"{block_name}_{unique_idx}")
+                for rendered, unique_idx in unique_blocks.items()
+            )
+            result = result.replace(f"{{{{DEDUP_START:{block_name}}}}}{content}{{{{DEDUP_END:{block_name}}}}}",
+                                    blocks_output)
+            result = result.replace(f"{{{{DEDUP_NAME_LIST:{block_name}}}}}",
+                                    ", ".join(f"{block_name}_{index}" for index in instance_indices))
+            result = result.replace(f"{{{{DEDUP_INDEX_LIST:{block_name}}}}}",
+                                    ", ".join(str(index) for index in instance_indices))
+            result = result.replace(f"{{{{DEDUP_COUNT:{block_name}}}}}", str(len(unique_blocks)))
+        
+        return result
+
+    def process_argument_cached(self, context, argument_content, excel_files, dfs, range_names, is_column_mode):
+        """處理參數區塊，若內容與所依賴的範圍資料未變更則使用快取的片段"""
+        if context.render_cache is None:
+            return self.process_argument(context, argument_content, excel_files, dfs, range_names, is_column_mode)
+        
+        # 除了範圍名稱= 列出的範圍，區塊內容中的命名範圍標記 (例如 alias、稀疏格式等衍生表格) 也是依賴
+        named_ranges = context.named_ranges
+        dependency_names = list(dict.fromkeys(list(range_names) + re.findall(r'RANGE\[([^\]]+)\]', argument_content)))
+        cache_key = context.render_cache.make_key(
+            "argument",
+            argument_content,
+            is_column_mode,
+            context.template_direction,
+            {name: named_ranges.get(name) for name in dependency_names},
+            self.get_data_dependencies(
+                context,
+                excel_files, dfs,
+                self.resolve_range_indices(context, dependency_names),
+                "{{LOOP_START}}" in argument_content
+            )
+        )
+        cached_fragment = context.render_cache.get(cache_key)
+        if cached_fragment is not None:
+            return cached_fragment
+        
+        fragment = self.process_argument(context, argument_content, excel_files, dfs, range_names, is_column_mode)
+        context.render_cache.put(cache_key, fragment)
+        return fragment
+
+    def process_argument_file_cached(self, context, files_loop_content, file_idx, file_path, df, range_names,
+                                     dependency_names, is_column_mode, is_last_file):
+        """生成檔案循環中一個檔案的內容，若內容與該檔案的範圍資料未變更則使用快取的片段"""
+        if context.render_cache is None:
+            return self.process_argument_file(
+                context, files_loop_content, file_idx, file_path, df, range_names, is_column_mode, is_last_file
+            )
+        
+        named_ranges = context.named_ranges
+        cache_key = context.render_cache.make_key(
+            "argument_file",
+            files_loop_content,
+            file_idx,
+            is_last_file,
+            is_column_mode,
+            context.template_direction,
+            range_names,
+            {name: named_ranges.get(name) for name in dependency_names},
+            self.get_file_dependencies(
+                context, file_path, df, self.resolve_range_indices(context, dependency_names)
+            )
+        )
+        cached_fragment = context.render_cache.get(cache_key)
+        if cached_fragment is not None:
+            return cached_fragment
+        
+        fragment = self.process_argument_file(
+            context, files_loop_content, file_idx, file_path, df, range_names, is_column_mode, is_last_file
+        )
+        context.render_cache.put(cache_key, fragment)
+        return fragment
+
+    def process_arguments_by_file(self, context, template, arguments, excel_files, dfs, is_column_mode):
+        """
+        串流模式下處理參數區塊: 依檔案順序讀取每個檔案一次
+
+        每個檔案載入後先生成所有參數區塊中該檔案的內容，再換下一個檔案，
+        最後依區塊順序組合各檔案的內容。沒有檔案循環的區塊 (包括其中的衍生表格標記)
+        在處理第一個檔案時生成。片段快取依每個檔案各自的範圍雜湊計算。
+
+        Args:
+            arguments (list): (參數名稱, 參數內容) 列表
+
+        Returns:
+            str: 參數區塊替換為生成內容後的樣板
+        """
+        blocks = []
+        for argument_name, argument_content in arguments:
+            range_match = re.search(r'範圍名稱=([^\n]+)', argument_content)
+            range_names = [name.strip() for name in range_match.group(1).split(',')] if range_match else []
+            has_files_loop = "{{FILES_LOOP_START}}" in argument_content or "{{FILES_LOOP_END}}" in argument_content
+            parts = self.split_files_loop(argument_content) if has_files_loop else None
+            blocks.append((argument_name, argument_content, range_names, parts, []))
+        
+        for file_idx, file_path in enumerate(excel_files):
+            df = dfs[file_path]
+            is_last_file = file_idx == len(excel_files) - 1
+            for argument_name, argument_content, range_names, parts, fragments in blocks:
+                context.check_cancelled()
+                if parts is None:
+                    if file_idx == 0:
+                        fragment = self.process_argument_cached(
+                            context, argument_content, [file_path], {file_path: df}, range_names, is_column_mode
+                        )
+                        fragments.append(self.process_derived_tables(context, fragment, file_path, is_column_mode))
+                    continue
+                
+                files_loop_content = parts[1]
+                dependency_names = list(dict.fromkeys(
+                    list(range_names) + re.findall(r'RANGE\[([^\]]+)\]', files_loop_content)
+                ))
+                fragments.append(self.process_argument_file_cached(
+                    context, files_loop_content, file_idx, file_path, df, range_names,
+                    dependency_names, is_column_mode, is_last_file
+                ))
+        
+        for argument_name, argument_content, range_names, parts, fragments in blocks:
+            if parts is None:
+                processed_argument = "".join(fragments) if fragments else argument_content
+            else:
+                before_files_loop, _, after_files_loop = parts
+                processed_argument = before_files_loop + "".join(fragments) + after_files_loop
+            template = template.replace(
+                f'{{{{ARGUMENT_START:{argument_name}}}}}' + argument_content + f'{{{{ARGUMENT_END:{argument_name}}}}}',
+                processed_argument
+            )
+        return template
+
+    def stream_passes(self, template):
+        """
+        列出生成樣板時讀取檔案資料的處理階段 (依處理順序)，供串流模式檢查
+
+        串流模式依檔案順序讀取，讀過的檔案隨即釋放。只讀取第一個檔案的階段可以在
+        讀取所有檔案的階段之前任意重複，讀取所有檔案的階段之後不能再有任何階段。
+
+        Returns:
+            list: (階段名稱, 是否讀取所有檔案) 列表
+        """
+        passes = []
+        if re.search(r'{{RANGE\[[^\]]+\]_CTYPE|{{FILES_CTYPE', template):
+            passes.append(("CTYPE", True))
+        if re.search(r'{{RANGE\[[^\]]+\]_VALUE\[', template):
+            passes.append(("VALUE", False))
+        if "{{DEDUP_START:" in template:
+            passes.append(("DEDUP", True))
+        
+        argument_pattern = r'{{ARGUMENT_START:(\w+)}}(.*?){{ARGUMENT_END:\1}}'
+        arguments = re.findall(argument_pattern, template, re.DOTALL)
+        outside = re.sub(argument_pattern, "", template, flags=re.DOTALL)
+        if arguments:
+            passes.append(("ARGUMENT", any("{{FILES_LOOP_" in content for _, content in arguments)))
+        # 有檔案循環的區塊，檔案循環之外的內容留給之後的階段處理
+        for _, content in arguments:
+            if "{{FILES_LOOP_START}}" in content:
+                before_files_loop, _, after_files_loop = self.split_files_loop(content)
+                outside += before_files_loop + after_files_loop
+        if "{{ARGUMENT_START:" in outside:
+            passes.append(("ARGUMENT (mismatched tags)", "{{FILES_LOOP_" in outside))
+        if "{{LAYOUT_" in template or "{{SOA_START}}" in template:
+            passes.append(("LAYOUT", True))
+        if any(marker in outside for marker in ("]_FIXED", "_ALIAS_", "_CSR_", "_NNZ}}", "_SPARSE_START", "_DENSE_START")):
+            passes.append(("DERIVED", False))
+        traditional_markers = ["{{LOOP_START}}", "{{RANGE:", "{{FILES_LOOP_START}}", "{{RANGES_LOOP_START}}"]
+        if (any(marker in outside for marker in traditional_markers)
+                or re.search(r'{{RANGE\[[^\]]+\]_LOOP_START}}', outside)):
+            passes.append(("LOOP", "{{FILES_LOOP_START}}" in outside or "{{RANGES_LOOP_START}}" in outside))
+        return passes
+
+    def generate_code_uncached(self, context, excel_files, dfs, selected_ranges, code_template, selected_range):
+        """生成程式碼 (不使用整份輸出的渲染快取，參數區塊片段仍使用 context 的快取)"""
         # 移除所有方向控制標記，但記住最後的設定
         is_column_mode = "{{DIRECTION:COLUMN}}" in code_template
         template = code_template.replace("{{DIRECTION:ROW}}", "")
         template = template.replace("{{DIRECTION:COLUMN}}", "")
         
         # 如果全域有方向設定，使用它
-        if hasattr(self.gui, 'template_direction'):
-            is_column_mode = self.gui.template_direction == "column"
+        if context.template_direction is not None:
+            is_column_mode = context.template_direction == "column"
         
-        self.gui.log(f"讀取方向: {'直向(Column)' if is_column_mode else '橫向(Row)'}")
+        context.log(f"讀取方向: {'直向(Column)' if is_column_mode else '橫向(Row)'}")
         
         # 處理檔案數量
         template = template.replace("{{FILE_COUNT}}", str(len(excel_files)))
@@ -1044,15 +1511,27 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             template = template.replace("{{COL_COUNT}}", str(first_range['end_col'] - first_range['start_col'] + 1))
         
         # 處理命名範圍的行列數
-        template = self.process_named_range_metadata(template)
+        template = self.process_named_range_metadata(context, template)
+        
+        # 處理資料型別標記 (依所有檔案的範圍資料推斷或檢查型別)
+        template = self.process_ctype_tags(context, template, excel_files, selected_ranges)
         
         # 處理命名範圍特定值引用（在任何循環處理之前）
-        template = self.process_named_range_value(template, dfs, excel_files)
+        template = self.process_named_range_value(context, template, dfs, excel_files)
+        
+        # 處理去除重複區塊 (相同內容的表格只輸出一次)
+        if "{{DEDUP_START:" in template:
+            template = self.process_dedup_blocks(context, template, excel_files, selected_ranges, is_column_mode)
         
         # 使用正則表達式找出所有參數區塊
         argument_pattern = r'{{ARGUMENT_START:(\w+)}}(.*?){{ARGUMENT_END:\1}}'
         arguments = re.findall(argument_pattern, template, re.DOTALL)
 
+        # 串流模式下依檔案順序處理所有參數區塊，每個檔案只讀取一次
+        if context.stream:
+            template = self.process_arguments_by_file(context, template, arguments, excel_files, dfs, is_column_mode)
+            arguments = []
+        
         # 處理參數區塊
         for argument_name, argument_content in arguments:
             # 從備註中提取範圍名稱
@@ -1063,7 +1542,8 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 range_names = [name.strip() for name in range_match.group(1).split(',')]
                 
             # 處理這個參數的內容
-            processed_argument = self.process_argument(
+            processed_argument = self.process_argument_cached(
+                context,
                 argument_content, 
                 excel_files, 
                 dfs, 
@@ -1083,13 +1563,14 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         
         for start_name, content, end_name in mismatch_arguments:
             if start_name != end_name:  # 檢測到標籤不匹配
-                self.gui.log(f"警告: 參數區塊標籤不匹配 - 開始: {start_name}, 結束: {end_name}")
+                context.log(f"警告: 參數區塊標籤不匹配 - 開始: {start_name}, 結束: {end_name}")
                 # 嘗試處理該區塊
                 range_match = re.search(r'範圍名稱=([^\n]+)', content)
                 if range_match:
                     range_names = [name.strip() for name in range_match.group(1).split(',')]
                     
                     processed_argument = self.process_argument(
+                        context,
                         content, 
                         excel_files, 
                         dfs, 
@@ -1103,8 +1584,16 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         processed_argument
                     )
 
+        # 處理多範圍資料的排列標記 (轉置與 struct-of-arrays)
+        if "{{LAYOUT_" in template or "{{SOA_START}}" in template:
+            template = self.process_layout_tags(context, template, excel_files, selected_ranges)
+
+        # 處理參數區塊外的衍生表格標記 (使用第一個檔案的資料，與命名範圍循環相同)
+        template = self.process_derived_tables(context, template, excel_files[0], is_column_mode)
+
         # 處理參數區塊外的傳統標記
         template = self.process_traditional_template(
+            context,
             template, 
             excel_files, 
             dfs, 
@@ -1113,9 +1602,12 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             is_column_mode
         )
 
+        for spec, max_error in context.fixed_point_errors.items():
+            context.log(f"定點數轉換 (比例 {spec}): 最大捨入誤差 {max_error:.6g}")
+
         return template
 
-    def process_traditional_template(self, template, excel_files, dfs, selected_ranges, selected_range, is_column_mode):
+    def process_traditional_template(self, context, template, excel_files, dfs, selected_ranges, selected_range, is_column_mode):
         """處理參數區塊外的傳統標記"""
         final_code = template
         
@@ -1126,17 +1618,18 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         if not any(marker in final_code for marker in traditional_markers):
             return final_code
         
-        self.gui.log("處理參數區塊外的傳統標記...")
+        context.log("處理參數區塊外的傳統標記...")
         
         # 處理命名範圍循環
-        final_code = self.process_named_range_loops(final_code, dfs, excel_files)
+        final_code = self.process_named_range_loops(context, final_code, dfs, excel_files)
         
         # 判斷模板類型並相應處理
         if "{{RANGES_LOOP_START}}" in final_code and "{{FILES_LOOP_START}}" in final_code:
             # 四維陣列模板 - 範圍優先
-            self.gui.log("檢測到四維陣列模板（範圍優先）")
+            context.log("檢測到四維陣列模板（範圍優先）")
             if selected_ranges:
                 final_code = self.process_4d_range_first_template(
+                    context,
                     final_code,
                     excel_files,
                     dfs,
@@ -1148,9 +1641,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 )
         elif "{{FILES_LOOP_START}}" in final_code and "{{RANGES_LOOP_START}}" in final_code:
             # 四維陣列模板 - 檔案優先
-            self.gui.log("檢測到四維陣列模板（檔案優先）")
+            context.log("檢測到四維陣列模板（檔案優先）")
             if selected_ranges:
                 final_code = self.process_4d_file_first_template(
+                    context,
                     final_code,
                     excel_files,
                     dfs,
@@ -1162,8 +1656,9 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 )
         elif "{{FILES_LOOP_START}}" in final_code and "{{RANGE_DATA_LOOP_START}}" in final_code:
             # 三維多範圍陣列模板
-            self.gui.log("檢測到三維多範圍陣列模板")
+            context.log("檢測到三維多範圍陣列模板")
             final_code = self.process_3d_multi_range_template(
+                context,
                 final_code,
                 excel_files,
                 dfs,
@@ -1173,10 +1668,11 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             )
         elif "{{FILES_LOOP_START}}" in final_code and "{{LOOP_START}}" in final_code:
             # 三維陣列模板
-            self.gui.log("檢測到三維陣列模板")
+            context.log("檢測到三維陣列模板")
             if selected_ranges:
                 first_range = selected_ranges[0]
                 final_code = self.process_3d_template(
+                    context,
                     final_code,
                     excel_files,
                     dfs,
@@ -1190,8 +1686,9 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 )
         elif "{{RANGE:1_LOOP_START}}" in final_code or "{{RANGE:2_LOOP_START}}" in final_code:
             # 多範圍處理模板
-            self.gui.log("檢測到多範圍處理模板")
+            context.log("檢測到多範圍處理模板")
             final_code = self.process_multi_range_template(
+                context,
                 final_code, 
                 excel_files, 
                 dfs, 
@@ -1200,10 +1697,11 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             )
         elif "{{LOOP_START}}" in final_code and "{{LOOP_END}}" in final_code:
             # 標準單範圍模板
-            self.gui.log("檢測到標準單範圍模板")
+            context.log("檢測到標準單範圍模板")
             if selected_ranges:
                 first_range = selected_ranges[0]
                 final_code = self.process_standard_template(
+                    context,
                     final_code,
                     excel_files,
                     dfs,
@@ -1217,6 +1715,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             elif selected_range:
                 # 向下相容：使用舊的 selected_range
                 final_code = self.process_standard_template(
+                    context,
                     final_code,
                     excel_files,
                     dfs,
@@ -1230,7 +1729,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         
         return final_code
 
-    def process_argument(self, template, excel_files, dfs, range_names, is_column_mode):
+    def process_argument(self, context, template, excel_files, dfs, range_names, is_column_mode):
         """Process a specific argument block with its ranges"""
         final_code = template
         
@@ -1240,163 +1739,188 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             # Use data from the first file
             if excel_files:
                 file_path = excel_files[0]
-                df = dfs[file_path]
-                
-                # Process named range loops
-                for range_name in range_names:
-                    range_loop_start = f"{{{{RANGE[{range_name}]_LOOP_START}}}}"
-                    range_loop_end = f"{{{{RANGE[{range_name}]_LOOP_END}}}}"
-                    
-                    if range_loop_start in final_code:
-                        # Get range information using convert_range_notation_to_indices
-                        range_indices = self.convert_range_notation_to_indices(range_name)
-                        
-                        if range_indices:
-                            start_row, start_col, end_row, end_col = range_indices
-                            self.gui.log(f"處理引數範圍 {range_name}: {start_row}:{end_row}, {start_col}:{end_col}")
-                            
-                            # Extract data for the selected range
-                            selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
-                            
-                            # Split template to get loop content
-                            parts = final_code.split(range_loop_start)
-                            before_loop = parts[0]
-                            
-                            loop_and_after = parts[1].split(range_loop_end)
-                            loop_content = loop_and_after[0]
-                            after_loop = loop_and_after[1] if len(loop_and_after) > 1 else ""
-                            
-                            loop_result = []
-                            
-                            # Check if loop content specifies read direction
-                            local_is_column_mode = self.check_direction_mode(loop_content) or is_column_mode
-                            
-                            if local_is_column_mode:
-                                # Column-wise reading
-                                for col_idx in range(selected_data.shape[1]):
-                                    column_data = selected_data.iloc[:, col_idx]
-                                    line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
-                                    loop_result.append(line)
-                            else:
-                                # Row-wise reading
-                                for row_idx in range(selected_data.shape[0]):
-                                    row_data = selected_data.iloc[row_idx, :]
-                                    line = self.process_row_data(row_data, loop_content, start_row, row_idx, selected_data.shape[0])
-                                    loop_result.append(line)
-                            
-                            # Replace loop content
-                            final_code = before_loop + "".join(loop_result) + after_loop
-                
-                # Process RANGE_DATA_LOOP if present
-                # 處理 RANGE_DATA_LOOP（如果存在）
-                for range_name in range_names:
-                    if "{{RANGE_DATA_LOOP_START}}" in final_code:
-                        range_indices = self.convert_range_notation_to_indices(range_name)
-                        if range_indices:
-                            final_code = self.process_range_data_loop(
-                                final_code, df, range_indices, is_column_mode
-                            )
-                            break  # 只處理第一個找到的範圍
-                
-                # If there's still a standard loop, process it
-                if "{{LOOP_START}}" in final_code:
-                    final_code = self.process_standard_template(
-                        final_code, 
-                        [file_path], 
-                        {file_path: df}, 
-                        0, 0, 
-                        df.shape[0] - 1, 
-                        df.shape[1] - 1, 
-                        df.shape[0], 
-                        is_column_mode
-                    )
+                final_code = self.process_argument_single_file(
+                    context, final_code, file_path, dfs[file_path], range_names, is_column_mode
+                )
         else:
             # Process file loops when FILES_LOOP_START and FILES_LOOP_END are present
-            parts = final_code.split("{{FILES_LOOP_START}}")
-            before_files_loop = parts[0]
-            
-            files_loop_and_after = parts[1].split("{{FILES_LOOP_END}}")
-            files_loop_content = files_loop_and_after[0]
-            after_files_loop = files_loop_and_after[1] if len(files_loop_and_after) > 1 else ""
+            before_files_loop, files_loop_content, after_files_loop = self.split_files_loop(final_code)
             
             files_result = []
             
             # Process each file
             for file_idx, file_path in enumerate(excel_files):
-                df = dfs[file_path]
-                file_content = files_loop_content.replace("{{FILE_INDEX}}", str(file_idx))
-                file_content = file_content.replace("{{FILE_NAME}}", os.path.basename(file_path))
-                
-                # Process each named range within this file
-                for range_name in range_names:
-                    range_loop_start = f"{{{{RANGE[{range_name}]_LOOP_START}}}}"
-                    range_loop_end = f"{{{{RANGE[{range_name}]_LOOP_END}}}}"
-                    
-                    if range_loop_start in file_content:
-                        range_indices = self.convert_range_notation_to_indices(range_name)
-                        if range_indices:
-                            start_row, start_col, end_row, end_col = range_indices
-                            
-                            selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
-                            
-                            # Split template to get range loop content
-                            range_parts = file_content.split(range_loop_start)
-                            before_range_loop = range_parts[0]
-                            
-                            range_loop_and_after = range_parts[1].split(range_loop_end)
-                            range_loop_content = range_loop_and_after[0]
-                            after_range_loop = range_loop_and_after[1] if len(range_loop_and_after) > 1 else ""
-                            
-                            loop_result = []
-                            
-                            local_is_column_mode = self.check_direction_mode(range_loop_content) or is_column_mode
-                            
-                            if local_is_column_mode:
-                                # Column-wise reading
-                                for col_idx in range(selected_data.shape[1]):
-                                    column_data = selected_data.iloc[:, col_idx]
-                                    line = self.process_column_data(column_data, range_loop_content, start_col, col_idx, selected_data.shape[1])
-                                    loop_result.append(line)
-                            else:
-                                # Row-wise reading
-                                for row_idx in range(selected_data.shape[0]):
-                                    row_data = selected_data.iloc[row_idx, :]
-                                    line = self.process_row_data(row_data, range_loop_content, start_row, row_idx, selected_data.shape[0])
-                                    loop_result.append(line)
-                            
-                            # Replace range loop content
-                            file_content = file_content.replace(
-                                f"{range_loop_start}{range_loop_content}{range_loop_end}", 
-                                "".join(loop_result)
-                            )
-                
-                # Process RANGE_DATA_LOOP in file content if present
-                # 在檔案內容中處理 RANGE_DATA_LOOP（如果存在）
-                for range_name in range_names:
-                    if "{{RANGE_DATA_LOOP_START}}" in file_content:
-                        range_indices = self.convert_range_notation_to_indices(range_name)
-                        if range_indices:
-                            file_content = self.process_range_data_loop(
-                                file_content, df, range_indices, is_column_mode
-                            )
-                            break  # 只處理第一個找到的範圍
-                
-                # Process last file comma handling
-                is_last_file = (file_idx == len(excel_files) - 1)
-                if is_last_file and file_content.rstrip().endswith(","):
-                    file_content = file_content.rstrip().rstrip(",") + file_content[len(file_content.rstrip()):]
-                
-                files_result.append(file_content)
+                files_result.append(self.process_argument_file(
+                    context, files_loop_content, file_idx, file_path, dfs[file_path],
+                    range_names, is_column_mode, file_idx == len(excel_files) - 1
+                ))
             
             # Combine all files
             final_code = before_files_loop + "".join(files_result) + after_files_loop
         
         return final_code
-    
-    def process_3d_multi_range_template(self, template, excel_files, dfs, selected_ranges, file_count, is_column_mode=False):
+
+    def split_files_loop(self, template):
+        """將參數區塊分為 (檔案循環之前, 檔案循環內容, 檔案循環之後)"""
+        parts = template.split("{{FILES_LOOP_START}}")
+        before_files_loop = parts[0]
+        
+        files_loop_and_after = parts[1].split("{{FILES_LOOP_END}}")
+        files_loop_content = files_loop_and_after[0]
+        after_files_loop = files_loop_and_after[1] if len(files_loop_and_after) > 1 else ""
+        return before_files_loop, files_loop_content, after_files_loop
+
+    def process_argument_single_file(self, context, template, file_path, df, range_names, is_column_mode):
+        """以單一檔案的資料處理沒有檔案循環的參數區塊"""
+        final_code = template
+        
+        # Process named range loops
+        for range_name in range_names:
+            range_loop_start = f"{{{{RANGE[{range_name}]_LOOP_START}}}}"
+            range_loop_end = f"{{{{RANGE[{range_name}]_LOOP_END}}}}"
+            
+            if range_loop_start in final_code:
+                # Get range information using convert_range_notation_to_indices
+                range_indices = self.convert_range_notation_to_indices(context, range_name)
+                
+                if range_indices:
+                    start_row, start_col, end_row, end_col = range_indices
+                    context.log(f"處理引數範圍 {range_name}: {start_row}:{end_row}, {start_col}:{end_col}")
+                    
+                    # Extract data for the selected range
+                    selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
+                    
+                    # Split template to get loop content
+                    parts = final_code.split(range_loop_start)
+                    before_loop = parts[0]
+                    
+                    loop_and_after = parts[1].split(range_loop_end)
+                    loop_content = loop_and_after[0]
+                    after_loop = loop_and_after[1] if len(loop_and_after) > 1 else ""
+                    
+                    loop_result = []
+                    
+                    # Check if loop content specifies read direction
+                    local_is_column_mode = self.check_direction_mode(context, loop_content) or is_column_mode
+                    
+                    if local_is_column_mode:
+                        # Column-wise reading
+                        for col_idx in range(selected_data.shape[1]):
+                            column_data = selected_data.iloc[:, col_idx]
+                            line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
+                            loop_result.append(line)
+                    else:
+                        # Row-wise reading
+                        for row_idx in range(selected_data.shape[0]):
+                            row_data = selected_data.iloc[row_idx, :]
+                            line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, selected_data.shape[0], selected_data)
+                            loop_result.append(line)
+                    
+                    # Replace loop content
+                    final_code = before_loop + "".join(loop_result) + after_loop
+        
+        # Process RANGE_DATA_LOOP if present
+        # 處理 RANGE_DATA_LOOP（如果存在）
+        for range_name in range_names:
+            if "{{RANGE_DATA_LOOP_START}}" in final_code:
+                range_indices = self.convert_range_notation_to_indices(context, range_name)
+                if range_indices:
+                    final_code = self.process_range_data_loop(
+                        context,
+                        final_code, df, range_indices, is_column_mode
+                    )
+                    break  # 只處理第一個找到的範圍
+        
+        # If there's still a standard loop, process it
+        if "{{LOOP_START}}" in final_code:
+            final_code = self.process_standard_template(
+                context,
+                final_code, 
+                [file_path], 
+                {file_path: df}, 
+                0, 0, 
+                df.shape[0] - 1, 
+                df.shape[1] - 1, 
+                df.shape[0], 
+                is_column_mode
+            )
+        
+        return final_code
+
+    def process_argument_file(self, context, files_loop_content, file_idx, file_path, df, range_names,
+                              is_column_mode, is_last_file):
+        """以一個檔案的資料生成參數區塊中檔案循環的一次內容"""
+        file_content = files_loop_content.replace("{{FILE_INDEX}}", str(file_idx))
+        file_content = file_content.replace("{{FILE_NAME}}", os.path.basename(file_path))
+        
+        # Process derived tables (alias, sparse) with this file's data
+        file_content = self.process_derived_tables(context, file_content, file_path, is_column_mode)
+        
+        # Process each named range within this file
+        for range_name in range_names:
+            range_loop_start = f"{{{{RANGE[{range_name}]_LOOP_START}}}}"
+            range_loop_end = f"{{{{RANGE[{range_name}]_LOOP_END}}}}"
+            
+            if range_loop_start in file_content:
+                range_indices = self.convert_range_notation_to_indices(context, range_name)
+                if range_indices:
+                    start_row, start_col, end_row, end_col = range_indices
+                    
+                    selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
+                    
+                    # Split template to get range loop content
+                    range_parts = file_content.split(range_loop_start)
+                    before_range_loop = range_parts[0]
+                    
+                    range_loop_and_after = range_parts[1].split(range_loop_end)
+                    range_loop_content = range_loop_and_after[0]
+                    after_range_loop = range_loop_and_after[1] if len(range_loop_and_after) > 1 else ""
+                    
+                    loop_result = []
+                    
+                    local_is_column_mode = self.check_direction_mode(context, range_loop_content) or is_column_mode
+                    
+                    if local_is_column_mode:
+                        # Column-wise reading
+                        for col_idx in range(selected_data.shape[1]):
+                            column_data = selected_data.iloc[:, col_idx]
+                            line = self.process_column_data(context, column_data, range_loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
+                            loop_result.append(line)
+                    else:
+                        # Row-wise reading
+                        for row_idx in range(selected_data.shape[0]):
+                            row_data = selected_data.iloc[row_idx, :]
+                            line = self.process_row_data(context, row_data, range_loop_content, start_row, row_idx, selected_data.shape[0], selected_data)
+                            loop_result.append(line)
+                    
+                    # Replace range loop content
+                    file_content = file_content.replace(
+                        f"{range_loop_start}{range_loop_content}{range_loop_end}", 
+                        "".join(loop_result)
+                    )
+        
+        # Process RANGE_DATA_LOOP in file content if present
+        # 在檔案內容中處理 RANGE_DATA_LOOP（如果存在）
+        for range_name in range_names:
+            if "{{RANGE_DATA_LOOP_START}}" in file_content:
+                range_indices = self.convert_range_notation_to_indices(context, range_name)
+                if range_indices:
+                    file_content = self.process_range_data_loop(
+                        context,
+                        file_content, df, range_indices, is_column_mode
+                    )
+                    break  # 只處理第一個找到的範圍
+        
+        # Process last file comma handling
+        if is_last_file and file_content.rstrip().endswith(","):
+            file_content = file_content.rstrip().rstrip(",") + file_content[len(file_content.rstrip()):]
+        
+        return file_content
+
+    def process_3d_multi_range_template(self, context, template, excel_files, dfs, selected_ranges, file_count, is_column_mode=False):
         """處理三維多範圍陣列樣板"""
         if not selected_ranges or len(selected_ranges) < 1:
-            messagebox.showerror("錯誤", "需要選擇至少一個數據範圍來處理三維多範圍陣列模板")
+            context.report_error("需要選擇至少一個數據範圍來處理三維多範圍陣列模板")
             return template
         
         final_code = template
@@ -1412,7 +1936,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 range_dim_content = "unsigned int range_dimensions[RANGE_COUNT][2] = {" + range_dim_and_after[0] + "};"
                 after_range_dim = range_dim_and_after[1] if len(range_dim_and_after) > 1 else ""
                 
-                range_dim_result = self.process_range_dimensions(range_dim_content, selected_ranges, is_column_mode)
+                range_dim_result = self.process_range_dimensions(context, range_dim_content, selected_ranges, is_column_mode)
                 
                 # 將處理後的範圍維度部分重新組合回代碼中
                 final_code = before_range_dim + range_dim_result + after_range_dim
@@ -1465,6 +1989,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                             
                             # 使用新的 process_range_data_loop 方法
                             range_content = self.process_range_data_loop(
+                                context,
                                 range_content, df, range_indices, is_column_mode
                             )
                         
@@ -1511,7 +2036,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 remaining_text = original_template[last_tag_end:]
                 
                 if remaining_text.strip():
-                    self.gui.log(f"找到模板中的剩餘文本: {remaining_text[:20]}...")
+                    context.log(f"找到模板中的剩餘文本: {remaining_text[:20]}...")
                     
                     # 在處理後的代碼中找到對應標記的位置
                     final_tag_pos = processed_template.rfind(last_tag)
@@ -1519,15 +2044,15 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         final_tag_end = final_tag_pos + len(last_tag)
                         # 添加剩餘文本到最終代碼
                         final_code = processed_template[:final_tag_end] + remaining_text
-                        self.gui.log("已添加模板中的剩餘文本到生成的代碼")
+                        context.log("已添加模板中的剩餘文本到生成的代碼")
         except Exception as e:
-            self.gui.log(f"處理模板剩餘文本時出錯: {str(e)}")
+            context.log(f"處理模板剩餘文本時出錯: {str(e)}")
             import traceback
-            self.gui.log(traceback.format_exc())
+            context.log(traceback.format_exc())
         
         return final_code
 
-    def process_range_dimensions(self, range_dim_content, selected_ranges, is_column_mode=False):
+    def process_range_dimensions(self, context, range_dim_content, selected_ranges, is_column_mode=False):
         """處理範圍維度定義部分"""
         if "{{RANGES_LOOP_START}}" in range_dim_content and "{{RANGES_LOOP_END}}" in range_dim_content:
             parts = range_dim_content.split("{{RANGES_LOOP_START}}")
@@ -1574,10 +2099,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         return range_dim_content
 
     # 處理標準模板函數 - 其餘函數保持不變...
-    def process_4d_range_first_template(self, template, excel_files, dfs, selected_ranges, file_count, row_count, col_count, is_column_mode=False):
+    def process_4d_range_first_template(self, context, template, excel_files, dfs, selected_ranges, file_count, row_count, col_count, is_column_mode=False):
         """處理四維陣列樣板 - 範圍優先 [範圍][檔案][行][列]"""
         if not selected_ranges or len(selected_ranges) < 1:
-            messagebox.showerror("錯誤", "需要選擇至少一個數據範圍來處理四維陣列模板")
+            context.report_error("需要選擇至少一個數據範圍來處理四維陣列模板")
             return template
         
         final_code = template
@@ -1649,19 +2174,19 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                             loop_result = []
                             
                             # 檢查循環內容是否指定了讀取方向
-                            local_is_column_mode = self.check_direction_mode(loop_content) or is_column_mode
+                            local_is_column_mode = self.check_direction_mode(context, loop_content) or is_column_mode
                             
                             if local_is_column_mode:
                                 # 直向讀取 - 按列處理
                                 for col_idx in range(selected_data.shape[1]):
                                     column_data = selected_data.iloc[:, col_idx]
-                                    line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                                    line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                                     loop_result.append(line)
                             else:
                                 # 橫向讀取 - 按行處理
                                 for row_idx in range(selected_data.shape[0]):
                                     row_data = selected_data.iloc[row_idx, :]
-                                    line = self.process_row_data(row_data, loop_content, start_row, row_idx, range_row_count)
+                                    line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, range_row_count, selected_data)
                                     loop_result.append(line)
                             
                             # 組合該文件的所有行
@@ -1689,10 +2214,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         
         return final_code
 
-    def process_4d_file_first_template(self, template, excel_files, dfs, selected_ranges, file_count, row_count, col_count, is_column_mode=False):
+    def process_4d_file_first_template(self, context, template, excel_files, dfs, selected_ranges, file_count, row_count, col_count, is_column_mode=False):
         """處理四維陣列樣板 - 檔案優先 [檔案][範圍][行][列]"""
         if not selected_ranges or len(selected_ranges) < 1:
-            messagebox.showerror("錯誤", "需要選擇至少一個數據範圍來處理四維陣列模板")
+            context.report_error("需要選擇至少一個數據範圍來處理四維陣列模板")
             return template
         
         final_code = template
@@ -1706,12 +2231,12 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 #     range_dim_content = "unsigned int range_dimensions[RANGE_COUNT][2] = {" + range_dim_and_after[0] + "};"
                 #     after_range_dim = range_dim_and_after[1] if len(range_dim_and_after) > 1 else ""
                     
-                #     range_dim_result = self.process_range_dimensions(range_dim_content, selected_ranges, is_column_mode)
+                #     range_dim_result = self.process_range_dimensions(context, range_dim_content, selected_ranges, is_column_mode)
                     
                 #     # 將處理後的範圍維度部分重新組合回代碼中
                 #     final_code = range_dim_parts[0] + range_dim_result + after_range_dim
                 # else:
-                #     self.gui.log("警告: 未找到標準範圍維度定義格式，嘗試替代格式")
+                #     context.log("警告: 未找到標準範圍維度定義格式，嘗試替代格式")
                 #     # 嘗試其他可能的格式，例如 static 或不同的維度
                 #     alt_patterns = [
                 #         "static unsigned int range_dimensions[NORMAL_TABLE_COUNT][3] = {",
@@ -1719,22 +2244,22 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 #     ]
                 #     for pattern in alt_patterns:
                 #         if pattern in final_code:
-                #             self.gui.log(f"使用替代格式: {pattern}")
+                #             context.log(f"使用替代格式: {pattern}")
                 #             range_dim_parts = final_code.split(pattern)
                 #             if len(range_dim_parts) > 1:
                 #                 range_dim_and_after = range_dim_parts[1].split("};")
                 #                 range_dim_content = pattern + range_dim_and_after[0] + "};"
                 #                 after_range_dim = range_dim_and_after[1] if len(range_dim_and_after) > 1 else ""
                                 
-                #                 range_dim_result = self.process_range_dimensions(range_dim_content, selected_ranges, is_column_mode)
+                #                 range_dim_result = self.process_range_dimensions(context, range_dim_content, selected_ranges, is_column_mode)
                                 
                 #                 # 將處理後的範圍維度部分重新組合回代碼中
                 #                 final_code = range_dim_parts[0] + range_dim_result + after_range_dim
                 #                 break
             except Exception as e:
-                self.gui.log(f"處理範圍維度時出錯: {str(e)}")
+                context.log(f"處理範圍維度時出錯: {str(e)}")
                 import traceback
-                self.gui.log(traceback.format_exc())
+                context.log(traceback.format_exc())
         
         # 處理檔案循環
         if "{{FILES_LOOP_START}}" in final_code and "{{FILES_LOOP_END}}" in final_code:
@@ -1793,19 +2318,19 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                             loop_result = []
                             
                             # 檢查循環內容是否指定了讀取方向
-                            local_is_column_mode = self.check_direction_mode(loop_content) or is_column_mode
+                            local_is_column_mode = self.check_direction_mode(context, loop_content) or is_column_mode
                             
                             if local_is_column_mode:
                                 # 直向讀取 - 按列處理
                                 for col_idx in range(selected_data.shape[1]):
                                     column_data = selected_data.iloc[:, col_idx]
-                                    line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                                    line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                                     loop_result.append(line)
                             else:
                                 # 橫向讀取 - 按行處理
                                 for row_idx in range(selected_data.shape[0]):
                                     row_data = selected_data.iloc[row_idx, :]
-                                    line = self.process_row_data(row_data, loop_content, start_row, row_idx, end_row - start_row + 1)
+                                    line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, end_row - start_row + 1, selected_data)
                                     loop_result.append(line)
                             
                             # 組合該範圍的所有行
@@ -1833,10 +2358,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         
         return final_code
 
-    def process_multi_range_template(self, template, excel_files, dfs, selected_ranges, is_column_mode=False):
+    def process_multi_range_template(self, context, template, excel_files, dfs, selected_ranges, is_column_mode=False):
         """處理包含多个数据范围的模板"""
         if not selected_ranges or len(selected_ranges) < 1:
-            messagebox.showerror("錯誤", "需要選擇至少一個數據範圍來處理多範圍模板")
+            context.report_error("需要選擇至少一個數據範圍來處理多範圍模板")
             return template
         
         final_code = template
@@ -1880,7 +2405,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
                 
                 # 檢查循環內容是否指定了讀取方向
-                local_is_column_mode = self.check_direction_mode(loop_content) or is_column_mode
+                local_is_column_mode = self.check_direction_mode(context, loop_content) or is_column_mode
                 
                 # 生成循环代码
                 loop_result = []
@@ -1889,13 +2414,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                     # 直向讀取 - 按列處理
                     for col_idx in range(selected_data.shape[1]):
                         column_data = selected_data.iloc[:, col_idx]
-                        line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                        line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                         loop_result.append(line)
                 else:
                     # 橫向讀取 - 按行處理
                     for row_idx in range(selected_data.shape[0]):
                         row_data = selected_data.iloc[row_idx, :]
-                        line = self.process_row_data(row_data, loop_content, start_row, row_idx, end_row - start_row + 1)
+                        line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, end_row - start_row + 1, selected_data)
                         loop_result.append(line)
                 
                 # 更新代码
@@ -1926,7 +2451,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 after_loop = loop_and_after[1] if len(loop_and_after) > 1 else ""
                 
                 # 檢查循環內容是否指定了讀取方向
-                local_is_column_mode = self.check_direction_mode(loop_content) or is_column_mode
+                local_is_column_mode = self.check_direction_mode(context, loop_content) or is_column_mode
                 
                 # 处理循环
                 loop_result = []
@@ -1935,13 +2460,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                     # 直向讀取 - 按列處理
                     for col_idx in range(selected_data.shape[1]):
                         column_data = selected_data.iloc[:, col_idx]
-                        line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                        line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                         loop_result.append(line)
                 else:
                     # 橫向讀取 - 按行處理
                     for row_idx in range(selected_data.shape[0]):
                         row_data = selected_data.iloc[row_idx, :]
-                        line = self.process_row_data(row_data, loop_content, start_row, row_idx, end_row - start_row + 1)
+                        line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, end_row - start_row + 1, selected_data)
                         loop_result.append(line)
                 
                 # 更新代码
@@ -1949,7 +2474,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             
         return final_code
     
-    def process_3d_template(self, template, excel_files, dfs, start_row, start_col, end_row, end_col, file_count, row_count, is_column_mode=False):
+    def process_3d_template(self, context, template, excel_files, dfs, start_row, start_col, end_row, end_col, file_count, row_count, is_column_mode=False):
         """處理三維陣列樣板"""
         parts = template.split("{{FILES_LOOP_START}}")
         before_files_loop = parts[0]
@@ -1979,7 +2504,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 after_loop = loop_and_after[1] if len(loop_and_after) > 1 else ""
                 
                 # 檢查循環內容是否指定了讀取方向
-                local_is_column_mode = self.check_direction_mode(loop_content) or is_column_mode
+                local_is_column_mode = self.check_direction_mode(context, loop_content) or is_column_mode
                 
                 loop_result = []
                 
@@ -1987,13 +2512,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                     # 直向讀取 - 按列處理
                     for col_idx in range(selected_data.shape[1]):
                         column_data = selected_data.iloc[:, col_idx]
-                        line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                        line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                         loop_result.append(line)
                 else:
                     # 橫向讀取 - 按行處理
                     for row_idx in range(selected_data.shape[0]):
                         row_data = selected_data.iloc[row_idx, :]
-                        line = self.process_row_data(row_data, loop_content, start_row, row_idx, row_count)
+                        line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, row_count, selected_data)
                         loop_result.append(line)
                 
                 # 组合该文件的所有行
@@ -2009,7 +2534,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         # 组合最终代码
         return before_files_loop + "".join(files_result) + after_files_loop
     
-    def process_standard_template(self, template, excel_files, dfs, start_row, start_col, end_row, end_col, row_count, is_column_mode=False):
+    def process_standard_template(self, context, template, excel_files, dfs, start_row, start_col, end_row, end_col, row_count, is_column_mode=False):
         """處理標準樣板（單文件）"""
         # 使用第一个文件的数据
         first_file = excel_files[0]
@@ -2019,21 +2544,21 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         df = df.reset_index(drop=True)
         
         # 詳細輸出調試信息
-        self.gui.log(f"資料範圍詳情:")
-        self.gui.log(f"開始行: {start_row} (Excel行號: {start_row+1})")
-        self.gui.log(f"開始列: {start_col} (Excel列標: {self.get_column_letter(start_col)})")
-        self.gui.log(f"結束行: {end_row} (Excel行號: {end_row+1})")
-        self.gui.log(f"結束列: {end_col} (Excel列標: {self.get_column_letter(end_col)})")
-        self.gui.log(f"資料框形狀: {df.shape}")
-        self.gui.log(f"讀取方向: {'直向(Column)' if is_column_mode else '橫向(Row)'}")
+        context.log(f"資料範圍詳情:")
+        context.log(f"開始行: {start_row} (Excel行號: {start_row+1})")
+        context.log(f"開始列: {start_col} (Excel列標: {self.get_column_letter(start_col)})")
+        context.log(f"結束行: {end_row} (Excel行號: {end_row+1})")
+        context.log(f"結束列: {end_col} (Excel列標: {self.get_column_letter(end_col)})")
+        context.log(f"資料框形狀: {df.shape}")
+        context.log(f"讀取方向: {'直向(Column)' if is_column_mode else '橫向(Row)'}")
         
         # 處理範圍超出實際資料大小的情況
         if start_row < 0:
-            self.gui.log(f"警告: 起始行 {start_row} 不能為負數，已調整為 0")
+            context.log(f"警告: 起始行 {start_row} 不能為負數，已調整為 0")
             start_row = 0
         
         if start_col < 0:
-            self.gui.log(f"警告: 起始列 {start_col} 不能為負數，已調整為 0")
+            context.log(f"警告: 起始列 {start_col} 不能為負數，已調整為 0")
             start_col = 0
         
         # 調整結束索引以確保在有效範圍內
@@ -2042,21 +2567,21 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         
         # 檢查範圍是否有效
         if start_row > end_row or start_col > end_col:
-            self.gui.log(f"錯誤: 無效的範圍，起始位置 ({start_row}, {start_col}) 大於結束位置 ({end_row}, {end_col})")
+            context.log(f"錯誤: 無效的範圍，起始位置 ({start_row}, {start_col}) 大於結束位置 ({end_row}, {end_col})")
             return template
         
         try:
             # 提取所選範圍的資料
-            self.gui.log(f"嘗試提取範圍: 從 [{start_row}, {start_col}] 到 [{end_row}, {end_col}]")
+            context.log(f"嘗試提取範圍: 從 [{start_row}, {start_col}] 到 [{end_row}, {end_col}]")
             
             # 使用深拷貝避免修改原始資料
             selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1].copy()
             
-            self.gui.log(f"提取的資料形狀: {selected_data.shape}")
+            context.log(f"提取的資料形狀: {selected_data.shape}")
             if not selected_data.empty:
-                self.gui.log(f"提取的資料前3行:")
+                context.log(f"提取的資料前3行:")
                 for i in range(min(3, selected_data.shape[0])):
-                    self.gui.log(f"Row {i}: {selected_data.iloc[i].tolist()}")
+                    context.log(f"Row {i}: {selected_data.iloc[i].tolist()}")
             
             # 檢查循環內容是否指定了讀取方向
             local_is_column_mode = is_column_mode
@@ -2071,34 +2596,34 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                 after_loop = loop_and_after[1] if len(loop_and_after) > 1 else ""
                 
                 # 再次檢查循環內容中的方向標記
-                local_is_column_mode = self.check_direction_mode(loop_content) or local_is_column_mode
+                local_is_column_mode = self.check_direction_mode(context, loop_content) or local_is_column_mode
                 
                 loop_result = []
                 
                 if local_is_column_mode:
                     # 直向讀取模式 - 按列處理
-                    self.gui.log("使用直向讀取模式處理資料")
+                    context.log("使用直向讀取模式處理資料")
                     for col_idx in range(selected_data.shape[1]):
                         column_data = selected_data.iloc[:, col_idx]
-                        line = self.process_column_data(column_data, loop_content, start_col, col_idx, selected_data.shape[1])
+                        line = self.process_column_data(context, column_data, loop_content, start_col, col_idx, selected_data.shape[1], selected_data)
                         loop_result.append(line)
                 else:
                     # 橫向讀取模式 - 按行處理
-                    self.gui.log("使用橫向讀取模式處理資料")
+                    context.log("使用橫向讀取模式處理資料")
                     for row_idx in range(selected_data.shape[0]):
                         row_data = selected_data.iloc[row_idx, :]
-                        line = self.process_row_data(row_data, loop_content, start_row, row_idx, selected_data.shape[0])
+                        line = self.process_row_data(context, row_data, loop_content, start_row, row_idx, selected_data.shape[0], selected_data)
                         loop_result.append(line)
                 
                 return before_loop + "".join(loop_result) + after_loop
             else:
-                self.gui.log("警告: 模板中未找到循環標記 {{LOOP_START}} 和 {{LOOP_END}}")
+                context.log("警告: 模板中未找到循環標記 {{LOOP_START}} 和 {{LOOP_END}}")
                 return template
         
         except Exception as e:
-            self.gui.log(f"處理資料時出錯: {str(e)}")
+            context.log(f"處理資料時出錯: {str(e)}")
             import traceback
-            self.gui.log(traceback.format_exc())
+            context.log(traceback.format_exc())
             return template
 
     def get_column_letter(self, col_idx):
@@ -2110,7 +2635,88 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             result = chr(65 + remainder) + result
         return result
 
-    def process_row_data(self, row, loop_content, start_row, row_idx, row_count):
+    def get_region_cumulative(self, context, region, axis):
+        """
+        一次計算範圍中每行 (axis=1) 或每列 (axis=0) 的累積和並格式化
+        
+        同一範圍的各行共用同一次向量化計算的結果。numeric_memo 只保留最近一個範圍的結果
+        (範圍的各行依序處理)，不會讓處理過的範圍資料一直留在記憶體中。
+        
+        Returns:
+            tuple: (每行累積和的字串列表, 每行的文字儲存格數量)
+        """
+        entry = context.numeric_memo.get("cumulative")
+        if entry is None or entry[0] is not region or entry[1] != axis:
+            sums, text_counts = cumulative_sums(region, axis)
+            if axis == 0:
+                sums = sums.T
+            formatted = format_values(sums)
+            width = sums.shape[1]
+            lines = [formatted[index:index + width] for index in range(0, len(formatted), width)] if width else []
+            entry = (region, axis, lines, text_counts.tolist())
+            context.numeric_memo["cumulative"] = entry
+        return entry[2], entry[3]
+
+    def replace_cumulative_tags(self, context, line, region, axis, index, cumsum_tag, total_tag, label):
+        """
+        以範圍的向量化累積和替換累積和標記與總和標記
+        
+        Args:
+            region: 範圍資料
+            axis (int): 1 表示累加每行的各欄 (橫向)，0 表示累加每列的各行 (直向)
+            index (int): 當前行 (或列) 在範圍中的索引
+            cumsum_tag (str): 累積和標記，例如 {{ALL_COLUMNS_CUMSUM}}
+            total_tag (str): 總和標記，例如 {{ROW_TOTAL}}
+            label (str): 用於日誌的位置說明
+        """
+        if region.shape[axis] == 0:
+            context.log(f"警告: {label} 資料為空")
+            return line.replace(cumsum_tag, "0").replace(total_tag, "0")
+        
+        lines, text_counts = self.get_region_cumulative(context, region, axis)
+        if text_counts[index]:
+            context.log(f"警告: {label} 有 {text_counts[index]} 個非數值儲存格，累積和以 0 計算")
+        formatted = lines[index]
+        line = line.replace(cumsum_tag, ", ".join(formatted))
+        return line.replace(total_tag, formatted[-1])
+
+    def check_fixed_specs(self, context, content):
+        """檢查循環內容中定點數標記的比例，無效時回報錯誤並返回 False"""
+        for spec in dict.fromkeys(re.findall(r'{{ALL_(?:COLUMNS|ROWS)_FIXED:(\w+)}}', content)):
+            try:
+                parse_fixed_scale(spec)
+            except ValueError as e:
+                error = str(e)
+                break
+        else:
+            return True
+        context.report_error(error)
+        return False
+
+    def replace_fixed_tags(self, context, line, values, tag, label):
+        """
+        以定點整數替換循環中的定點數標記，例如 {{ALL_COLUMNS_FIXED:16}}
+        
+        Args:
+            values: 當前行 (或列) 的資料
+            tag (str): 標記名稱，例如 ALL_COLUMNS_FIXED
+            label (str): 用於錯誤訊息的位置說明
+        """
+        for spec in dict.fromkeys(re.findall(r'{{' + tag + r':(\w+)}}', line)):
+            numeric, text = numeric_array(values)
+            if text.any():
+                context.report_error(f"{label} 有非數值儲存格，無法轉為定點數")
+                continue
+            converted = self.convert_fixed_point(context, numeric, spec, label)
+            if converted is None:
+                continue
+            fixed, max_error, _, _ = converted
+            errors = context.fixed_point_errors
+            errors[spec] = max(errors.get(spec, 0.0), max_error)
+            line = line.replace(f"{{{{{tag}:{spec}}}}}", ", ".join(format_values(fixed)))
+        return line
+
+    def process_row_data(self, context, row, loop_content, start_row, row_idx, row_count, region=None):
         """
         處理單行資料的模板替換 (橫向讀取模式)
         
@@ -2120,10 +2726,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             start_row: 開始行索引
             row_idx: 當前行索引
             row_count: 總行數
+            region: 資料行所屬的範圍資料 (整個範圍一次計算累積和)，None 表示只有此行
                 
         Returns:
             str: 替換後的程式碼行
         """
+        context.row_rendered()
+        
         # 處理當前行
         line = loop_content
         
@@ -2139,7 +2748,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             
             # 檢查資料是否為空
             if len(row) == 0:
-                self.gui.log(f"警告: 行 {row_idx} 資料為空")
+                context.log(f"警告: 行 {row_idx} 資料為空")
                 line = line.replace("{{ALL_COLUMNS}}", "0")
             else:
                 # 列出所有資料
@@ -2167,7 +2776,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         all_values.append(str_value)
                         
                     except Exception as e:
-                        self.gui.log(f"處理行 {row_idx} 列 {col_idx} 時出錯: {str(e)}")
+                        context.log(f"處理行 {row_idx} 列 {col_idx} 時出錯: {str(e)}")
                         all_values.append("0")
                 
                 # 連接所有值，以逗號分隔
@@ -2177,6 +2786,24 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         # 處理 {{ALL_ROWS}} 標記 (在橫向讀取中不適用，保留為空字串)
         if "{{ALL_ROWS}}" in line:
             line = line.replace("{{ALL_ROWS}}", "/* ROW MODE: ALL_ROWS not applicable */")
+        if "{{ALL_ROWS_CUMSUM}}" in line or "{{COL_TOTAL}}" in line:
+            line = line.replace("{{ALL_ROWS_CUMSUM}}", "/* ROW MODE: ALL_ROWS_CUMSUM not applicable */")
+            line = line.replace("{{COL_TOTAL}}", "/* ROW MODE: COL_TOTAL not applicable */")
+        
+        # 處理累積和與總和標記 (加權隨機表可直接二分搜尋，不需在執行時加總)
+        if "{{ALL_COLUMNS_CUMSUM}}" in line or "{{ROW_TOTAL}}" in line:
+            if region is None:
+                region, row_idx_in_region = row.to_frame().T, 0
+            else:
+                row_idx_in_region = row_idx
+            line = self.replace_cumulative_tags(context, line, region, 1, row_idx_in_region,
+                                                "{{ALL_COLUMNS_CUMSUM}}", "{{ROW_TOTAL}}", f"行 {row_idx}")
+        
+        # 處理定點數標記
+        if "{{ALL_COLUMNS_FIXED:" in line:
+            line = self.replace_fixed_tags(context, line, row, "ALL_COLUMNS_FIXED", f"行 {row_idx}")
+        if "{{ALL_ROWS_FIXED:" in line:
+            line = re.sub(r'{{ALL_ROWS_FIXED:\w+}}', "/* ROW MODE: ALL_ROWS_FIXED not applicable */", line)
         
         # 處理 {{ROW:n}} 標記
         row_references = re.findall(r'{{ROW:(\d+)}}', line)
@@ -2194,8 +2821,8 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         (inner_value.replace('.', '', 1).isdigit() and inner_value.count('.') == 1):
                             ref_str = inner_value
                     line = line.replace(f"{{{{ROW:{ref}}}}}", ref_str)
-                    self.gui.log(f"ROW:{ref} = {ref_str}")
-                elif isinstance(row, (list, pd.Series)) and 0 <= ref_idx < len(row):
+                    context.log(f"ROW:{ref} = {ref_str}")
+                elif isinstance(row, list) and 0 <= ref_idx < len(row):
                     ref_value = row[ref_idx]
                     ref_str = format_cell_value(ref_value)
                     # 檢查並移除不必要的引號
@@ -2206,12 +2833,12 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         (inner_value.replace('.', '', 1).isdigit() and inner_value.count('.') == 1):
                             ref_str = inner_value
                     line = line.replace(f"{{{{ROW:{ref}}}}}", ref_str)
-                    self.gui.log(f"ROW:{ref} = {ref_str}")
+                    context.log(f"ROW:{ref} = {ref_str}")
                 else:
-                    self.gui.log(f"ROW:{ref} 超出範圍 (0-{len(row)-1})")
+                    context.log(f"ROW:{ref} 超出範圍 (0-{len(row)-1})")
                     line = line.replace(f"{{{{ROW:{ref}}}}}", "0")
             except Exception as e:
-                self.gui.log(f"處理 ROW:{ref} 時出錯: {str(e)}")
+                context.log(f"處理 ROW:{ref} 時出錯: {str(e)}")
                 line = line.replace(f"{{{{ROW:{ref}}}}}", "0")
         
         # 處理 {{COL:n}} 標記
@@ -2231,8 +2858,8 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         (inner_value.replace('.', '', 1).isdigit() and inner_value.count('.') == 1):
                             col_str = inner_value
                     line = line.replace(f"{{{{COL:{ref}}}}}", col_str)
-                    self.gui.log(f"COL:{ref} = {col_str}")
-                elif isinstance(row, (list, pd.Series)) and 0 <= ref_idx < len(row):
+                    context.log(f"COL:{ref} = {col_str}")
+                elif isinstance(row, list) and 0 <= ref_idx < len(row):
                     col_value = row[ref_idx]
                     col_str = format_cell_value(col_value)
                     # 檢查並移除不必要的引號
@@ -2243,12 +2870,12 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         (inner_value.replace('.', '', 1).isdigit() and inner_value.count('.') == 1):
                             col_str = inner_value
                     line = line.replace(f"{{{{COL:{ref}}}}}", col_str)
-                    self.gui.log(f"COL:{ref} = {col_str}")
+                    context.log(f"COL:{ref} = {col_str}")
                 else:
-                    self.gui.log(f"COL:{ref} 超出索引範圍 (0-{len(row.index)-1 if hasattr(row, 'index') else len(row)-1})")
+                    context.log(f"COL:{ref} 超出索引範圍 (0-{len(row.index)-1 if hasattr(row, 'index') else len(row)-1})")
                     line = line.replace(f"{{{{COL:{ref}}}}}", "0")
             except Exception as e:
-                self.gui.log(f"處理 COL:{ref} 時出錯: {str(e)}")
+                context.log(f"處理 COL:{ref} 時出錯: {str(e)}")
                 line = line.replace(f"{{{{COL:{ref}}}}}", "0")
         
         # 替換VALUE為第一個列的值
@@ -2268,10 +2895,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         str_value = inner_value
                 line = line.replace("{{VALUE}}", str_value)
             except Exception as e:
-                self.gui.log(f"處理 VALUE 時出錯: {str(e)}")
+                context.log(f"處理 VALUE 時出錯: {str(e)}")
                 line = line.replace("{{VALUE}}", "0")
         else:
-            self.gui.log("沒有資料可用於 VALUE")
+            context.log("沒有資料可用於 VALUE")
             line = line.replace("{{VALUE}}", "0")
         
         # 修改這一段逗號處理邏輯
@@ -2295,7 +2922,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         
         return line
 
-    def process_column_data(self, column, loop_content, start_col, col_idx, col_count):
+    def process_column_data(self, context, column, loop_content, start_col, col_idx, col_count, region=None):
         """
         處理單列資料的模板替換 (直向讀取模式)
         
@@ -2305,10 +2932,13 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             start_col: 開始列索引
             col_idx: 當前列索引
             col_count: 總列數
+            region: 資料列所屬的範圍資料 (整個範圍一次計算累積和)，None 表示只有此列
             
         Returns:
             str: 替換後的程式碼行
         """
+        context.row_rendered()
+        
         # 處理當前列
         line = loop_content
         
@@ -2324,7 +2954,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
             
             # 檢查資料是否為空
             if len(column) == 0:
-                self.gui.log(f"警告: 列 {col_idx} 資料為空")
+                context.log(f"警告: 列 {col_idx} 資料為空")
                 line = line.replace("{{ALL_ROWS}}", "0")
             else:
                 # 列出所有資料
@@ -2350,7 +2980,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         all_values.append(str_value)
                         
                     except Exception as e:
-                        self.gui.log(f"處理列 {col_idx} 行 {row_idx} 時出錯: {str(e)}")
+                        context.log(f"處理列 {col_idx} 行 {row_idx} 時出錯: {str(e)}")
                         all_values.append("0")
                 
                 # 連接所有值，以逗號分隔
@@ -2360,6 +2990,24 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
         # 處理 {{ALL_COLUMNS}} 標記 (在直向讀取中不適用，保留為空字串)
         if "{{ALL_COLUMNS}}" in line:
             line = line.replace("{{ALL_COLUMNS}}", "/* COLUMN MODE: ALL_COLUMNS not applicable */")
+        if "{{ALL_COLUMNS_CUMSUM}}" in line or "{{ROW_TOTAL}}" in line:
+            line = line.replace("{{ALL_COLUMNS_CUMSUM}}", "/* COLUMN MODE: ALL_COLUMNS_CUMSUM not applicable */")
+            line = line.replace("{{ROW_TOTAL}}", "/* COLUMN MODE: ROW_TOTAL not applicable */")
+        
+        # 處理累積和與總和標記
+        if "{{ALL_ROWS_CUMSUM}}" in line or "{{COL_TOTAL}}" in line:
+            if region is None:
+                region, col_idx_in_region = column.to_frame(), 0
+            else:
+                col_idx_in_region = col_idx
+            line = self.replace_cumulative_tags(context, line, region, 0, col_idx_in_region,
+                                                "{{ALL_ROWS_CUMSUM}}", "{{COL_TOTAL}}", f"列 {col_idx}")
+        
+        # 處理定點數標記
+        if "{{ALL_ROWS_FIXED:" in line:
+            line = self.replace_fixed_tags(context, line, column, "ALL_ROWS_FIXED", f"列 {col_idx}")
+        if "{{ALL_COLUMNS_FIXED:" in line:
+            line = re.sub(r'{{ALL_COLUMNS_FIXED:\w+}}', "/* COLUMN MODE: ALL_COLUMNS_FIXED not applicable */", line)
         
         # 處理 {{ROW:n}} 標記 - 直向讀取時，這表示第n個行的值
         row_references = re.findall(r'{{ROW:(\d+)}}', line)
@@ -2377,7 +3025,7 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         (inner_value.replace('.', '', 1).isdigit() and inner_value.count('.') == 1):
                             ref_str = inner_value
                     line = line.replace(f"{{{{ROW:{ref}}}}}", ref_str)
-                elif isinstance(column, (list, pd.Series)) and 0 <= ref_idx < len(column):
+                elif isinstance(column, list) and 0 <= ref_idx < len(column):
                     ref_value = column[ref_idx]
                     ref_str = format_cell_value(ref_value)
                     # 檢查並移除不必要的引號
@@ -2389,10 +3037,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                             ref_str = inner_value
                     line = line.replace(f"{{{{ROW:{ref}}}}}", ref_str)
                 else:
-                    self.gui.log(f"ROW:{ref} 超出範圍 (0-{len(column)-1})")
+                    context.log(f"ROW:{ref} 超出範圍 (0-{len(column)-1})")
                     line = line.replace(f"{{{{ROW:{ref}}}}}", "0")
             except Exception as e:
-                self.gui.log(f"處理 ROW:{ref} 時出錯: {str(e)}")
+                context.log(f"處理 ROW:{ref} 時出錯: {str(e)}")
                 line = line.replace(f"{{{{ROW:{ref}}}}}", "0")
         
         # 處理 {{COL:n}} 標記 - 直向讀取時不常用，但依然處理
@@ -2419,10 +3067,10 @@ int right_top_first_value = {{RANGE[右上]_VALUE[0,0]}};
                         str_value = inner_value
                 line = line.replace("{{VALUE}}", str_value)
             except Exception as e:
-                self.gui.log(f"處理 VALUE 時出錯: {str(e)}")
+                context.log(f"處理 VALUE 時出錯: {str(e)}")
                 line = line.replace("{{VALUE}}", "0")
         else:
-            self.gui.log("沒有資料可用於 VALUE")
+            context.log("沒有資料可用於 VALUE")
             line = line.replace("{{VALUE}}", "0")
         
         # 處理最後一列的逗號
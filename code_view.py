@@ -0,0 +1,94 @@
+"""
+生成程式碼的顯示元件
+
+多檔案的四維陣列等輸出可能有數 MB，一次插入 Text 元件會讓 Tk 主迴圈停頓數秒。
+ChunkedCodeView 保留完整的生成結果作為緩衝，並在閒置時分段插入元件；
+儲存與複製直接使用緩衝內容，不需要等待顯示完成。
+"""
+import tkinter as tk
+
+
+class ChunkedCodeView:
+    """
+    以分段插入方式顯示程式碼的 Text 元件包裝
+
+    Args:
+        root: Tk 根視窗 (用於排程)
+        text_widget: 顯示程式碼的 Text 元件
+        chunk_size (int): 每次插入的約略字元數 (會延伸到行尾)
+        read_only (bool): 顯示完成後是否保持唯讀
+    """
+
+    def __init__(self, root, text_widget, chunk_size=64 * 1024, read_only=False):
+        self.root = root
+        self.text_widget = text_widget
+        self.chunk_size = chunk_size
+        self.read_only = read_only
+        self._buffer = ""
+        self._position = 0
+        self._after_id = None
+        self._on_done = None
+
+    @property
+    def is_loading(self):
+        return self._after_id is not None
+
+    def set_text(self, text, on_done=None):
+        """
+        顯示新的程式碼內容 (僅限主執行緒)
+
+        Args:
+            text (str): 程式碼內容
+            on_done (callable): 全部內容顯示完成後呼叫
+        """
+        self._cancel()
+        self._buffer = text
+        self._position = 0
+        self._on_done = on_done
+
+        widget = self.text_widget
+        widget.config(state="normal")
+        widget.delete("1.0", tk.END)
+        # 顯示期間暫停編輯，避免使用者輸入與分段插入的內容交錯
+        widget.config(state="disabled")
+        self._after_id = self.root.after_idle(self._insert_next_chunk)
+
+    def _insert_next_chunk(self):
+        end = min(self._position + self.chunk_size, len(self._buffer))
+        if end < len(self._buffer):
+            newline = self._buffer.find("\n", end)
+            end = len(self._buffer) if newline == -1 else newline + 1
+
+        widget = self.text_widget
+        widget.config(state="normal")
+        widget.insert(tk.END, self._buffer[self._position:end])
+        self._position = end
+
+        if self._position < len(self._buffer):
+            widget.config(state="disabled")
+            self._after_id = self.root.after_idle(self._insert_next_chunk)
+            return
+
+        # 全部顯示完成，恢復可編輯並重設修改標記 (之後的修改來自使用者)
+        widget.edit_modified(False)
+        if self.read_only:
+            widget.config(state="disabled")
+        self._after_id = None
+        if self._on_done:
+            self._on_done()
+
+    def _cancel(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def get_text(self):
+        """
+        取得目前的程式碼內容
+
+        顯示尚未完成或使用者未修改時直接返回緩衝內容，
+        使用者在元件中編輯過則返回元件中的內容。
+        """
+        if self.is_loading or not self.text_widget.edit_modified():
+            return self._buffer
+        return self.text_widget.get("1.0", "end-1c")
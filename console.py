@@ -4,13 +4,13 @@ Allows generating code from Excel files using a config file without GUI.
 """
 
 import argparse
-import json
 import os
 import sys
 import logging
-import pandas as pd
-from code_generator import CodeGenerator
-from utils import load_config, excel_notation_to_index
+import excelcode
+from output_diff import diff_outputs, format_changes
+from output_writers import OUTPUT_FORMATS, DATA_FORMATS, write_output
+from render_cache import RenderCache
 
 # Configure logging
 logging.basicConfig(
@@ -20,191 +20,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ExcelCode-Console")
 
-class ConsoleModeHandler:
-    """Handle code generation in console mode"""
-    
-    def __init__(self):
-        """Initialize the console mode handler"""
-        self.excel_files = []
-        self.dfs = {}
-        self.selected_sheet = None
-        self.selected_range = None
-        self.selected_ranges = []
-        self.named_ranges = {}
-        self.code_template = None
-        self.template_direction = "row"  # Default direction
-        self.code_generator = CodeGenerator(self)
-    
-    def log(self, message):
-        """Log messages (compatibility with GUI version)"""
-        logger.info(message)
-    
-    def load_config_file(self, config_path):
-        """Load config from JSON file"""
-        logger.info(f"Loading config from: {config_path}")
-        
-        try:
-            # Load the config
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
-            
-            # Process named ranges first
-            if "named_ranges" in config_data:
-                self.named_ranges = config_data["named_ranges"]
-                logger.info(f"Loaded {len(self.named_ranges)} named ranges")
-            
-            # Process Excel files
-            if "excel_files" in config_data and config_data["excel_files"]:
-                # Filter out files that don't exist
-                existing_files = []
-                for file_path in config_data["excel_files"]:
-                    if os.path.exists(file_path):
-                        existing_files.append(file_path)
-                    else:
-                        logger.warning(f"Excel file not found: {file_path}")
-                
-                if not existing_files:
-                    logger.error("No valid Excel files found in config")
-                    return False
-                
-                self.excel_files = existing_files
-                logger.info(f"Found {len(self.excel_files)} valid Excel files")
-            else:
-                logger.error("No Excel files specified in config")
-                return False
-            
-            # Process selected sheet
-            if "selected_sheet" in config_data:
-                self.selected_sheet = config_data["selected_sheet"]
-                logger.info(f"Selected sheet: {self.selected_sheet}")
-            else:
-                logger.error("No sheet specified in config")
-                return False
-            
-            # Process selected ranges
-            if "selected_ranges" in config_data and config_data["selected_ranges"]:
-                self.selected_ranges = config_data["selected_ranges"]
-                self.selected_range = self.selected_ranges[0]  # For compatibility
-                range_strs = [r['range_str'] for r in self.selected_ranges]
-                logger.info(f"Loaded {len(self.selected_ranges)} ranges: {', '.join(range_strs)}")
-            elif self.named_ranges:
-                # Convert named ranges to selected ranges
-                logger.info("Creating ranges from named ranges...")
-                for name, range_str in self.named_ranges.items():
-                    try:
-                        start, end = range_str.split(":")
-                        start_row, start_col = excel_notation_to_index(start)
-                        end_row, end_col = excel_notation_to_index(end)
-                        
-                        range_info = {
-                            'start_row': start_row,
-                            'start_col': start_col,
-                            'end_row': end_row,
-                            'end_col': end_col,
-                            'range_str': range_str
-                        }
-                        self.selected_ranges.append(range_info)
-                        logger.info(f"Created range from '{name}': {range_str}")
-                    except Exception as e:
-                        logger.error(f"Error processing range {name}: {str(e)}")
-                
-                if self.selected_ranges:
-                    self.selected_range = self.selected_ranges[0]
-            else:
-                logger.error("No ranges specified in config and no named ranges available")
-                return False
-            
-            # Process template
-            if "template_type" in config_data:
-                template_type = config_data["template_type"]
-                
-                if template_type == "custom" and "code_template" in config_data:
-                    self.code_template = config_data["code_template"]
-                    logger.info("Loaded custom template")
-                elif template_type == "preset" and "preset_template" in config_data:
-                    preset_name = config_data["preset_template"]
-                    self.code_template = self.code_generator.get_default_template(preset_name)
-                    logger.info(f"Using preset template: {preset_name}")
-                else:
-                    logger.error("Invalid template configuration")
-                    return False
-            elif "code_template" in config_data:  # Backwards compatibility
-                self.code_template = config_data["code_template"]
-                logger.info("Loaded template from config")
-            else:
-                logger.error("No template specified in config")
-                return False
-            
-            # Process direction if available
-            if "template_direction" in config_data:
-                self.template_direction = config_data["template_direction"]
-                logger.info(f"Template direction set to: {self.template_direction}")
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error loading config: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return False
-    
-    def load_excel_data(self):
-        """Load Excel files and selected sheet data"""
-        logger.info("Loading Excel data...")
-        
-        try:
-            for file_path in self.excel_files:
-                logger.info(f"Processing file: {os.path.basename(file_path)}")
-                
-                # Read all data as object first, then convert to numeric where possible
-                df = pd.read_excel(file_path, sheet_name=self.selected_sheet, dtype=object, header=None)
-                
-                # Try to convert numeric columns
-                df = df.apply(pd.to_numeric, errors='ignore')
-                
-                # Reset index to ensure it starts from 0
-                df = df.reset_index(drop=True)
-                
-                logger.info(f"DataFrame shape: {df.shape}")
-                self.dfs[file_path] = df
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error loading Excel data: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return False
-    
-    def generate_code(self):
-        """Generate code based on loaded data and template"""
-        logger.info("Generating code...")
-        
-        try:
-            # Check if we have everything we need
-            has_valid_range = (self.selected_range is not None) or (len(self.selected_ranges) > 0)
-            
-            if not has_valid_range or not self.code_template or not self.excel_files:
-                logger.error("Missing required data for code generation")
-                return None
-            
-            # Generate the code
-            final_code = self.code_generator.generate_code(
-                self.excel_files, 
-                self.dfs, 
-                self.selected_ranges, 
-                self.code_template, 
-                self.selected_range
-            )
-            
-            logger.info("Code generation completed successfully")
-            return final_code
-            
-        except Exception as e:
-            logger.error(f"Error generating code: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return None
+def log_request(request):
+    """Log a summary of the loaded generation request"""
+    if request.named_ranges:
+        logger.info(f"Loaded {len(request.named_ranges)} named ranges")
+    logger.info(f"Found {len(request.excel_files)} valid Excel files")
+    logger.info(f"Selected sheet: {request.selected_sheet}")
+    range_strs = [r['range_str'] for r in request.selected_ranges]
+    logger.info(f"Loaded {len(request.selected_ranges)} ranges: {', '.join(range_strs)}")
+    logger.info(f"Template direction set to: {request.template_direction}")
+    if request.output_format != "text":
+        logger.info(f"Output format: {request.output_format} {request.output_options or ''}")
+
+def log_write_results(results):
+    """Log which output files were rewritten"""
+    for path, changed in results:
+        if changed:
+            logger.info(f"Code saved to {path} (changed)")
+        else:
+            logger.info(f"Output is up to date, not rewritten: {path} (unchanged)")
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -212,6 +46,22 @@ def parse_arguments():
     parser.add_argument('--config', '-c', required=True, help='Path to config JSON file')
     parser.add_argument('--output', '-o', help='Output file path (if not specified, prints to stdout)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--cache-dir', help='Directory for the content-addressed render cache (disabled if not specified)')
+    parser.add_argument('--pipeline', type=int, nargs='?', const=2, default=0, metavar='N',
+                        help='Overlap workbook loading with rendering, parsing up to N files ahead (default 2)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read each workbook once, in order, and release it after use to keep memory flat '
+                             '(templates that read the workbooks more than once are refused)')
+    parser.add_argument('--diff-against', metavar='PREVIOUS',
+                        help='Report which blocks changed compared to a previously generated file')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS,
+                        help='Output format (overrides "output_format" in the config; default text)')
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help='Number of .c shards for the shards output format (overrides "shard_count")')
+    parser.add_argument('--delimiter',
+                        help='Field delimiter for the csv output format, e.g. "\\t" for TSV (overrides "delimiter")')
+    parser.add_argument('--orientation', choices=('row', 'column'),
+                        help='Write each range row or each range column as one csv line (overrides "orientation")')
     
     return parser.parse_args()
 
@@ -228,31 +78,82 @@ def main():
         logger.error(f"Config file not found: {args.config}")
         return 1
     
-    # Initialize handler
-    handler = ConsoleModeHandler()
+    # Enable render cache if requested
+    render_cache = None
+    if args.cache_dir:
+        render_cache = RenderCache(args.cache_dir)
+        logger.info(f"Render cache enabled: {args.cache_dir}")
     
-    # Load config
-    if not handler.load_config_file(args.config):
-        logger.error("Failed to load configuration")
+    try:
+        # Load config
+        logger.info(f"Loading config from: {args.config}")
+        request = excelcode.load_config(args.config)
+        if args.output_format:
+            request.output_format = args.output_format
+        if args.shards is not None:
+            request.output_options["shard_count"] = args.shards
+        if args.delimiter is not None:
+            request.output_options["delimiter"] = args.delimiter.replace("\\t", "\t")
+        if args.orientation:
+            request.output_options["orientation"] = args.orientation
+        log_request(request)
+        if request.output_format != "text" and not args.output:
+            logger.error(f"Output format '{request.output_format}' requires --output")
+            return 1
+        
+        # Load Excel data (pipelined mode loads files while rendering)
+        dfs = None
+        if args.stream:
+            logger.info("Streaming mode enabled: each workbook is released after use")
+        elif args.pipeline:
+            logger.info(f"Pipelined loading enabled (prefetch {args.pipeline} files)")
+        else:
+            logger.info("Loading Excel data...")
+            dfs = excelcode.load_workbooks(request.excel_files, request.selected_sheet)
+        
+        # Data formats are written straight from the ranges without rendering the template
+        if request.output_format in DATA_FORMATS:
+            if args.diff_against:
+                logger.warning(f"--diff-against is ignored for the {request.output_format} output format")
+            logger.info(f"Exporting data as {request.output_format}...")
+            results = excelcode.export(request, args.output, dfs=dfs, log_function=logger.info)
+            log_write_results(results)
+            logger.info("Done")
+            return 0
+        
+        # Generate code
+        logger.info("Generating code...")
+        generated_code = excelcode.render(request, dfs=dfs, render_cache=render_cache,
+                                          log_function=logger.info, prefetch=args.pipeline,
+                                          stream=args.stream)
+        logger.info("Code generation completed successfully")
+    except excelcode.GenerationError as e:
+        logger.error(str(e))
+        logger.error("Failed to generate code")
         return 1
     
-    # Load Excel data
-    if not handler.load_excel_data():
-        logger.error("Failed to load Excel data")
-        return 1
+    if render_cache is not None:
+        logger.info(f"Render cache: {render_cache.hits} hits, {render_cache.misses} misses")
     
-    # Generate code
-    generated_code = handler.generate_code()
-    if generated_code is None:
-        logger.error("Failed to generate code")
-        return 1
+    # Compare with the previous output before it may be overwritten
+    if args.diff_against:
+        try:
+            with open(args.diff_against, 'r', encoding='utf-8') as f:
+                previous_code = f.read()
+        except OSError as e:
+            logger.warning(f"Cannot read previous output for diff: {str(e)}")
+        else:
+            changes = diff_outputs(previous_code, generated_code)
+            logger.info(f"Diff against {args.diff_against}: {len(changes)} changed blocks")
+            for line in format_changes(changes).splitlines():
+                logger.info(line)
     
     # Output the generated code
     if args.output:
         try:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(generated_code)
-            logger.info(f"Code saved to {args.output}")
+            results = write_output(generated_code, args.output, request.output_format,
+                                   request.output_options, log_function=logger.info)
+            log_write_results(results)
         except Exception as e:
             logger.error(f"Error saving code to file: {str(e)}")
             return 1
@@ -0,0 +1,176 @@
+"""
+虛擬化資料表格預覽
+
+只繪製目前可見範圍內的儲存格，捲動時才從資料框取出對應的值，
+預覽數千行的範圍或整個工作表也不需要先將資料轉為字串。
+"""
+import tkinter as tk
+from tkinter import ttk
+
+from utils import get_column_letter
+
+
+def cell_text(value):
+    """將儲存格值轉為顯示字串 (空白儲存格顯示為空字串)"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+
+class DataGrid(ttk.Frame):
+    """
+    以 Canvas 繪製可見區域的資料表格，列標題與欄標題使用 Excel 標記
+
+    Args:
+        parent: 父元件
+        cell_width (int): 儲存格寬度 (像素)
+        row_height (int): 列高 (像素)
+        header_width (int): 左側列號欄寬度 (像素)
+        font: 顯示字型
+    """
+
+    def __init__(self, parent, cell_width=90, row_height=20, header_width=56, font=("Courier New", 9)):
+        super().__init__(parent)
+        self.cell_width = cell_width
+        self.row_height = row_height
+        self.header_width = header_width
+        self.font = font
+
+        self.df = None
+        self.start_row = 0
+        self.start_col = 0
+        self.row_count = 0
+        self.col_count = 0
+        self.top_row = 0  # 目前顯示的第一列 (相對於範圍起點)
+        self.left_col = 0  # 目前顯示的第一欄 (相對於範圍起點)
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        self.v_scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.h_scrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.xview)
+
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.v_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.h_scrollbar.grid(row=1, column=0, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Shift-MouseWheel>", self._on_shift_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+
+    def set_data(self, df, start_row=0, start_col=0, end_row=None, end_col=None):
+        """
+        設定要顯示的資料範圍 (不複製資料，只記錄範圍)
+
+        Args:
+            df: 資料框
+            start_row, start_col: 範圍起點索引
+            end_row, end_col: 範圍終點索引 (包含)，None 表示到資料結尾
+        """
+        self.df = df
+        self.start_row = start_row
+        self.start_col = start_col
+        if end_row is None:
+            end_row = df.shape[0] - 1
+        if end_col is None:
+            end_col = df.shape[1] - 1
+        self.row_count = max(end_row - start_row + 1, 0)
+        self.col_count = max(end_col - start_col + 1, 0)
+        self.top_row = 0
+        self.left_col = 0
+        self.redraw()
+
+    def clear(self):
+        """清除顯示的資料"""
+        self.df = None
+        self.row_count = 0
+        self.col_count = 0
+        self.redraw()
+
+    def _visible_rows(self):
+        return max((self.canvas.winfo_height() - self.row_height) // self.row_height, 1)
+
+    def _visible_cols(self):
+        return max((self.canvas.winfo_width() - self.header_width) // self.cell_width, 1)
+
+    @staticmethod
+    def _scroll_target(args, current, total, visible):
+        """依捲軸指令計算新的起始位置"""
+        if args[0] == "moveto":
+            position = int(float(args[1]) * total)
+        else:
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= max(visible - 1, 1)
+            position = current + amount
+        return max(0, min(position, max(total - visible, 0)))
+
+    def yview(self, *args):
+        self.top_row = self._scroll_target(args, self.top_row, self.row_count, self._visible_rows())
+        self.redraw()
+
+    def xview(self, *args):
+        self.left_col = self._scroll_target(args, self.left_col, self.col_count, self._visible_cols())
+        self.redraw()
+
+    def _on_mousewheel(self, event):
+        self.yview("scroll", -3 if event.delta > 0 else 3, "units")
+
+    def _on_shift_mousewheel(self, event):
+        self.xview("scroll", -1 if event.delta > 0 else 1, "units")
+
+    def _update_scrollbars(self, visible_rows, visible_cols):
+        if self.row_count:
+            self.v_scrollbar.set(self.top_row / self.row_count,
+                                 min((self.top_row + visible_rows) / self.row_count, 1.0))
+        else:
+            self.v_scrollbar.set(0.0, 1.0)
+        if self.col_count:
+            self.h_scrollbar.set(self.left_col / self.col_count,
+                                 min((self.left_col + visible_cols) / self.col_count, 1.0))
+        else:
+            self.h_scrollbar.set(0.0, 1.0)
+
+    def redraw(self):
+        """重新繪製可見區域"""
+        canvas = self.canvas
+        canvas.delete("all")
+
+        visible_rows = self._visible_rows()
+        visible_cols = self._visible_cols()
+        self._update_scrollbars(visible_rows, visible_cols)
+        if self.df is None or not self.row_count or not self.col_count:
+            return
+
+        last_row = min(self.top_row + visible_rows + 1, self.row_count)
+        last_col = min(self.left_col + visible_cols + 1, self.col_count)
+        max_chars = max(self.cell_width // 7 - 1, 1)
+        df_rows, df_cols = self.df.shape
+
+        # 欄標題 (Excel 欄標記)
+        for screen_col, col in enumerate(range(self.left_col, last_col)):
+            x = self.header_width + screen_col * self.cell_width
+            canvas.create_rectangle(x, 0, x + self.cell_width, self.row_height, fill="#e8e8e8", outline="#b0b0b0")
+            canvas.create_text(x + self.cell_width // 2, self.row_height // 2,
+                               text=get_column_letter(self.start_col + col), font=self.font)
+
+        for screen_row, row in enumerate(range(self.top_row, last_row)):
+            y = (screen_row + 1) * self.row_height
+            df_row = self.start_row + row
+
+            # 列標題 (Excel 列號，從 1 開始)
+            canvas.create_rectangle(0, y, self.header_width, y + self.row_height, fill="#e8e8e8", outline="#b0b0b0")
+            canvas.create_text(self.header_width // 2, y + self.row_height // 2, text=str(df_row + 1), font=self.font)
+
+            for screen_col, col in enumerate(range(self.left_col, last_col)):
+                x = self.header_width + screen_col * self.cell_width
+                df_col = self.start_col + col
+                text = ""
+                if df_row < df_rows and df_col < df_cols:
+                    text = cell_text(self.df.iat[df_row, df_col])
+                    if len(text) > max_chars:
+                        text = text[:max_chars - 1] + "…"
+                canvas.create_rectangle(x, y, x + self.cell_width, y + self.row_height, outline="#d8d8d8")
+                canvas.create_text(x + 4, y + self.row_height // 2, text=text, anchor="w", font=self.font)
@@ -0,0 +1,308 @@
+"""
+Excel 工作表資料載入
+
+GUI、console 與程式庫模式共用的載入邏輯。pandas 只在實際讀取資料時才匯入，
+讓只需要生成核心的工具可以快速啟動。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+
+def convert_to_numeric(column):
+    """嘗試將欄位轉為數值類型，無法轉換時保持原樣 (避免使用已棄用的 errors='ignore')"""
+    import pandas as pd
+    try:
+        return pd.to_numeric(column)
+    except (ValueError, TypeError):
+        return column
+
+
+def load_sheet(file_path, sheet_name):
+    """
+    讀取單一檔案的工作表資料
+
+    先用 object 讀取所有數據，再嘗試轉換為數值類型，並重置索引確保從 0 開始連續
+
+    Args:
+        file_path (str): Excel 檔案路徑
+        sheet_name (str): 工作表名稱
+
+    Returns:
+        DataFrame: 工作表資料 (無標題列)
+    """
+    import pandas as pd
+    df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=object, header=None)
+    df = df.apply(convert_to_numeric)
+    return df.reset_index(drop=True)
+
+
+def get_sheet_names(file_path):
+    """取得 Excel 檔案中的工作表名稱列表"""
+    import pandas as pd
+    with pd.ExcelFile(file_path) as xl:
+        return xl.sheet_names
+
+
+def preload_modules(log_function=None):
+    """
+    預先匯入讀取 Excel 所需的模組 (可在背景執行緒中呼叫)
+
+    GUI 啟動時先顯示視窗，再於背景匯入 pandas、numpy 與 openpyxl，
+    使用者選擇檔案時通常已匯入完成；若尚未完成，載入會等待同一個匯入而不會重複匯入。
+    """
+    start = time.perf_counter()
+    try:
+        import numpy  # noqa: F401
+        import pandas  # noqa: F401
+        import openpyxl  # noqa: F401
+    except ImportError as e:
+        if log_function:
+            log_function(f"預先匯入模組失敗: {str(e)}")
+        return
+    if log_function:
+        log_function(f"資料處理模組已在背景載入 ({time.perf_counter() - start:.2f} 秒)")
+
+
+def estimate_frame_bytes(df):
+    """估計資料框佔用的記憶體 (包含 object 欄位中的字串)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class WorkbookCache:
+    """
+    以估計記憶體大小為上限的工作表資料 LRU 快取 (可從任何執行緒使用)
+
+    鍵為 (檔案路徑, 工作表)，並記錄載入時檔案的修改時間，檔案被修改後會重新載入。
+    加入新資料後若總大小超過上限，會從最久未使用的項目開始釋放；
+    最近加入的項目一定保留，即使單一工作表就超過上限。
+
+    快取只是保留參照，正在使用中的資料框 (例如 gui.dfs) 被釋放後仍可使用，
+    只是下次切換回來時需要重新載入。
+
+    Args:
+        max_bytes (int): 快取資料的估計大小上限
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (檔案路徑, 工作表) -> (修改時間, 資料框, 估計大小)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _make_key(file_path, sheet_name):
+        return (os.path.abspath(file_path), sheet_name)
+
+    def get(self, file_path, sheet_name):
+        """
+        取得工作表資料，未快取或檔案已修改時載入
+
+        Returns:
+            DataFrame: 工作表資料 (與 load_sheet 相同)
+        """
+        key = self._make_key(file_path, sheet_name)
+        mtime = os.path.getmtime(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # 在鎖外載入，避免長時間的讀取阻擋其他執行緒查詢快取
+        df = load_sheet(file_path, sheet_name)
+        size = estimate_frame_bytes(df)
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.total_bytes -= old_entry[2]
+            self._entries[key] = (mtime, df, size)
+            self.total_bytes += size
+            self._evict()
+        return df
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def set_max_bytes(self, max_bytes):
+        """變更大小上限，並立即釋放超出的項目"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """
+        釋放所有快取的資料
+
+        Returns:
+            int: 釋放的估計大小
+        """
+        with self._lock:
+            freed = self.total_bytes
+            self._entries.clear()
+            self.total_bytes = 0
+        return freed
+
+    def usage(self):
+        """返回 (估計總大小, 快取的工作表數)"""
+        with self._lock:
+            return self.total_bytes, len(self._entries)
+
+
+class ReleasedFrameError(RuntimeError):
+    """串流模式下再次讀取已釋放且不允許重新載入的檔案"""
+
+
+class PrefetchingFrames(Mapping):
+    """
+    在背景執行緒依檔案順序預先載入工作表的唯讀對應 (檔案路徑 -> 資料框)
+
+    生成程式碼時只需要以 dfs[file_path] 取用資料，因此可直接取代一般的 dfs 字典：
+    渲染第 k 個檔案時，第 k+1 個檔案已在背景解析，總時間接近 max(載入, 渲染)
+    而不是兩者相加。背景載入最多領先取用位置 max_ahead 個檔案 (有界佇列)，
+    輸出順序仍由生成器決定，不受載入完成順序影響。
+
+    release_consumed 為 True 時 (串流模式)，取用第 k 個檔案後即釋放之前檔案的資料，
+    記憶體中最多只保留 max_ahead + 1 個資料框，峰值記憶體不隨檔案數量增加；
+    每釋放一個檔案呼叫一次 on_release(檔案路徑)，讓生成內容一併丟棄該檔案的暫存資料。
+    樣板再次讀取已釋放的檔案時會重新載入；allow_reload 為 False 時改為記錄在
+    refused_reloads 並引發 ReleasedFrameError。
+
+    Args:
+        excel_files (list): Excel 檔案路徑列表 (載入順序)
+        sheet_name (str): 工作表名稱
+        max_ahead (int): 最多預先載入的檔案數
+        log_function (callable): 記錄載入進度的函數
+        release_consumed (bool): 是否釋放已處理檔案的資料
+        allow_reload (bool): 是否允許重新載入已釋放的檔案
+        on_release (callable): 檔案釋放時呼叫的函數，參數為檔案路徑
+    """
+
+    def __init__(self, excel_files, sheet_name, max_ahead=2, log_function=None, release_consumed=False,
+                 allow_reload=True, on_release=None):
+        self.excel_files = list(dict.fromkeys(excel_files))
+        self.sheet_name = sheet_name
+        self.max_ahead = max(1, max_ahead)
+        self.log_function = log_function
+        self.release_consumed = release_consumed
+        self.allow_reload = allow_reload
+        self.on_release = on_release
+        self.reload_count = 0
+        self.refused_reloads = []  # allow_reload 為 False 時被拒絕重新載入的檔案
+        self._released = 0  # 已通知釋放的檔案數 (依載入順序)
+        self._positions = {file_path: index for index, file_path in enumerate(self.excel_files)}
+        self._frames = {}
+        self._errors = {}
+        self._requested = -1  # 目前被取用的最大檔案索引
+        self._produced = 0  # 背景執行緒已處理的檔案數
+        self._reloaded = None  # 最近一次重新載入的 (檔案路徑, 資料框)
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _log(self, message):
+        if self.log_function:
+            self.log_function(message)
+
+    def _produce(self):
+        """背景載入執行緒"""
+        for index, file_path in enumerate(self.excel_files):
+            with self._condition:
+                while not self._closed and index > self._requested + self.max_ahead:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+            try:
+                df = load_sheet(file_path, self.sheet_name)
+                self._log(f"預先載入檔案: {os.path.basename(file_path)} (資料框形狀: {df.shape})")
+            except Exception as e:
+                with self._condition:
+                    self._errors[file_path] = e
+                    self._produced = index + 1
+                    self._condition.notify_all()
+                continue
+
+            with self._condition:
+                # 串流模式下，取用位置已超過此檔案時不再保留
+                if not (self.release_consumed and index < self._requested):
+                    self._frames[file_path] = df
+                self._produced = index + 1
+                self._condition.notify_all()
+
+    def __getitem__(self, file_path):
+        index = self._positions[file_path]
+        released_paths = []
+        with self._condition:
+            if index > self._requested:
+                self._requested = index
+                self._condition.notify_all()
+            if self.release_consumed:
+                for released_path in [path for path in self._frames if self._positions[path] < index]:
+                    del self._frames[released_path]
+                if self._reloaded is not None and self._positions[self._reloaded[0]] < index:
+                    self._reloaded = None
+                if index > self._released:
+                    released_paths = self.excel_files[self._released:index]
+                    self._released = index
+
+        # 在鎖外通知，回呼可能需要較長時間
+        if self.on_release is not None:
+            for released_path in released_paths:
+                self.on_release(released_path)
+
+        with self._condition:
+            while (file_path not in self._frames and file_path not in self._errors
+                   and index >= self._produced):
+                self._condition.wait()
+            if file_path in self._errors:
+                raise self._errors[file_path]
+            if file_path in self._frames:
+                return self._frames[file_path]
+            if self._reloaded is not None and self._reloaded[0] == file_path:
+                return self._reloaded[1]
+
+        if not self.allow_reload:
+            with self._condition:
+                self.refused_reloads.append(file_path)
+            raise ReleasedFrameError(f"檔案資料已釋放，不可重新載入: {os.path.basename(file_path)}")
+
+        # 資料已釋放，重新載入 (不佔用預先載入的名額)
+        df = load_sheet(file_path, self.sheet_name)
+        self._log(f"重新載入已釋放的檔案: {os.path.basename(file_path)}")
+        with self._condition:
+            self.reload_count += 1
+            self._reloaded = (file_path, df)
+        return df
+
+    @property
+    def errors(self):
+        """載入失敗的檔案 {檔案路徑: 例外}"""
+        with self._condition:
+            return dict(self._errors)
+
+    def __iter__(self):
+        return iter(self.excel_files)
+
+    def __len__(self):
+        return len(self.excel_files)
+
+    def close(self):
+        """停止背景載入並釋放資料"""
+        with self._condition:
+            self._closed = True
+            self._frames.clear()
+            self._reloaded = None
+            self._condition.notify_all()
+        self._thread.join()
@@ -1,11 +1,12 @@
-import pandas as pd
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkinter.scrolledtext import ScrolledText
 import threading
 import re
-from utils import excel_notation_to_index
+from utils import excel_notation_to_index, get_column_letter
+from data_grid import DataGrid
+from data_loader import get_sheet_names
 
 class ExcelHandler:
     def __init__(self, gui_instance):
@@ -23,8 +24,7 @@ class ExcelHandler:
                     self.gui.root.after(0, self.gui.hide_loading_screen)
                     return
                         
-                xl = pd.ExcelFile(excel_files[0])
-                sheets = xl.sheet_names
+                sheets = get_sheet_names(excel_files[0])
                 
                 # 在主線程中更新UI
                 self.gui.root.after(0, lambda: self.gui.sheet_combobox.config(values=sheets, state="readonly"))
@@ -58,67 +58,60 @@ class ExcelHandler:
         if selected_sheet:
             self.gui.show_loading_screen("正在讀取所選工作表中的數據...")
             
-            def load_data_task():
-                success = False  # Track if data loading was successful
-                try:
-                    # Load each selected file's worksheet
-                    for file_path in self.gui.excel_files:
-                        # Read all data as object first, then convert to numeric where possible
-                        df = pd.read_excel(file_path, sheet_name=selected_sheet, dtype=object, header=None)
-                        # Try to convert numeric columns
-                        df = df.apply(pd.to_numeric, errors='ignore')
-                        # Reset index to ensure it starts from 0
-                        df = df.reset_index(drop=True)
-                        
-                        # Log data frame information
-                        self.gui.log(f"讀取檔案: {os.path.basename(file_path)}")
-                        self.gui.log(f"資料框形狀: {df.shape}")
-                        self.gui.log(f"資料框欄位: {df.columns.tolist()}")
-                        self.gui.log(f"資料範例 (前3行):\n{df.head(3)}")
-                        
-                        self.gui.dfs[file_path] = df
+            excel_files = list(self.gui.excel_files)
+            
+            def load_data_task(token):
+                # 載入到新的字典，完成後才在主執行緒中取代 gui.dfs，避免多個載入互相覆寫
+                dfs = {}
+                for index, file_path in enumerate(excel_files):
+                    token.check()
+                    token.report(f"讀取檔案 {index + 1}/{len(excel_files)}: {os.path.basename(file_path)}",
+                                 index / len(excel_files))
                     
-                    success = True  # Mark loading as successful
+                    # Read all data as object first, then convert to numeric where possible
+                    # (cached sheets are reused until the file changes or they are evicted)
+                    df = self.gui.workbook_cache.get(file_path, selected_sheet)
                     
-                except Exception as e:
-                    self.gui.root.after(0, lambda: messagebox.showerror("錯誤", f"無法讀取工作表: {str(e)}"))
-                    # 顯示詳細錯誤
-                    import traceback
-                    self.gui.log(traceback.format_exc())
-                finally:
-                    # Always run UI updates in the main thread
-                    def update_ui():
-                        if success:
-                            # Enable range management explicitly
-                            self.gui.range_manager_btn.config(state="normal")
-                            self.gui.log("已啟用範圍管理按鈕")
-                            
-                            # Update other UI elements
-                            self.gui.range_label.config(text="尚未選擇範圍")
-                            self.gui.view_data_btn.config(state="disabled")
-                            self.gui.template_btn.config(state="disabled")
-                            self.gui.template_combo.config(state="disabled")
-                            self.gui.import_template_btn.config(state="disabled")
-                            self.gui.manage_templates_btn.config(state="disabled")
-                            self.gui.generate_button.config(state="disabled")
-                            
-                            # Clear previous ranges
-                            self.gui.selected_range = None
-                            self.gui.selected_ranges = []
-                        else:
-                            # If loading failed, ensure button stays disabled
-                            self.gui.range_manager_btn.config(state="disabled")
-                        
-                        # Always hide the loading screen
-                        self.gui.hide_loading_screen()
+                    # Log data frame information
+                    self.gui.log(f"讀取檔案: {os.path.basename(file_path)}")
+                    self.gui.log(f"資料框形狀: {df.shape}")
+                    self.gui.log(f"資料框欄位: {df.columns.tolist()}")
+                    self.gui.log(f"資料範例 (前3行):\n{df.head(3)}")
                     
-                    # Schedule UI updates on the main thread
-                    self.gui.root.after(0, update_ui)
+                    dfs[file_path] = df
+                return dfs
+            
+            def on_loaded(dfs):
+                self.gui.dfs = dfs
+                
+                # Enable range management explicitly
+                self.gui.range_manager_btn.config(state="normal")
+                self.gui.log("已啟用範圍管理按鈕")
+                
+                # Update other UI elements
+                self.gui.range_label.config(text="尚未選擇範圍")
+                self.gui.view_data_btn.config(state="disabled")
+                self.gui.template_btn.config(state="disabled")
+                self.gui.template_combo.config(state="disabled")
+                self.gui.import_template_btn.config(state="disabled")
+                self.gui.manage_templates_btn.config(state="disabled")
+                self.gui.generate_button.config(state="disabled")
+                
+                # Clear previous ranges
+                self.gui.selected_range = None
+                self.gui.selected_ranges = []
+            
+            def on_load_error(e):
+                messagebox.showerror("錯誤", f"無法讀取工作表: {str(e)}")
+                # 顯示詳細錯誤
+                import traceback
+                self.gui.log("".join(traceback.format_exception(e)))
+                # If loading failed, ensure button stays disabled
+                self.gui.range_manager_btn.config(state="disabled")
             
-            # 使用新的線程執行耗時的數據讀取操作
-            thread = threading.Thread(target=load_data_task)
-            thread.daemon = True
-            thread.start()
+            # 在背景執行耗時的數據讀取操作，快速切換工作表時會自動取消先前的載入
+            self.gui.task_runner.submit(load_data_task, on_success=on_loaded, on_error=on_load_error,
+                                        on_finally=self.gui.hide_loading_screen)
     
     def select_multiple_ranges(self):
         """選擇多個數據範圍"""
@@ -289,14 +282,7 @@ class ExcelHandler:
         
     def get_column_letter(self, col_idx):
         """將數字列索引轉換為 Excel 列標記 (例如: 0->A, 1->B, 26->AA)"""
-        result = ""
-        while True:
-            col_idx, remainder = divmod(col_idx, 26)
-            result = chr(65 + remainder) + result
-            if col_idx == 0:
-                break
-            col_idx -= 1
-        return result
+        return get_column_letter(col_idx)
     
     def preview_data(self):
         """預覽所選範圍的數據"""
@@ -366,9 +352,13 @@ class ExcelHandler:
         file_combo['values'] = file_names
         file_combo.current(0)
         
-        # 數據顯示區域
-        preview_text = ScrolledText(preview_window, wrap=tk.WORD, font=("Courier New", 10))
-        preview_text.pack(fill="both", expand=True, padx=10, pady=10)
+        # 範圍資訊與警告
+        info_var = tk.StringVar()
+        ttk.Label(preview_window, textvariable=info_var, justify="left").pack(fill="x", padx=10, pady=(5, 0))
+        
+        # 數據顯示區域 (只繪製可見的儲存格，大範圍也能立即顯示)
+        data_grid = DataGrid(preview_window, font=("Courier New", 10))
+        data_grid.pack(fill="both", expand=True, padx=10, pady=10)
         
         def update_preview():
             range_idx = range_combo.current()
@@ -387,40 +377,32 @@ class ExcelHandler:
                     end_row = selected_range['end_row']
                     end_col = selected_range['end_col']
                     
-                    # 打印調試信息
-                    preview_text.delete("1.0", tk.END)  # 清空先前內容
-                    preview_text.insert("1.0", f"嘗試讀取範圍: 從 ({start_row}, {start_col}) 到 ({end_row}, {end_col})\n")
-                    preview_text.insert(tk.END, f"數據框形狀: {df.shape}\n\n")
+                    # 顯示範圍資訊
+                    info_lines = [f"範圍: 從 ({start_row}, {start_col}) 到 ({end_row}, {end_col})，數據框形狀: {df.shape}"]
+                    data_grid.clear()
                     
                     # 確保索引在有效範圍內
                     if start_row < 0 or start_col < 0 or start_row >= df.shape[0] or start_col >= df.shape[1]:
-                        preview_text.insert(tk.END, f"錯誤: 起始位置 ({start_row}, {start_col}) 超出有效範圍 (0-{df.shape[0]-1}, 0-{df.shape[1]-1})\n")
+                        info_lines.append(f"錯誤: 起始位置 ({start_row}, {start_col}) 超出有效範圍 (0-{df.shape[0]-1}, 0-{df.shape[1]-1})")
+                        info_var.set("\n".join(info_lines))
                         return
                     
                     if end_row >= df.shape[0] or end_col >= df.shape[1]:
-                        preview_text.insert(tk.END, f"警告: 結束位置 ({end_row}, {end_col}) 超出範圍，已調整到有效範圍\n")
+                        info_lines.append(f"警告: 結束位置 ({end_row}, {end_col}) 超出範圍，已調整到有效範圍")
                         end_row = min(end_row, df.shape[0]-1)
                         end_col = min(end_col, df.shape[1]-1)
                     
                     # 檢查是否為有效範圍
                     if start_row > end_row or start_col > end_col:
-                        preview_text.insert(tk.END, "錯誤: 無效的範圍 (起始位置大於結束位置)\n")
+                        info_lines.append("錯誤: 無效的範圍 (起始位置大於結束位置)")
+                        info_var.set("\n".join(info_lines))
                         return
                     
-                    try:
-                        selected_data = df.iloc[start_row:end_row+1, start_col:end_col+1]
-                        
-                        if selected_data.empty:
-                            preview_text.insert(tk.END, "警告: 所選範圍內沒有數據\n")
-                        else:
-                            preview_text.insert(tk.END, selected_data.to_string())
-                    except Exception as e:
-                        preview_text.insert(tk.END, f"處理數據時出錯: {str(e)}\n")
-                        import traceback
-                        preview_text.insert(tk.END, traceback.format_exc())
+                    info_var.set("\n".join(info_lines))
+                    data_grid.set_data(df, start_row, start_col, end_row, end_col)
                 except Exception as e:
-                    preview_text.delete("1.0", tk.END)
-                    preview_text.insert("1.0", f"讀取檔案時出錯: {str(e)}\n")
+                    data_grid.clear()
+                    info_var.set(f"讀取檔案時出錯: {str(e)}")
         
         # 綁定選擇事件
         range_combo.bind("<<ComboboxSelected>>", lambda event: update_preview())
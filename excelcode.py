@@ -0,0 +1,411 @@
+"""
+ExcelCode Pro 程式庫介面
+
+提供不依賴 GUI 的程式碼生成 API，讓其他 Python 建置工具可以在同一個行程中
+直接呼叫，不需要啟動 console.py 子行程，也可以在多次呼叫之間重複使用已載入的資料。
+
+範例:
+    import excelcode
+
+    code = excelcode.render("configs/A024_VARIABLE_WEIGHT_H.json")
+
+    # 重複使用已載入的工作表資料
+    data_cache = {}
+    for config_path in config_paths:
+        code = excelcode.render(config_path, data_cache=data_cache)
+"""
+import json
+import logging
+import os
+
+from code_generator import CodeGenerator, GenerationContext
+from data_loader import load_sheet, PrefetchingFrames
+from output_writers import OUTPUT_FORMATS, DATA_FORMATS, write_data_output
+from utils import excel_notation_to_index
+
+logger = logging.getLogger("excelcode")
+
+# CodeGenerator 不保存生成狀態，所有呼叫 (包含不同執行緒) 共用同一個實例
+_code_generator = CodeGenerator()
+
+
+class GenerationError(Exception):
+    """
+    程式碼生成失敗時引發的例外
+
+    Attributes:
+        stage (str): 失敗的階段 ("config", "load", "render")
+        details (dict): 額外的錯誤資訊
+    """
+
+    def __init__(self, message, stage=None, details=None):
+        super().__init__(message)
+        self.message = message
+        self.stage = stage
+        self.details = details or {}
+
+    def __str__(self):
+        if self.stage:
+            return f"[{self.stage}] {self.message}"
+        return self.message
+
+
+class GenerationRequest:
+    """
+    一次程式碼生成所需的完整輸入
+
+    Args:
+        excel_files (list): Excel 檔案路徑列表
+        selected_sheet (str): 工作表名稱
+        code_template (str): 程式碼樣板
+        selected_ranges (list): 範圍資訊字典列表
+        named_ranges (dict): 命名範圍 {名稱: "A1:B2"}
+        template_direction (str): 讀取方向 "row" 或 "column"
+        output_format (str): 輸出格式 (見 output_writers.OUTPUT_FORMATS)
+        output_options (dict): 輸出格式的選項
+    """
+
+    def __init__(self, excel_files, selected_sheet, code_template, selected_ranges=None,
+                 named_ranges=None, template_direction="row", output_format="text", output_options=None):
+        self.excel_files = list(excel_files)
+        self.selected_sheet = selected_sheet
+        self.code_template = code_template
+        self.named_ranges = dict(named_ranges or {})
+        self.selected_ranges = list(selected_ranges or [])
+        self.template_direction = template_direction
+        self.output_format = output_format
+        self.output_options = dict(output_options or {})
+
+        # 沒有選定範圍時，從命名範圍建立
+        if not self.selected_ranges and self.named_ranges:
+            self.selected_ranges = ranges_from_named_ranges(self.named_ranges)
+
+    @property
+    def selected_range(self):
+        """第一個範圍 (與舊邏輯相容)"""
+        return self.selected_ranges[0] if self.selected_ranges else None
+
+    @classmethod
+    def from_config(cls, config_data, check_files=True):
+        """
+        從設定檔內容建立生成請求
+
+        Args:
+            config_data (dict): 設定檔內容 (與 GUI 儲存的格式相同)
+            check_files (bool): 是否略過不存在的 Excel 檔案
+
+        Raises:
+            GenerationError: 設定內容不完整或無效
+        """
+        excel_files = config_data.get("excel_files") or []
+        if not excel_files:
+            raise GenerationError("No Excel files specified in config", stage="config")
+
+        if check_files:
+            existing_files = [path for path in excel_files if os.path.exists(path)]
+            for missing in sorted(set(excel_files) - set(existing_files)):
+                logger.warning(f"Excel file not found: {missing}")
+            if not existing_files:
+                raise GenerationError("No valid Excel files found in config", stage="config",
+                                      details={"excel_files": excel_files})
+            excel_files = existing_files
+
+        selected_sheet = config_data.get("selected_sheet")
+        if not selected_sheet:
+            raise GenerationError("No sheet specified in config", stage="config")
+
+        named_ranges = config_data.get("named_ranges") or {}
+        selected_ranges = config_data.get("selected_ranges") or []
+        if not selected_ranges and not named_ranges:
+            raise GenerationError("No ranges specified in config and no named ranges available", stage="config")
+
+        output_format = config_data.get("output_format") or "text"
+        if output_format not in OUTPUT_FORMATS:
+            raise GenerationError(f"Unknown output format: {output_format}", stage="config",
+                                  details={"output_formats": list(OUTPUT_FORMATS)})
+
+        # 資料輸出格式不使用樣板，可以省略
+        if output_format in DATA_FORMATS and "code_template" not in config_data \
+                and "preset_template" not in config_data:
+            code_template = None
+        else:
+            code_template = template_from_config(config_data)
+
+        return cls(
+            excel_files,
+            selected_sheet,
+            code_template,
+            selected_ranges=selected_ranges,
+            named_ranges=named_ranges,
+            template_direction=config_data.get("template_direction", "row"),
+            output_format=output_format,
+            output_options=config_data.get("output_options"),
+        )
+
+
+def raise_render_error(message):
+    """生成引擎回報錯誤時引發 GenerationError，而不是顯示對話框"""
+    raise GenerationError(message, stage="render")
+
+
+def ranges_from_named_ranges(named_ranges):
+    """將命名範圍轉換為範圍資訊字典列表"""
+    selected_ranges = []
+    for name, range_str in named_ranges.items():
+        try:
+            start, end = range_str.split(":")
+            start_row, start_col = excel_notation_to_index(start)
+            end_row, end_col = excel_notation_to_index(end)
+        except Exception as e:
+            raise GenerationError(f"Error processing range {name}: {str(e)}", stage="config",
+                                  details={"range_name": name, "range_str": range_str})
+        selected_ranges.append({
+            'start_row': start_row,
+            'start_col': start_col,
+            'end_row': end_row,
+            'end_col': end_col,
+            'range_str': range_str
+        })
+    return selected_ranges
+
+
+def template_from_config(config_data):
+    """從設定檔內容取得程式碼樣板"""
+    template_type = config_data.get("template_type")
+    if template_type == "custom" and "code_template" in config_data:
+        return config_data["code_template"]
+    if template_type == "preset" and "preset_template" in config_data:
+        template = _code_generator.get_default_template(config_data["preset_template"])
+        if not template:
+            raise GenerationError(f"Unknown preset template: {config_data['preset_template']}", stage="config")
+        return template
+    if template_type is None and "code_template" in config_data:  # 向下相容
+        return config_data["code_template"]
+    raise GenerationError("No valid template specified in config", stage="config")
+
+
+def load_config(config_path):
+    """讀取設定檔並建立生成請求"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config_data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise GenerationError(f"Error loading config: {str(e)}", stage="config",
+                              details={"config_path": config_path})
+    return GenerationRequest.from_config(config_data)
+
+
+def load_workbooks(excel_files, sheet_name, data_cache=None):
+    """
+    載入所有檔案的工作表資料
+
+    Args:
+        excel_files (list): Excel 檔案路徑列表
+        sheet_name (str): 工作表名稱
+        data_cache (dict): 以 (檔案路徑, 工作表) 為鍵的資料快取，可在多次呼叫間重複使用
+
+    Returns:
+        dict: 檔案路徑對應資料框的字典
+    """
+    dfs = {}
+    for file_path in excel_files:
+        cache_key = (file_path, sheet_name)
+        if data_cache is not None and cache_key in data_cache:
+            dfs[file_path] = data_cache[cache_key]
+            continue
+
+        logger.info(f"Processing file: {os.path.basename(file_path)}")
+        try:
+            df = load_sheet(file_path, sheet_name)
+        except Exception as e:
+            raise GenerationError(f"Error loading Excel data: {str(e)}", stage="load",
+                                  details={"file_path": file_path, "sheet": sheet_name})
+        logger.info(f"DataFrame shape: {df.shape}")
+
+        dfs[file_path] = df
+        if data_cache is not None:
+            data_cache[cache_key] = df
+    return dfs
+
+
+def render(request, dfs=None, data_cache=None, render_cache=None, log_function=None, prefetch=0,
+           stream=False):
+    """
+    生成程式碼
+
+    Args:
+        request: 設定檔路徑、設定檔內容 (dict) 或 GenerationRequest
+        dfs (dict): 已載入的資料 (檔案路徑對應資料框)，未提供時自動載入
+        data_cache (dict): 傳給 load_workbooks 的資料快取
+        render_cache (RenderCache): 選用的渲染快取
+        log_function (callable): 接收生成過程日誌的函數
+        prefetch (int): 大於 0 時以管線模式邊載入邊渲染，最多預先載入的檔案數
+        stream (bool): 串流模式，依檔案順序每個檔案只讀取一次，處理完即釋放資料，
+            峰值記憶體不隨檔案數量增加；樣板需要再次讀取已釋放的檔案時引發 GenerationError
+
+    Returns:
+        str: 生成的程式碼
+
+    Raises:
+        GenerationError: 設定、載入或生成失敗
+    """
+    if isinstance(request, str):
+        request = load_config(request)
+    elif isinstance(request, dict):
+        request = GenerationRequest.from_config(request)
+
+    if not request.code_template:
+        raise GenerationError("Missing template for code generation", stage="config")
+    if not request.selected_ranges:
+        raise GenerationError("Missing ranges for code generation", stage="config")
+
+    frames = None
+    if dfs is None:
+        if stream:
+            check_stream_template(request)
+        if prefetch > 0 or stream:
+            # 管線模式: 背景載入下一個檔案的同時渲染目前的檔案
+            dfs = frames = PrefetchingFrames(request.excel_files, request.selected_sheet,
+                                             max_ahead=max(prefetch, 1), log_function=logger.info,
+                                             release_consumed=stream, allow_reload=not stream)
+        else:
+            dfs = load_workbooks(request.excel_files, request.selected_sheet, data_cache)
+
+    context = GenerationContext(
+        request.excel_files,
+        dfs,
+        request.selected_ranges,
+        request.selected_range,
+        named_ranges=request.named_ranges,
+        template_direction=request.template_direction,
+        log_function=log_function or logger.debug,
+        error_function=raise_render_error,
+        render_cache=render_cache,
+        stream=frames is not None and stream
+    )
+    if frames is not None:
+        # 檔案釋放時一併丟棄該檔案的暫存資料
+        frames.on_release = context.release_file
+
+    try:
+        final_code = _code_generator.render(context, request.code_template)
+    except GenerationError:
+        raise
+    except Exception as e:
+        check_frame_errors(frames, request)
+        check_refused_reloads(frames)
+        raise GenerationError(f"Error generating code: {str(e)}", stage="render")
+    finally:
+        if frames is not None:
+            if frames.reload_count:
+                logger.info(f"Reloaded {frames.reload_count} released workbooks")
+            frames.close()
+
+    # 生成器會記錄並略過個別檔案的錯誤，載入失敗時不可回傳不完整的結果
+    check_frame_errors(frames, request)
+    check_refused_reloads(frames)
+    return final_code
+
+
+def export_ranges(request):
+    """
+    取得資料輸出格式要輸出的範圍
+
+    Returns:
+        list: (範圍名稱, (start_row, start_col, end_row, end_col)) 列表；
+              與命名範圍相同的選定範圍使用命名範圍的名稱，其餘依序命名為 RANGE編號
+    """
+    names = {}
+    for name, range_str in request.named_ranges.items():
+        names.setdefault(range_str, name)
+    ranges = []
+    for index, range_info in enumerate(request.selected_ranges):
+        name = names.get(range_info.get('range_str'), f"RANGE{index}")
+        ranges.append((name, (range_info['start_row'], range_info['start_col'],
+                              range_info['end_row'], range_info['end_col'])))
+    return ranges
+
+
+def export(request, output_path, dfs=None, data_cache=None, log_function=None):
+    """
+    以資料輸出格式 (見 output_writers.DATA_FORMATS) 直接輸出選定範圍的資料，不經過樣板
+
+    Args:
+        request: 設定檔路徑、設定檔內容 (dict) 或 GenerationRequest
+        output_path (str): 輸出檔案路徑
+        dfs (dict): 已載入的資料，未提供時自動載入
+        data_cache (dict): 傳給 load_workbooks 的資料快取
+        log_function (callable): 接收輸出過程日誌的函數
+
+    Returns:
+        list: (檔案路徑, 是否有變更) 列表
+
+    Raises:
+        GenerationError: 設定、載入或輸出失敗
+    """
+    if isinstance(request, str):
+        request = load_config(request)
+    elif isinstance(request, dict):
+        request = GenerationRequest.from_config(request)
+
+    if request.output_format not in DATA_FORMATS:
+        raise GenerationError(f"Output format '{request.output_format}' requires rendering the template",
+                              stage="config")
+    if not request.selected_ranges:
+        raise GenerationError("Missing ranges for export", stage="config")
+
+    if dfs is None:
+        dfs = load_workbooks(request.excel_files, request.selected_sheet, data_cache)
+
+    # 未指定方向時與樣板相同: {{DIRECTION:COLUMN}} 或讀取方向設定為直向時每欄一列
+    options = dict(request.output_options)
+    if "orientation" not in options:
+        is_column_mode = ("{{DIRECTION:COLUMN}}" in (request.code_template or "")
+                          or request.template_direction == "column")
+        options["orientation"] = "column" if is_column_mode else "row"
+
+    try:
+        return write_data_output(request.excel_files, dfs, export_ranges(request), output_path,
+                                 request.output_format, options,
+                                 log_function=log_function or logger.debug)
+    except (ValueError, OSError) as e:
+        raise GenerationError(f"Error exporting data: {str(e)}", stage="render",
+                              details={"output_path": output_path})
+
+
+def check_stream_template(request):
+    """樣板在讀取所有檔案之後還需要再讀取檔案時 (串流模式無法一次完成) 引發 GenerationError"""
+    if len(request.excel_files) < 2:
+        return
+    passes = _code_generator.stream_passes(request.code_template)
+    for index, (name, reads_all_files) in enumerate(passes[:-1]):
+        if reads_all_files:
+            later = passes[index + 1][0]
+            raise GenerationError(
+                f"Streaming reads each workbook once, but the template reads them again for {later} "
+                f"after {name}; render without --stream",
+                stage="config",
+                details={"passes": [pass_name for pass_name, _ in passes]}
+            )
+
+
+def check_refused_reloads(frames):
+    """串流模式下樣板讀取了已釋放的檔案時引發 GenerationError"""
+    if frames is None or not frames.refused_reloads:
+        return
+    file_path = frames.refused_reloads[0]
+    raise GenerationError(
+        f"Streaming released {os.path.basename(file_path)} before the template finished reading it; "
+        f"render without --stream",
+        stage="render",
+        details={"file_path": file_path}
+    )
+
+
+def check_frame_errors(frames, request):
+    """背景載入有檔案失敗時引發 GenerationError"""
+    if frames is None or not frames.errors:
+        return
+    file_path, error = next(iter(frames.errors.items()))
+    raise GenerationError(f"Error loading Excel data: {str(error)}", stage="load",
+                          details={"file_path": file_path, "sheet": request.selected_sheet})
@@ -3,19 +3,35 @@ from tkinter import filedialog, ttk, messagebox, simpledialog
 from tkinter.scrolledtext import ScrolledText
 import threading
 import os
-import pandas as pd
 import time
 import re
 import json
+import gc
 from excel_handler import ExcelHandler
-from code_generator import CodeGenerator
-from utils import excel_notation_to_index, save_config, load_config, get_templates_directory, get_resource_path
+from log_sink import BatchedLogSink
+from code_view import ChunkedCodeView
+from data_grid import DataGrid
+from task_runner import TaskRunner
+from code_generator import CodeGenerator, GenerationContext
+from template_dialog import TemplateDialog
+from data_loader import WorkbookCache, get_sheet_names, preload_modules
+from output_diff import diff_outputs, diff_range_data
+from output_writers import OUTPUT_CONFIG_KEYS
+from render_cache import RenderCache
+from utils import excel_notation_to_index, save_config, load_config, get_templates_directory, get_resource_path, write_if_changed, get_column_letter
 from version import VERSION, check_for_updates
 
+DEFAULT_CACHE_LIMIT_MB = 512  # 工作表資料快取的預設上限
+PREVIEW_CACHE_LIMIT_MB = 32  # 樣板即時預覽的參數區塊片段快取上限
+
+
 class ExcelToCodeApp:
-    def __init__(self, root):
+    def __init__(self, root, start_time=None):
         self.root = root
+        self.start_time = start_time if start_time is not None else time.perf_counter()  # 用於記錄啟動耗時
         self.root.title(f"ExcelCode Pro v{VERSION}")
+        self.log_sink = BatchedLogSink(self.root)  # 日誌先緩衝，建立日誌區後批次顯示
+        self.task_runner = TaskRunner(self.root, self.show_task_progress)  # 載入與生成的背景工作
 
         # 設置應用程式圖示
         try:
@@ -25,17 +41,6 @@ class ExcelToCodeApp:
         except Exception as e:
             self.log(f"設置圖示時出錯: {str(e)}")
 
-        # 檢查更新
-        update_info = check_for_updates()
-        if update_info:
-            result = messagebox.askyesno(
-                "有新版本可用", 
-                f"發現新版本 {update_info['version']}，是否前往下載？"
-            )
-            if result:
-                import webbrowser
-                webbrowser.open(update_info['download_url'])
-
         self.root.geometry("1050x700")  # 增加預設寬度
         
         # 增加視窗大小變化的追蹤
@@ -47,10 +52,16 @@ class ExcelToCodeApp:
         self.selected_range = None
         self.selected_ranges = []  # 新增多選範圍列表
         self.named_ranges = {}  # 新增命名範圍字典
+        self.output_settings = {}  # 設定檔中的輸出格式設定 (供命令列版本使用，儲存設定時保留)
         self.code_template = None
         self.config_loading_completed = True  # 預設為已完成狀態
         self.loading_window = None  # 初始化 loading_window 為 None
         self.is_loading = False  # 追蹤載入狀態
+        self.last_generation = None  # 最近一次生成的 (程式碼, 資料框, 範圍)
+        self.previous_generation = None  # 前一次生成的結果，用於比較差異
+        self.workbook_cache = WorkbookCache(DEFAULT_CACHE_LIMIT_MB * 1024 * 1024)  # 依大小淘汰的工作表資料快取
+        # 樣板即時預覽的快取: 只保留參數區塊片段，關閉樣板視窗時清除
+        self.preview_cache = RenderCache(max_memory_bytes=PREVIEW_CACHE_LIMIT_MB * 1024 * 1024, cache_outputs=False)
         
         # 初始化處理器
         self.excel_handler = ExcelHandler(self)
@@ -61,12 +72,35 @@ class ExcelToCodeApp:
         # 添加視窗關閉事件處理
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # 視窗顯示後才載入最近檔案記錄、檢查更新並在背景匯入資料處理模組
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """主視窗顯示後執行的啟動工作"""
+        self.log(f"啟動耗時: {time.perf_counter() - self.start_time:.2f} 秒 (視窗已顯示)")
+        
         # 載入最近的檔案記錄
         self.load_recent_files()
+        
+        # 在背景預先匯入 pandas 等模組，第一次載入 Excel 時不需要再等待匯入
+        threading.Thread(target=preload_modules, args=(self.log,), daemon=True).start()
+        
+        # 檢查更新
+        update_info = check_for_updates()
+        if update_info:
+            result = messagebox.askyesno(
+                "有新版本可用", 
+                f"發現新版本 {update_info['version']}，是否前往下載？"
+            )
+            if result:
+                import webbrowser
+                webbrowser.open(update_info['download_url'])
 
     def on_closing(self):
         """處理視窗關閉事件"""
         self.remember_recent_files()  # 儲存最近的檔案記錄
+        self.task_runner.shutdown()
+        self.log_sink.close()
         self.root.destroy()
 
     def on_window_resize(self, event):
@@ -101,6 +135,9 @@ class ExcelToCodeApp:
         file_menu.add_command(label="儲存設定", command=self.save_config_to_file)
         file_menu.add_command(label="載入設定", command=self.load_config_from_file)
         file_menu.add_separator()
+        file_menu.add_command(label="釋放記憶體", command=self.free_memory)
+        file_menu.add_command(label="資料快取上限...", command=self.set_cache_limit)
+        file_menu.add_separator()
         file_menu.add_command(label="結束", command=self.on_closing)
         
         # 範圍選單 (新增)
@@ -299,6 +336,7 @@ class ExcelToCodeApp:
         # 程式碼顯示區
         self.code_text = ScrolledText(self.code_frame, wrap=tk.WORD, font=("Courier New", 10))
         self.code_text.pack(fill="both", expand=True, padx=5, pady=5)
+        self.code_view = ChunkedCodeView(self.root, self.code_text)
         
         # 新增底部Log顯示區域 - 使更緊湊
         log_frame = ttk.LabelFrame(main_frame, text="執行日誌")
@@ -307,6 +345,7 @@ class ExcelToCodeApp:
         self.log_text = ScrolledText(log_frame, wrap=tk.WORD, height=6, font=("Courier New", 9))
         self.log_text.pack(fill="both", expand=True, padx=5, pady=3)
         self.log_text.config(state="disabled")  # 初始設定為唯讀
+        self.log_sink.attach(self.log_text)
         
         # 底部按鈕區域
         bottom_frame = ttk.Frame(self.root)
@@ -321,6 +360,11 @@ class ExcelToCodeApp:
                                     command=self.load_config_from_file)
         self.load_config_button.pack(side="left", padx=5)
         
+        # 資料快取用量
+        self.memory_label = ttk.Label(bottom_frame, text="", foreground="gray")
+        self.memory_label.pack(side="left", padx=10)
+        self.update_memory_meter()
+        
         # 原有的按鈕
         self.save_button = ttk.Button(bottom_frame, text="儲存程式碼", 
                                     command=self.save_code, state="disabled")
@@ -329,27 +373,54 @@ class ExcelToCodeApp:
         self.copy_button = ttk.Button(bottom_frame, text="複製到剪貼簿", 
                                     command=self.copy_to_clipboard, state="disabled")
         self.copy_button.pack(side="right", padx=5)
+        
+        self.diff_button = ttk.Button(bottom_frame, text="比較上次生成", 
+                                    command=self.show_generation_diff, state="disabled")
+        self.diff_button.pack(side="right", padx=5)
     
     def log(self, message):
-        """在日誌區域添加訊息"""
-        # 獲取當前時間
-        current_time = time.strftime("%H:%M:%S", time.localtime())
-        
-        # 設定為可編輯狀態
-        self.log_text.config(state="normal")
-        
-        # 添加時間戳記和訊息
-        self.log_text.insert(tk.END, f"[{current_time}] {message}\n")
-        
-        # 滾動到最底部
-        self.log_text.see(tk.END)
-        
-        # 恢復唯讀狀態
-        self.log_text.config(state="disabled")
-        
-        # 同時在控制台輸出，方便開發者查看
-        # print(f"[{current_time}] {message}")
+        """在日誌區域添加訊息 (可從任何執行緒呼叫，由主執行緒批次顯示)"""
+        self.log_sink.write(message)
+    
+    def show_error(self, message):
+        """顯示程式碼生成引擎回報的錯誤 (可從背景執行緒呼叫)"""
+        self.log(f"錯誤: {message}")
+        self.root.after(0, lambda: messagebox.showerror("錯誤", message))
 
+    def update_memory_meter(self):
+        """定期更新狀態列上的資料快取用量"""
+        total_bytes, sheet_count = self.workbook_cache.usage()
+        text = f"資料快取: {total_bytes / 1048576:.1f} / {self.workbook_cache.max_bytes / 1048576:.0f} MB ({sheet_count} 個工作表)"
+        preview_bytes, _ = self.preview_cache.usage()
+        if preview_bytes:
+            text += f"  預覽快取: {preview_bytes / 1048576:.1f} MB"
+        self.memory_label.config(text=text)
+        self.root.after(2000, self.update_memory_meter)
+    
+    def free_memory(self):
+        """釋放快取的工作表資料、渲染結果與上次生成的結果 (目前使用中的資料保留)"""
+        freed = self.workbook_cache.clear()
+        freed += self.preview_cache.clear_memory()
+        # GUI 預設不啟用渲染快取
+        if self.code_generator.render_cache is not None:
+            freed += self.code_generator.render_cache.clear_memory()
+        self.previous_generation = None
+        self.diff_button.config(state="disabled")
+        gc.collect()
+        self.log(f"已釋放記憶體: 快取資料 {freed / 1048576:.1f} MB")
+    
+    def set_cache_limit(self):
+        """設定工作表資料快取的大小上限"""
+        limit_mb = simpledialog.askinteger(
+            "資料快取上限", "工作表資料快取上限 (MB):",
+            initialvalue=self.workbook_cache.max_bytes // 1048576, minvalue=16, parent=self.root
+        )
+        if limit_mb is None:
+            return
+        self.workbook_cache.set_max_bytes(limit_mb * 1024 * 1024)
+        self.save_app_setting("cache_limit_mb", limit_mb)
+        self.log(f"資料快取上限已設為 {limit_mb} MB")
+    
     def toggle_control_panel(self):
         """切換控制區的顯示/隱藏狀態"""
         if self.is_control_collapsed:
@@ -439,11 +510,11 @@ class ExcelToCodeApp:
         # 更新UI
         self.loading_window.update()
         
-        # 新增關閉按鈕 (如果需要手動關閉)
+        # 新增關閉按鈕 (取消背景工作並關閉)
         self.force_close_btn = ttk.Button(
             self.loading_window, 
             text="強制關閉", 
-            command=self.hide_loading_screen
+            command=self.cancel_background_task
         )
         self.force_close_btn.pack(pady=(5, 10))
         
@@ -454,6 +525,26 @@ class ExcelToCodeApp:
         
         self.loading_window.protocol("WM_DELETE_WINDOW", on_close)
 
+    def show_task_progress(self, message, fraction=None):
+        """顯示背景工作回報的進度 (主執行緒)"""
+        self.update_loading_message(message)
+        if fraction is not None and self.loading_window and hasattr(self, 'progress'):
+            try:
+                if str(self.progress.cget("mode")) != "determinate":
+                    self.progress.stop()
+                    self.progress.config(mode="determinate", maximum=100)
+                self.progress.config(value=fraction * 100)
+            except tk.TclError:
+                pass
+
+    def cancel_background_task(self):
+        """取消進行中的載入或生成工作並關閉等待畫面"""
+        if self.task_runner.is_busy:
+            self.task_runner.cancel()
+            self.log("已取消背景工作")
+        self.config_loading_completed = True
+        self.hide_loading_screen()
+
     def update_loading_message(self, message):
         """更新載入訊息"""
         if self.is_loading and hasattr(self, 'loading_message') and self.loading_message:
@@ -555,7 +646,7 @@ class ExcelToCodeApp:
         self.excel_handler.preview_data()
     
     def set_template(self):
-        self.code_generator.set_template()
+        TemplateDialog(self, self.code_generator).show()
     
     def import_template_file(self):
         """從檔案匯入樣板"""
@@ -745,34 +836,127 @@ class ExcelToCodeApp:
         # 顯示載入畫面
         self.show_loading_screen("正在生成程式碼，請稍候...")
         
-        def generate_task():
+        # 在主線程建立生成內容的快照，背景執行緒不再讀取會被其他操作修改的 GUI 狀態
+        context = GenerationContext.from_host(
+            self,
+            list(self.excel_files),
+            dict(self.dfs),
+            self.selected_ranges if hasattr(self, 'selected_ranges') else [],
+            self.selected_range,
+            render_cache=self.code_generator.render_cache
+        )
+        code_template = self.code_template
+        
+        def generate_task(token):
+            context.cancel_token = token
+            return self.code_generator.render(context, code_template)
+        
+        def on_generated(final_code):
+            # 分段顯示生成的代碼 (儲存與複製使用完整的緩衝內容，不需等待顯示完成)
+            self.code_view.set_text(final_code)
+            self.save_button.config(state="normal")
+            self.copy_button.config(state="normal")
+            
+            # 保留前一次的結果供差異比較 (資料框只保留參照，重新載入時才是不同的物件)
+            self.previous_generation = self.last_generation
+            self.last_generation = (final_code, context.dfs, context.selected_ranges)
+            self.diff_button.config(state="normal" if self.previous_generation else "disabled")
+        
+        def on_generate_error(e):
+            messagebox.showerror("錯誤", f"生成程式碼時發生錯誤: {str(e)}")
+            # 顯示詳細的錯誤信息
+            import traceback
+            self.log("".join(traceback.format_exception(e)))
+        
+        def on_generate_finished():
+            # 被新工作取代的生成也會呼叫，此時等待畫面屬於新的工作，不可關閉
+            if not self.task_runner.is_busy:
+                self.hide_loading_screen()
+        
+        # 在背景執行，新的生成或載入會自動取消尚未完成的生成
+        self.task_runner.submit(generate_task, on_success=on_generated, on_error=on_generate_error,
+                                on_finally=on_generate_finished)
+
+    def show_generation_diff(self):
+        """顯示最近兩次生成的差異，並列出造成變更的範圍與儲存格"""
+        if not self.previous_generation or not self.last_generation:
+            return
+        old_code, old_dfs, _ = self.previous_generation
+        new_code, new_dfs, selected_ranges = self.last_generation
+        
+        changes = diff_outputs(old_code, new_code)
+        # 比較選定範圍與命名範圍 (同一範圍以命名範圍的名稱顯示)
+        range_names = {range_str: name for name, range_str in self.named_ranges.items()}
+        range_strs = [r['range_str'] for r in selected_ranges]
+        range_strs += [range_str for range_str in self.named_ranges.values() if range_str not in range_strs]
+        ranges = []
+        for range_str in range_strs:
             try:
-                final_code = self.code_generator.generate_code(
-                    self.excel_files, 
-                    self.dfs, 
-                    self.selected_ranges if hasattr(self, 'selected_ranges') else [], 
-                    self.code_template, 
-                    self.selected_range
-                )
-                
-                # 在主線程中顯示生成的代碼
-                self.root.after(0, lambda: self.code_text.delete("1.0", tk.END))
-                self.root.after(0, lambda: self.code_text.insert("1.0", final_code))
-                
-                self.root.after(0, lambda: self.save_button.config(state="normal"))
-                self.root.after(0, lambda: self.copy_button.config(state="normal"))
-                
+                start, end = range_str.split(":")
+                ranges.append((range_names.get(range_str, range_str),
+                               excel_notation_to_index(start, self) + excel_notation_to_index(end, self)))
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("錯誤", f"生成程式碼時發生錯誤: {str(e)}"))
-                # 顯示詳細的錯誤信息
-                import traceback
-                self.log(traceback.format_exc())
-            finally:
-                self.root.after(0, self.hide_loading_screen)
+                self.log(f"無法比較範圍 {range_str}: {str(e)}")
+        cell_changes = diff_range_data(old_dfs, new_dfs, ranges)
+        self.log(f"差異比較: {len(changes)} 個區塊、{len(cell_changes)} 個儲存格有變更")
+        
+        diff_window = tk.Toplevel(self.root)
+        diff_window.title("比較上次生成")
+        diff_window.geometry("800x500")
+        diff_window.transient(self.root)
+        
+        ttk.Label(diff_window, text=f"變更的區塊 ({len(changes)}) - 點選可跳至程式碼中的位置").pack(anchor="w", padx=10, pady=(10, 0))
+        change_list = tk.Listbox(diff_window, height=8, font=("Courier New", 9))
+        change_list.pack(fill="x", padx=10, pady=5)
+        for change in changes:
+            change_list.insert(tk.END, change.summary())
+        if not changes:
+            change_list.insert(tk.END, "輸出沒有差異")
+        
+        detail_text = ScrolledText(diff_window, wrap=tk.NONE, height=10, font=("Courier New", 9))
+        detail_text.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        # 資料差異列出造成輸出變更的範圍與儲存格
+        cell_lines = [f"{os.path.basename(path)} [{range_name}] {cell}: {old} -> {new}"
+                      for path, range_name, cell, old, new in cell_changes]
+        cell_summary = "\n".join(cell_lines) if cell_lines else "範圍資料沒有變更 (變更來自樣板或設定)"
+        detail_text.insert(tk.END, cell_summary)
+        detail_text.config(state="disabled")
+        
+        self.code_text.tag_config("diff_highlight", background="#fff3a0")
+        
+        def on_change_select(event):
+            selection = change_list.curselection()
+            if not selection or not changes:
+                return
+            change = changes[selection[0]]
+            
+            # 在程式碼區標示變更的行並捲動到該位置
+            self.code_text.tag_remove("diff_highlight", "1.0", tk.END)
+            for sign, line_no, _ in change.line_changes or []:
+                if sign == "+":
+                    self.code_text.tag_add("diff_highlight", f"{line_no}.0", f"{line_no}.end")
+            self.code_text.see(f"{change.first_changed_line}.0")
+            
+            lines = [change.summary()]
+            if change.line_changes is None:
+                lines.append("(區塊過大，略過逐行比較)")
+            else:
+                lines.extend(f"{sign}{line_no:>6}: {text}" for sign, line_no, text in change.line_changes)
+            lines.extend(["", "變更的儲存格:", cell_summary])
+            detail_text.config(state="normal")
+            detail_text.delete("1.0", tk.END)
+            detail_text.insert(tk.END, "\n".join(lines))
+            detail_text.config(state="disabled")
+        
+        change_list.bind("<<ListboxSelect>>", on_change_select)
+        
+        def on_close():
+            self.code_text.tag_remove("diff_highlight", "1.0", tk.END)
+            diff_window.destroy()
         
-        thread = threading.Thread(target=generate_task)
-        thread.daemon = True
-        thread.start()
+        diff_window.protocol("WM_DELETE_WINDOW", on_close)
+        ttk.Button(diff_window, text="關閉", command=on_close).pack(pady=5)
 
     def save_code(self):
         save_path = filedialog.asksaveasfilename(
@@ -782,13 +966,15 @@ class ExcelToCodeApp:
         )
         
         if save_path:
-            with open(save_path, "w", encoding="utf-8") as f:
-                f.write(self.code_text.get("1.0", tk.END))
-            messagebox.showinfo("成功", f"程式碼已儲存至 {save_path}")
+            # 內容未變更時不重寫檔案，避免觸發下游重新編譯
+            if write_if_changed(save_path, self.code_view.get_text()):
+                messagebox.showinfo("成功", f"程式碼已儲存至 {save_path}")
+            else:
+                messagebox.showinfo("成功", f"程式碼與 {save_path} 相同，檔案未變更")
 
     def copy_to_clipboard(self):
         self.root.clipboard_clear()
-        self.root.clipboard_append(self.code_text.get("1.0", tk.END))
+        self.root.clipboard_append(self.code_view.get_text())
         messagebox.showinfo("成功", "程式碼已複製到剪貼簿")
         
     def save_config_to_file(self):
@@ -827,6 +1013,9 @@ class ExcelToCodeApp:
             config_data["template_type"] = "custom"
             config_data["code_template"] = self.code_template
         
+        # 保留載入設定時的輸出格式設定
+        config_data.update(self.output_settings)
+        
         # 儲存設定到檔案
         if save_config(config_data, file_path, self):
             messagebox.showinfo("成功", f"設定已儲存至 {file_path}")
@@ -847,8 +1036,7 @@ class ExcelToCodeApp:
                     self.log("沒有Excel檔案可載入")
                     return
                         
-                xl = pd.ExcelFile(excel_files[0])
-                sheets = xl.sheet_names
+                sheets = get_sheet_names(excel_files[0])
                 
                 # 在主線程中更新UI
                 self.root.after(0, lambda: self.sheet_combobox.config(values=sheets, state="readonly"))
@@ -864,36 +1052,29 @@ class ExcelToCodeApp:
         # 直接在當前線程執行，以確保完成後代碼可以繼續執行
         load_task()
         
-    def excel_sheet_selected_without_close(self, sheet_name):
-        """選擇工作表但不自動關閉載入視窗"""
+    def excel_sheet_selected_without_close(self, sheet_name, token=None):
+        """選擇工作表但不自動關閉載入視窗 (在背景工作中執行，token 為取消標記)"""
         self.log(f"選擇工作表: {sheet_name} (不自動關閉載入視窗)...")
         
-        # 更新載入訊息
-        self.update_loading_message(f"載入工作表 '{sheet_name}' 的資料...")
-        
         try:
-            # 逐个加载每个文件的选定工作表
-            for file_path in self.excel_files:
-                # 修改讀取方式，先用 object 讀取所有數據，再嘗試轉換為數值類型
-                df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=object, header=None)
-
-                # 定義轉換函數，避免使用 errors='ignore'
-                def convert_to_numeric(column):
-                    try:
-                        return pd.to_numeric(column)
-                    except (ValueError, TypeError):
-                        return column
-                # 嘗試將可以轉換為數值的列轉為數值類型
-                df = df.apply(convert_to_numeric)
-
-                # 重置索引，確保從0開始連續
-                df = df.reset_index(drop=True)
+            # 逐个加载每个文件的选定工作表，完成後才取代 self.dfs
+            excel_files = list(self.excel_files)
+            dfs = {}
+            for index, file_path in enumerate(excel_files):
+                if token is not None:
+                    token.check()
+                    token.report(f"載入工作表 '{sheet_name}' 的資料 ({index + 1}/{len(excel_files)})...",
+                                 index / len(excel_files))
+                
+                # 先用 object 讀取所有數據，再嘗試轉換為數值類型 (已快取且未修改的檔案直接使用快取)
+                df = self.workbook_cache.get(file_path, sheet_name)
                 
                 # 打印数据框信息
                 self.log(f"讀取檔案: {os.path.basename(file_path)}")
                 self.log(f"資料框形狀: {df.shape}")
                 
-                self.dfs[file_path] = df
+                dfs[file_path] = df
+            self.dfs = dfs
             
             # 在主線程中更新UI
             self.root.after(0, lambda: self.range_manager_btn.config(state="normal"))
@@ -942,7 +1123,7 @@ class ExcelToCodeApp:
         # 記錄開始時間以實現超時機制
         self.loading_start_time = time.time()
         
-        def apply_config():
+        def apply_config(token):
             try:
                 # 暫存原始方法，以確保所有流程結束後可以恢復
                 original_hide_loading = self.hide_loading_screen
@@ -956,7 +1137,7 @@ class ExcelToCodeApp:
                 if "template_type" in config_data:
                     template_type = config_data["template_type"]
                     self.log(f"載入模板類型: {template_type}")
-                    self.update_loading_message(f"載入模板: {template_type}...")
+                    token.report(f"載入模板: {template_type}...")
                     
                     if template_type == "custom" and "code_template" in config_data:
                         # 載入自訂模板
@@ -988,6 +1169,9 @@ class ExcelToCodeApp:
                     self.root.after(0, lambda: self.template_preview.config(text="已載入自訂樣板"))
                     self.root.after(0, lambda: self.template_combo.set(""))  # 清空預設模板選擇
                 
+                # 保留輸出格式設定
+                self.output_settings = {key: config_data[key] for key in OUTPUT_CONFIG_KEYS if key in config_data}
+                
                 # 處理命名範圍
                 if "named_ranges" in config_data:
                     self.named_ranges = config_data["named_ranges"]
@@ -1005,7 +1189,7 @@ class ExcelToCodeApp:
                             self.log(f"警告: 檔案 {file_path} 不存在，將被跳過")
                     
                     if existing_files:
-                        self.update_loading_message(f"載入 {len(existing_files)} 個 Excel 檔案...")
+                        token.report(f"載入 {len(existing_files)} 個 Excel 檔案...")
                         
                         # 在 UI 執行緒更新檔案列表
                         def update_file_list():
@@ -1025,7 +1209,7 @@ class ExcelToCodeApp:
                             # 如果有指定的工作表，則選擇它
                             if target_sheet and target_sheet in self.sheet_combobox['values']:
                                 self.log(f"選擇工作表: {target_sheet}")
-                                self.update_loading_message(f"選擇工作表: {target_sheet}...")
+                                token.report(f"選擇工作表: {target_sheet}...")
                                 
                                 # 設置工作表
                                 self.sheet_combobox.set(target_sheet)
@@ -1033,12 +1217,12 @@ class ExcelToCodeApp:
                                 
                                 # 載入選定工作表的資料
                                 try:
-                                    self.excel_sheet_selected_without_close(target_sheet)
+                                    self.excel_sheet_selected_without_close(target_sheet, token)
                                     
                                     # 設定選擇的範圍
                                     if "selected_ranges" in config_data and config_data["selected_ranges"]:
                                         self.log("設定資料範圍...")
-                                        self.update_loading_message("設定資料範圍...")
+                                        token.report("設定資料範圍...")
                                         
                                         self.selected_ranges = config_data["selected_ranges"]
                                         if self.selected_ranges:
@@ -1139,6 +1323,9 @@ class ExcelToCodeApp:
                     f"載入設定時發生錯誤: {str(e)}"
                 ))
             finally:
+                # 已取消 (被新的工作取代或使用者強制關閉) 時，由新的工作負責更新畫面
+                if token.is_cancelled:
+                    return
                 # 標記載入完成並關閉載入視窗
                 self.config_loading_completed = True
                 self.root.after(0, self.hide_loading_screen)
@@ -1147,10 +1334,8 @@ class ExcelToCodeApp:
                 # 另外，為了確保UI更新確實執行，再添加一個延遲更長的備用呼叫
                 self.root.after(1000, self.refresh_ui_after_loading)
         
-        # 啟動處理任務
-        thread = threading.Thread(target=apply_config)
-        thread.daemon = True
-        thread.start()
+        # 啟動處理任務 (取消其他進行中的載入或生成)
+        self.task_runner.submit(apply_config)
         
         # 定期檢查載入狀態，確保 loading 視窗在適當的時間關閉
         def check_loading_completed():
@@ -1327,6 +1512,20 @@ class ExcelToCodeApp:
         except Exception as e:
             self.log(f"記錄最近檔案時出錯: {str(e)}")
 
+    def save_app_setting(self, key, value):
+        """將程式設定與最近檔案記錄一起儲存"""
+        try:
+            recent_files = {}
+            recent_files_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recent_files.json")
+            if os.path.exists(recent_files_path):
+                with open(recent_files_path, "r", encoding="utf-8") as f:
+                    recent_files = json.load(f)
+            recent_files[key] = value
+            with open(recent_files_path, "w", encoding="utf-8") as f:
+                json.dump(recent_files, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            self.log(f"儲存設定 {key} 時出錯: {str(e)}")
+
     def load_recent_files(self):
         """載入最近使用的檔案記錄"""
         try:
@@ -1335,6 +1534,9 @@ class ExcelToCodeApp:
                 with open(recent_files_path, "r", encoding="utf-8") as f:
                     recent_files = json.load(f)
                 
+                if "cache_limit_mb" in recent_files:
+                    self.workbook_cache.set_max_bytes(int(recent_files["cache_limit_mb"]) * 1024 * 1024)
+                
                 # 檢查檔案是否存在
                 if "last_used" in recent_files and recent_files["last_used"]:
                     # 添加「最近檔案」選單項目
@@ -1669,13 +1871,14 @@ class ExcelToCodeApp:
         preview_frame = ttk.LabelFrame(right_frame, text="資料預覽")
         preview_frame.pack(fill="both", expand=True, pady=5)
         
-        preview_text = ScrolledText(preview_frame, height=20, font=("Courier New", 9))
-        preview_text.pack(fill="both", expand=True, padx=5, pady=5)
+        preview_info_var = tk.StringVar()
+        ttk.Label(preview_frame, textvariable=preview_info_var, justify="left").pack(fill="x", padx=5, pady=(5, 0))
+        
+        # 只繪製可見的儲存格，大範圍也能立即預覽
+        preview_grid = DataGrid(preview_frame, font=("Courier New", 9))
+        preview_grid.pack(fill="both", expand=True, padx=5, pady=5)
         
         def update_preview(range_info=None):
-            preview_text.config(state="normal")
-            preview_text.delete("1.0", tk.END)
-            
             # 如果沒有指定範圍，使用第一個範圍
             if range_info is None and self.selected_ranges:
                 range_info = self.selected_ranges[0]
@@ -1688,36 +1891,19 @@ class ExcelToCodeApp:
                     end_col = range_info['end_col']
                     
                     # 顯示範圍信息
-                    preview_text.insert("end", f"範圍: {range_info['range_str']}\n")
-                    preview_text.insert("end", f"開始位置: 行={start_row+1}, 列={chr(65+start_col)}\n")
-                    preview_text.insert("end", f"結束位置: 行={end_row+1}, 列={chr(65+end_col)}\n")
-                    preview_text.insert("end", f"範圍大小: {end_row-start_row+1}行 x {end_col-start_col+1}列\n\n")
-                    
-                    # 添加列標題行
-                    headers = [f"{chr(65+i)}" for i in range(start_col, min(end_col+1, start_col+10))]
-                    preview_text.insert("end", "行號  " + "  ".join(headers) + "\n")
-                    preview_text.insert("end", "───" + "─"*50 + "\n")
-                    
-                    # 顯示預覽資料
-                    max_rows = min(end_row, start_row + 9)  # 最多顯示10行
-                    for i in range(start_row, max_rows+1):
-                        if i < df.shape[0]:
-                            row_data = df.iloc[i, start_col:min(end_col+1, start_col+10)]
-                            row_str = f"{i+1:3d} │ "  # 顯示Excel行號，從1開始
-                            row_str += " │ ".join([str(val)[:8] for val in row_data])
-                            preview_text.insert("end", row_str + "\n")
-                    
-                    # 如果資料超過10行，顯示省略號
-                    if end_row > max_rows:
-                        preview_text.insert("end", "...(更多行省略)...\n")
+                    preview_info_var.set(
+                        f"範圍: {range_info['range_str']}\n"
+                        f"開始位置: 行={start_row+1}, 列={get_column_letter(start_col)}\n"
+                        f"結束位置: 行={end_row+1}, 列={get_column_letter(end_col)}\n"
+                        f"範圍大小: {end_row-start_row+1}行 x {end_col-start_col+1}列"
+                    )
+                    preview_grid.set_data(df, start_row, start_col, end_row, end_col)
                 except Exception as e:
-                    preview_text.insert("1.0", f"載入預覽資料時出錯: {str(e)}\n")
-                    import traceback
-                    preview_text.insert("end", traceback.format_exc())
+                    preview_grid.clear()
+                    preview_info_var.set(f"載入預覽資料時出錯: {str(e)}")
             else:
-                preview_text.insert("1.0", "尚未選擇範圍，請新增範圍以預覽資料")
-            
-            preview_text.config(state="disabled")
+                preview_grid.clear()
+                preview_info_var.set("尚未選擇範圍，請新增範圍以預覽資料")
         
         # 當選擇列表中的範圍時，更新預覽
         def on_range_select(event):
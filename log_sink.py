@@ -0,0 +1,98 @@
+"""
+GUI 執行日誌的批次輸出
+
+工作執行緒 (載入資料、生成程式碼、套用設定) 不可直接操作 Tk 元件，
+而且每一則訊息都更新一次文字元件會讓大量日誌拖慢介面。
+BatchedLogSink 讓任何執行緒都能寫入訊息，由 Tk 主執行緒定期一次插入。
+"""
+import time
+import tkinter as tk
+from collections import deque
+
+
+class BatchedLogSink:
+    """
+    執行緒安全的批次日誌輸出
+
+    write() 只把訊息放入 deque (append/popleft 為原子操作，不需要鎖)，
+    主執行緒每隔 interval_ms 取出所有待顯示的訊息，以一次插入更新文字元件，
+    並將元件內容限制在 max_lines 行以內。待顯示的訊息不設上限，
+    兩次更新之間的訊息超過 max_lines 時只顯示最新的部分，但全部寫入日誌檔案。
+
+    Args:
+        root: Tk 根視窗 (用於排程)
+        interval_ms (int): 更新間隔 (毫秒)
+        max_lines (int): 文字元件最多保留的行數
+        spill_path (str): 選用的日誌檔案，所有訊息都會附加寫入
+    """
+
+    def __init__(self, root, interval_ms=50, max_lines=5000, spill_path=None):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_lines = max_lines
+        self.spill_path = spill_path
+        self.text_widget = None
+        self._pending = deque()
+        self._after_id = None
+
+    def attach(self, text_widget):
+        """設定顯示日誌的文字元件並開始定期更新"""
+        self.text_widget = text_widget
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def write(self, message):
+        """加入一則訊息 (可從任何執行緒呼叫)"""
+        current_time = time.strftime("%H:%M:%S", time.localtime())
+        self._pending.append(f"[{current_time}] {message}\n")
+
+    def _drain(self):
+        """在主執行緒中將待顯示的訊息一次寫入文字元件"""
+        lines = []
+        try:
+            while True:
+                lines.append(self._pending.popleft())
+        except IndexError:
+            pass
+
+        if lines:
+            self._append("".join(lines[-self.max_lines:]))
+            self._spill("".join(lines))
+
+        self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _append(self, text):
+        widget = self.text_widget
+        widget.config(state="normal")
+        widget.insert(tk.END, text)
+
+        # 超過行數上限時刪除最舊的內容
+        line_count = int(widget.index("end-1c").split(".")[0])
+        if line_count > self.max_lines:
+            widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+
+        widget.see(tk.END)
+        widget.config(state="disabled")
+
+    def _spill(self, text):
+        if not self.spill_path:
+            return
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(text)
+        except OSError:
+            self.spill_path = None  # 無法寫入時停用，避免每次更新都失敗
+
+    def flush(self):
+        """立即顯示所有待顯示的訊息 (僅限主執行緒)"""
+        if self.text_widget is None:
+            return
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._drain()
+
+    def close(self):
+        """停止定期更新"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
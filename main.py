@@ -1,3 +1,6 @@
+import time
+_start_time = time.perf_counter()  # 記錄啟動時間，視窗顯示後由 GUI 記錄啟動耗時
+
 import logging
 import sys
 import os  # 加入這一行來引入 os 模組
@@ -27,5 +30,5 @@ if __name__ == "__main__":
     from gui import ExcelToCodeApp
     
     root = tk.Tk()
-    app = ExcelToCodeApp(root)
+    app = ExcelToCodeApp(root, start_time=_start_time)
     root.mainloop()
\ No newline at end of file
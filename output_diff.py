@@ -0,0 +1,226 @@
+"""
+生成結果的結構化差異比較
+
+對數 MB 的輸出直接逐行執行 difflib 太慢。這裡先去除相同的開頭與結尾，
+再將中間部分依空白行切成區塊，以區塊內容比對找出變更的區塊，
+只在變更的區塊內進行逐行比較。
+"""
+import difflib
+import re
+
+from utils import get_column_letter
+
+# 單一區塊變更超過此行數時不再逐行比較，只回報行數
+MAX_INNER_DIFF_LINES = 5000
+
+
+class BlockChange:
+    """
+    一個變更的區塊
+
+    Attributes:
+        old_start, old_end: 舊輸出中的行範圍 (0 起算，不含結束)
+        new_start, new_end: 新輸出中的行範圍 (0 起算，不含結束)
+        label (str): 區塊的第一個非空白行，用於辨識變更的表格
+        line_changes (list): (符號 "-"/"+", 行號 (1 起算), 內容) 列表，區塊過大時為 None
+    """
+
+    def __init__(self, old_start, old_end, new_start, new_end, label, line_changes):
+        self.old_start = old_start
+        self.old_end = old_end
+        self.new_start = new_start
+        self.new_end = new_end
+        self.label = label
+        self.line_changes = line_changes
+
+    @property
+    def removed_count(self):
+        if self.line_changes is None:
+            return self.old_end - self.old_start
+        return sum(1 for sign, _, _ in self.line_changes if sign == "-")
+
+    @property
+    def added_count(self):
+        if self.line_changes is None:
+            return self.new_end - self.new_start
+        return sum(1 for sign, _, _ in self.line_changes if sign == "+")
+
+    @property
+    def first_changed_line(self):
+        """新輸出中第一個變更的行號 (1 起算)，用於跳至變更位置"""
+        for sign, line_no, _ in self.line_changes or []:
+            if sign == "+":
+                return line_no
+        return self.new_start + 1
+
+    def summary(self):
+        return (f"第 {self.first_changed_line} 行: {self.label} "
+                f"[-{self.removed_count} +{self.added_count}]")
+
+
+def split_blocks(lines, offset=0):
+    """
+    依空白行將行列表切成區塊
+
+    Returns:
+        list: (開始行, 結束行) 列表，空白行歸入前一個區塊
+    """
+    blocks = []
+    start = 0
+    for index, line in enumerate(lines):
+        if not line.strip() and index + 1 > start:
+            blocks.append((offset + start, offset + index + 1))
+            start = index + 1
+    if start < len(lines):
+        blocks.append((offset + start, offset + len(lines)))
+    return blocks
+
+
+def is_block_start(lines, index):
+    """第 index 行是否為區塊的開頭 (第一行或前一行是空白行)"""
+    return index == 0 or not lines[index - 1].strip()
+
+
+def block_label(lines, start, end, changed_line=None):
+    """
+    取得區塊的標籤
+
+    優先使用變更行之前最近一個含有識別字的行 (通常是陣列宣告)，
+    讓沒有空白行分隔的大區塊也能指出變更所在的表格。
+    """
+    if changed_line is not None:
+        for line in reversed(lines[start:changed_line + 1]):
+            if re.search(r"[A-Za-z_]\w*", line):
+                return line.strip()[:80]
+    for line in lines[start:end]:
+        if line.strip():
+            return line.strip()[:80]
+    return "(空白)"
+
+
+def diff_lines(old_lines, old_start, old_end, new_lines, new_start, new_end):
+    """逐行比較一個變更的區塊"""
+    if (old_end - old_start) + (new_end - new_start) > MAX_INNER_DIFF_LINES:
+        return None
+    old_part = old_lines[old_start:old_end]
+    new_part = new_lines[new_start:new_end]
+    changes = []
+    matcher = difflib.SequenceMatcher(None, old_part, new_part, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        for index in range(i1, i2):
+            changes.append(("-", old_start + index + 1, old_part[index]))
+        for index in range(j1, j2):
+            changes.append(("+", new_start + index + 1, new_part[index]))
+    return changes
+
+
+def diff_outputs(old_text, new_text):
+    """
+    比較兩次生成的輸出
+
+    Returns:
+        list: BlockChange 列表，沒有差異時為空列表
+    """
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+
+    # 去除相同的開頭與結尾 (一般只有少數表格變更)
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    if prefix == len(old_lines) == len(new_lines):
+        return []
+
+    # 相同的結尾從區塊開頭算起 (前一行在兩邊都是空白行)，
+    # 否則插入區塊的結尾 "};" 會被當成相同內容，變更被歸到前一個表格
+    while suffix and not (is_block_start(old_lines, len(old_lines) - suffix)
+                          and is_block_start(new_lines, len(new_lines) - suffix)):
+        suffix -= 1
+
+    # 從變更前的區塊開頭開始切塊，讓區塊標籤對應到表格名稱
+    start = prefix
+    while start > 0 and old_lines[start - 1].strip():
+        start -= 1
+    old_blocks = split_blocks(old_lines[start:len(old_lines) - suffix], start)
+    new_blocks = split_blocks(new_lines[start:len(new_lines) - suffix], start)
+    old_keys = ["\n".join(old_lines[s:e]) for s, e in old_blocks]
+    new_keys = ["\n".join(new_lines[s:e]) for s, e in new_blocks]
+
+    changes = []
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        old_start = old_blocks[i1][0] if i1 < i2 else (old_blocks[i1][0] if i1 < len(old_blocks) else len(old_lines) - suffix)
+        old_end = old_blocks[i2 - 1][1] if i1 < i2 else old_start
+        new_start = new_blocks[j1][0] if j1 < j2 else (new_blocks[j1][0] if j1 < len(new_blocks) else len(new_lines) - suffix)
+        new_end = new_blocks[j2 - 1][1] if j1 < j2 else new_start
+
+        line_changes = diff_lines(old_lines, old_start, old_end, new_lines, new_start, new_end)
+        if new_start < new_end:
+            first_added = next((no - 1 for sign, no, _ in line_changes or [] if sign == "+"), None)
+            label = block_label(new_lines, new_start, new_end, first_added)
+        else:
+            label = block_label(old_lines, old_start, old_end)
+        changes.append(BlockChange(old_start, old_end, new_start, new_end, label, line_changes))
+    return changes
+
+
+def format_changes(changes, max_lines_per_block=20):
+    """將變更轉為文字報告"""
+    if not changes:
+        return "輸出沒有差異"
+    report = [f"共 {len(changes)} 個區塊有變更:"]
+    for change in changes:
+        report.append(change.summary())
+        if change.line_changes is None:
+            report.append("    (區塊過大，略過逐行比較)")
+            continue
+        for sign, line_no, text in change.line_changes[:max_lines_per_block]:
+            report.append(f"    {sign}{line_no:>6}: {text}")
+        if len(change.line_changes) > max_lines_per_block:
+            report.append(f"    ... 另有 {len(change.line_changes) - max_lines_per_block} 行變更")
+    return "\n".join(report)
+
+
+def diff_range_data(old_dfs, new_dfs, ranges, max_cells=200):
+    """
+    比較兩次生成所使用的範圍資料，找出造成輸出變更的儲存格
+
+    Args:
+        old_dfs, new_dfs: 檔案路徑對應資料框
+        ranges (list): (範圍名稱, (start_row, start_col, end_row, end_col)) 列表
+        max_cells (int): 最多回報的儲存格數
+
+    Returns:
+        list: (檔案路徑, 範圍名稱, 儲存格標記, 舊值, 新值) 列表
+    """
+    import pandas as pd
+
+    cell_changes = []
+    for file_path, new_df in new_dfs.items():
+        old_df = old_dfs.get(file_path)
+        if old_df is None or old_df is new_df:
+            continue
+        for range_name, (start_row, start_col, end_row, end_col) in ranges:
+            old_region = old_df.iloc[start_row:end_row + 1, start_col:end_col + 1].to_numpy(dtype=object)
+            new_region = new_df.iloc[start_row:end_row + 1, start_col:end_col + 1].to_numpy(dtype=object)
+            if old_region.shape != new_region.shape:
+                cell_changes.append((file_path, range_name, "(範圍大小)", old_region.shape, new_region.shape))
+                continue
+
+            # 向量化比較，兩邊都是空白儲存格時視為相同
+            changed = (old_region != new_region) & ~(pd.isna(old_region) & pd.isna(new_region))
+            for row, col in zip(*changed.nonzero()):
+                cell = f"{get_column_letter(start_col + col)}{start_row + row + 1}"
+                cell_changes.append((file_path, range_name, cell, old_region[row, col], new_region[row, col]))
+                if len(cell_changes) >= max_cells:
+                    return cell_changes
+    return cell_changes
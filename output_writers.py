@@ -0,0 +1,674 @@
+"""
+生成結果的輸出格式
+
+預設 (text) 將生成結果寫入單一檔案。shards 將生成結果中的頂層陣列定義依原順序、
+按定義大小分成連續的幾組寫入多個 .c 檔 (分界與 ARGUMENT 區塊或 FILES_LOOP 無關)，
+另外輸出一個 .h 檔保留其餘內容 (巨集、型別、include 等) 並以 extern 宣告取代陣列定義，
+讓韌體建置可以平行編譯資料表，且只重新編譯內容有變更的分片。
+
+資料輸出格式 (DATA_FORMATS) 不經過樣板，直接由選定範圍的數值陣列輸出:
+blob 將所有範圍寫入一個 little-endian 二進位檔，並生成記錄位移、維度與元素型別的存取標頭；
+csv 將所有檔案的範圍寫成分隔文字，數值與 format_cell_value 的結果相同。
+"""
+import glob
+import os
+import re
+
+from table_ops import numeric_matrix, infer_ctype, find_overflow, ctype_limits, CTYPE_ALIASES, format_region
+from utils import write_if_changed
+
+OUTPUT_FORMATS = ("text", "shards", "blob", "csv")
+
+# 不經過樣板引擎，直接由範圍資料輸出的格式
+DATA_FORMATS = ("blob", "csv")
+
+# 設定檔中與輸出格式相關的鍵 (GUI 載入設定後儲存時保留)
+OUTPUT_CONFIG_KEYS = ("output_format", "output_options")
+
+DEFAULT_SHARD_COUNT = 4
+
+# 分片檔案的第一行，只有帶此標記的檔案才會在分片數減少時被移除
+SHARD_MARKER = "/* 由 ExcelCode Pro 生成的分片，請勿手動修改 */"
+
+# 陣列定義: 型別、名稱、維度，後接 = 初始化列表
+ARRAY_DEFINITION_PATTERN = re.compile(
+    r'^(?P<type>[^=\[\]{}();]*?)\b(?P<name>[A-Za-z_]\w*)\s*(?P<dims>(?:\[[^\]]*\]\s*)+)=', re.DOTALL)
+
+
+class ArrayDefinition:
+    """
+    輸出中的一個頂層陣列定義
+
+    Attributes:
+        text (str): 完整定義 (含初始化列表與分號)
+        type_text (str): 名稱前的型別部分，例如 "static const int "
+        name (str): 陣列名稱
+        dims (str): 維度部分，例如 "[3][4]"
+    """
+
+    def __init__(self, text, type_text, name, dims):
+        self.text = text
+        self.type_text = type_text
+        self.name = name
+        self.dims = dims.strip()
+
+    @property
+    def storage_type(self):
+        """移除 static 後的型別 (分片中的定義必須有外部連結)"""
+        return re.sub(r'\bstatic\s+', '', self.type_text).strip()
+
+    def definition(self):
+        """分片中使用的定義"""
+        return self.storage_type + " " + self.text[len(self.type_text):].lstrip()
+
+    def extern_declaration(self):
+        """
+        標頭檔中的 extern 宣告，省略的第一維以初始化項目數補上，讓 sizeof 可以使用
+        (以字串常數初始化的字元陣列維持不完整型別)
+        """
+        dims = self.dims
+        initializer = self.text[self.text.index("=") + 1:]
+        if dims.startswith("[]") and initializer.lstrip().startswith("{"):
+            dims = f"[{count_initializer_items(initializer)}]" + dims[2:]
+        return f"extern {self.storage_type} {self.name}{dims};"
+
+
+class ExternalDefinition:
+    """
+    輸出中陣列以外、具有外部連結的頂層定義 (非 static 的函數或物件)
+
+    留在標頭檔會讓每個引用標頭檔的分片都重複定義，因此定義寫入第一個分片，
+    標頭檔中只保留函數原型或 extern 宣告。
+
+    Attributes:
+        text (str): 完整定義
+        is_function (bool): 是否為函數定義
+    """
+
+    def __init__(self, text, is_function):
+        self.text = text
+        self.is_function = is_function
+
+    def declaration(self):
+        """標頭檔中的函數原型或 extern 宣告"""
+        if self.is_function:
+            return self.text[:find_top_level(self.text, "{")].rstrip() + ";"
+        return "extern " + strip_initializers(self.text)
+
+
+def code_characters(code):
+    """
+    依序產生程式碼中的 (位置, 字元)，略過註解與字串、字元常數的內容
+
+    註解以一個空白代替；字串與字元常數只產生開頭的引號。
+    """
+    length = len(code)
+    index = 0
+    while index < length:
+        if code.startswith("//", index):
+            yield index, " "
+            newline = code.find("\n", index)
+            index = length if newline == -1 else newline
+            continue
+        if code.startswith("/*", index):
+            yield index, " "
+            comment_end = code.find("*/", index + 2)
+            index = length if comment_end == -1 else comment_end + 2
+            continue
+        char = code[index]
+        yield index, char
+        index = skip_literal(code, index) if char in "\"'" else index + 1
+
+
+def find_top_level(code, targets):
+    """找出第一個不在括號內的目標字元位置，找不到時返回 -1"""
+    depth = 0
+    for index, char in code_characters(code):
+        if depth == 0 and char in targets:
+            return index
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+    return -1
+
+
+def strip_initializers(declaration):
+    """移除宣告中各宣告子的初始值，例如 "int a = 1, b = 2;" -> "int a, b;" """
+    kept = []
+    depth = 0
+    start = 0
+    in_initializer = False
+    for index, char in code_characters(declaration):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif depth == 0 and char == "=" and not in_initializer:
+            kept.append(declaration[start:index].rstrip())
+            in_initializer = True
+        elif depth == 0 and char in ",;":
+            kept.append(char if in_initializer else declaration[start:index + 1])
+            start = index + 1
+            in_initializer = False
+    return "".join(kept)
+
+
+def declaration_head(code):
+    """移除註解與大括號內容後的宣告文字，用來判斷宣告的種類"""
+    head = []
+    depth = 0
+    for index, char in code_characters(code):
+        if char == "{":
+            if depth == 0:
+                head.append("{}")
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0:
+            head.append(char)
+    return "".join(head).strip()
+
+
+def is_function_definition(statement):
+    """以右大括號結束的頂層陳述式是否為函數定義 (第一個大括號前是參數列，沒有 =)"""
+    head = declaration_head(statement)
+    prefix = head[:head.index("{")].rstrip() if "{" in head else head
+    return "=" not in prefix and prefix.endswith(")")
+
+
+def external_definition_kind(statement):
+    """
+    判斷頂層陳述式是否為具有外部連結的定義
+
+    Returns:
+        str: "function"、"object"，宣告 (static、extern、typedef、原型、結構標記) 返回 None
+    """
+    head = declaration_head(statement)
+    if re.search(r'\b(static|extern|typedef|inline)\b', head):
+        return None
+    if head.endswith("}"):
+        return "function" if is_function_definition(statement) else None
+    body = head.rstrip(";").strip()
+    if not re.search(r'[A-Za-z_]\w*', body) or re.fullmatch(r'(struct|union|enum)\b[\w\s]*(\{\})?', body):
+        return None
+    # 沒有初始值且以參數列結束的是函數原型 (或巨集呼叫)，函數指標物件除外
+    if "=" not in body and body.endswith(")") and not re.search(r'\(\s*\*', body):
+        return None
+    return "object"
+
+
+def count_initializer_items(initializer):
+    """計算初始化列表最外層的項目數 (略過字串、字元常數與註解中的逗號與大括號)"""
+    depth = 0
+    items = 0
+    has_item = False
+    for index, char in code_characters(initializer):
+        if char == "{":
+            depth += 1
+            if depth == 2:
+                has_item = True
+        elif char == "}":
+            depth -= 1
+        elif depth == 1:
+            if char == ",":
+                items += has_item
+                has_item = False
+            elif not char.isspace():
+                has_item = True
+    return items + has_item
+
+
+def skip_literal(code, index):
+    """略過從 index 開始的字串或字元常數，返回結束後的位置"""
+    quote = code[index]
+    index += 1
+    while index < len(code) and code[index] != quote:
+        index += 2 if code[index] == "\\" else 1
+    return index + 1
+
+
+def split_top_level(code):
+    """
+    將生成的程式碼切成頂層片段
+
+    Returns:
+        list: (是否為陳述式, 文字) 列表；陳述式是以分號 (或函數本體的右大括號) 結束的頂層宣告，
+              其餘 (空白、註解、前置處理指令) 為一般文字
+    """
+    segments = []
+    length = len(code)
+    index = 0
+    start = 0
+    statement_start = None
+    depth = 0
+    while index < length:
+        char = code[index]
+        if code.startswith("//", index):
+            newline = code.find("\n", index)
+            index = length if newline == -1 else newline
+            continue
+        if code.startswith("/*", index):
+            comment_end = code.find("*/", index + 2)
+            index = length if comment_end == -1 else comment_end + 2
+            continue
+        if statement_start is None:
+            if char.isspace():
+                index += 1
+                continue
+            if char == "#":
+                # 前置處理指令 (含反斜線續行)
+                while True:
+                    newline = code.find("\n", index)
+                    if newline == -1:
+                        index = length
+                        break
+                    index = newline + 1
+                    if not code[:newline].rstrip("\r").endswith("\\"):
+                        break
+                continue
+            if start < index:
+                segments.append((False, code[start:index]))
+            statement_start = start = index
+        if char in "\"'":
+            index = skip_literal(code, index)
+            continue
+        index += 1
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            # 函數本體以右大括號結束 (結構、列舉與初始化列表則以分號結束)
+            if depth == 0 and is_function_definition(code[statement_start:index]):
+                segments.append((True, code[statement_start:index]))
+                statement_start = None
+                start = index
+        elif char == ";" and depth == 0:
+            segments.append((True, code[statement_start:index]))
+            statement_start = None
+            start = index
+    if start < length:
+        segments.append((False, code[start:]))
+    return segments
+
+
+def parse_output(code):
+    """
+    找出生成結果中的頂層陣列定義
+
+    Returns:
+        list: 一般文字 (str)、ArrayDefinition 與 ExternalDefinition 依原順序排列的列表
+    """
+    parts = []
+    for is_statement, text in split_top_level(code):
+        if not is_statement:
+            parts.append(text)
+            continue
+        match = ARRAY_DEFINITION_PATTERN.match(text)
+        kind = external_definition_kind(text)
+        if match and match.group("type").strip():
+            parts.append(ArrayDefinition(text, match.group("type"), match.group("name"), match.group("dims")))
+        elif kind:
+            parts.append(ExternalDefinition(text, kind == "function"))
+        else:
+            parts.append(text)
+    return parts
+
+
+def partition(sizes, count):
+    """
+    將依序排列的項目分成最多 count 組連續的項目，各組大小盡量相近
+
+    連續分組讓分片內容只隨附近的表格變動，未變更的分片不會被重寫。
+
+    Returns:
+        list: 每組項目索引的列表
+    """
+    total = sum(sizes)
+    groups = []
+    current = []
+    accumulated = 0
+    for index, size in enumerate(sizes):
+        current.append(index)
+        accumulated += size
+        remaining_groups = count - len(groups) - 1
+        if remaining_groups > 0 and accumulated >= total * (len(groups) + 1) / count:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
+
+
+def shard_paths(output_path, count):
+    """分片檔案的路徑: 與標頭檔同目錄，名稱為 標頭檔名_編號.c"""
+    base = os.path.splitext(output_path)[0]
+    return [f"{base}_{index}.c" for index in range(count)]
+
+
+def is_generated_shard(path):
+    """檢查檔案是否為先前生成的分片 (第一行為 SHARD_MARKER)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.readline().rstrip("\r\n") == SHARD_MARKER
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def write_shards(code, output_path, shard_count=DEFAULT_SHARD_COUNT, log_function=None):
+    """
+    將生成結果寫成一個標頭檔與多個 .c 分片
+
+    頂層陣列定義依原順序分成最多 shard_count 組連續的定義，各組的定義文字總長度盡量相近。
+    陣列以外具有外部連結的定義 (非 static 的函數與物件) 全部寫入第一個分片。
+
+    Args:
+        code (str): 生成的程式碼
+        output_path (str): 標頭檔路徑，分片寫入同一目錄
+        shard_count (int): 最多的分片數
+
+    Returns:
+        list: (檔案路徑, 是否有變更) 列表
+    """
+    log = log_function or (lambda message: None)
+    if shard_count < 1:
+        raise ValueError(f"分片數必須大於 0: {shard_count}")
+
+    parts = parse_output(code)
+    arrays = [part for part in parts if isinstance(part, ArrayDefinition)]
+    externals = [part for part in parts if isinstance(part, ExternalDefinition)]
+    if not arrays and not externals:
+        log("警告: 輸出中沒有可分片的定義，所有內容寫入標頭檔")
+
+    header_parts = []
+    for part in parts:
+        if isinstance(part, ArrayDefinition):
+            header_parts.append(part.extern_declaration())
+        elif isinstance(part, ExternalDefinition):
+            header_parts.append(part.declaration())
+        else:
+            header_parts.append(part)
+    header = "".join(header_parts)
+    results = [(output_path, write_if_changed(output_path, header))]
+
+    include_line = f'{SHARD_MARKER}\n#include "{os.path.basename(output_path)}"\n'
+    groups = partition([len(array.text) for array in arrays], shard_count)
+    if externals and not groups:
+        groups = [[]]
+    paths = shard_paths(output_path, len(groups))
+    for shard_index, (path, group) in enumerate(zip(paths, groups)):
+        definitions = [external.text for external in externals] if shard_index == 0 else []
+        definitions += [arrays[index].definition() for index in group]
+        results.append((path, write_if_changed(path, include_line + "\n" + "\n\n".join(definitions) + "\n")))
+
+    # 移除上次生成但已不需要的分片，避免建置時重複定義；沒有生成標記的檔案 (例如手寫的檔案) 不動
+    base = os.path.splitext(output_path)[0]
+    for path in glob.glob(glob.escape(base) + "_*.c"):
+        suffix = path[len(base) + 1:-2]
+        if suffix.isdigit() and int(suffix) >= len(groups) and is_generated_shard(path):
+            os.remove(path)
+            log(f"已移除多餘的分片: {path}")
+
+    log(f"已輸出 {len(arrays)} 個陣列至 {len(groups)} 個分片")
+    if externals:
+        log(f"已將 {len(externals)} 個非 static 的函數或物件定義寫入第一個分片")
+    return results
+
+
+def write_output(code, output_path, output_format="text", options=None, log_function=None):
+    """
+    依輸出格式寫入生成結果
+
+    Args:
+        code (str): 生成的程式碼
+        output_path (str): 輸出檔案路徑
+        output_format (str): "text" 或 "shards"
+        options (dict): 格式選項 (shards: shard_count)
+
+    Returns:
+        list: (檔案路徑, 是否有變更) 列表
+
+    Raises:
+        ValueError: 不支援的輸出格式或選項
+    """
+    options = options or {}
+    if output_format == "text":
+        return [(output_path, write_if_changed(output_path, code))]
+    if output_format == "shards":
+        shard_count = int(options.get("shard_count", DEFAULT_SHARD_COUNT))
+        return write_shards(code, output_path, shard_count, log_function)
+    raise ValueError(f"不支援的輸出格式: {output_format} (可用: {', '.join(OUTPUT_FORMATS)})")
+
+
+# C 型別對應的 little-endian numpy 型別
+BLOB_DTYPES = {
+    "uint8_t": "<u1",
+    "int8_t": "<i1",
+    "uint16_t": "<u2",
+    "int16_t": "<i2",
+    "uint32_t": "<u4",
+    "int32_t": "<i4",
+    "uint64_t": "<u8",
+    "int64_t": "<i8",
+    "float": "<f4",
+    "double": "<f8",
+}
+
+DEFAULT_BLOB_ALIGNMENT = 8
+
+
+def c_identifier(name, index):
+    """將範圍名稱轉為巨集名稱，無法轉為 ASCII 識別字時 (例如中文名稱) 使用 RANGE編號"""
+    identifier = re.sub(r'\W', '_', name, flags=re.ASCII).upper()
+    if not identifier.strip("_") or identifier[0].isdigit():
+        return f"RANGE{index}"
+    return identifier
+
+
+def stack_ranges(excel_files, dfs, range_indices):
+    """
+    將所有檔案的同一範圍組成 [檔案][行][欄] 數值陣列 (工作表較小時以 0 補齊)
+
+    Returns:
+        tuple: (float64 陣列, 文字儲存格遮罩)
+    """
+    import numpy as np
+
+    start_row, start_col, end_row, end_col = range_indices
+    shape = (len(excel_files), end_row - start_row + 1, end_col - start_col + 1)
+    values = np.zeros(shape)
+    text = np.zeros(shape, dtype=bool)
+    for file_idx, file_path in enumerate(excel_files):
+        region = dfs[file_path].iloc[start_row:end_row + 1, start_col:end_col + 1]
+        matrix, text_mask = numeric_matrix(region)
+        values[file_idx, :matrix.shape[0], :matrix.shape[1]] = matrix
+        text[file_idx, :matrix.shape[0], :matrix.shape[1]] = text_mask
+    return values, text
+
+
+def blob_ctype(values, name, declared=None):
+    """
+    決定範圍的元素型別: 指定型別時檢查是否容納所有數值，否則推斷最小型別
+
+    Raises:
+        ValueError: 不支援的型別或數值超出型別範圍
+    """
+    if declared is None:
+        return infer_ctype([values])
+    ctype = " ".join(declared.split())
+    ctype = CTYPE_ALIASES.get(ctype, ctype)
+    if ctype not in BLOB_DTYPES or ctype_limits(ctype) is None:
+        raise ValueError(f"範圍 {name} 的型別 {declared} 不支援二進位輸出 (可用: {', '.join(BLOB_DTYPES)})")
+    count, position, value = find_overflow(values.reshape(-1, values.shape[-1]), ctype)
+    if count:
+        raise ValueError(f"範圍 {name} 有 {count} 個值超出 {ctype} (第一個: {value})")
+    return ctype
+
+
+def write_blob(excel_files, dfs, ranges, output_path, options=None, log_function=None):
+    """
+    將選定範圍的資料寫成 little-endian 二進位檔與存取標頭
+
+    每個範圍的資料依 [檔案][行][欄] 排列，範圍的開頭對齊 alignment 位元組。
+    標頭檔 (output_path) 提供每個範圍的位移、維度、元素型別與索引巨集；
+    二進位檔寫入同一目錄的 標頭檔名.bin。
+
+    Args:
+        ranges (list): (範圍名稱, (start_row, start_col, end_row, end_col)) 列表
+        options (dict): prefix (巨集前綴)、ctype (型別或 {範圍名稱: 型別})、alignment、
+                        incbin (另輸出以 .incbin 嵌入資料的 .c 檔)、section (incbin 使用的區段)
+
+    Returns:
+        list: (檔案路徑, 是否有變更) 列表
+
+    Raises:
+        ValueError: 範圍有非數值儲存格、型別無效或數值超出型別範圍
+    """
+    import numpy as np
+
+    log = log_function or (lambda message: None)
+    options = options or {}
+    base = os.path.splitext(output_path)[0]
+    prefix = options.get("prefix") or c_identifier(os.path.basename(base), 0)
+    alignment = int(options.get("alignment", DEFAULT_BLOB_ALIGNMENT))
+    declared_types = options.get("ctype")
+    blob_name = f"{prefix.lower()}_blob"
+    blob_path = base + ".bin"
+
+    chunks = []
+    offset = 0
+    lines = [
+        f"/* 二進位資料存取標頭，資料檔: {os.path.basename(blob_path)} (little-endian) */",
+        f"#ifndef {prefix}_BLOB_H",
+        f"#define {prefix}_BLOB_H",
+        "",
+        "#include <stdint.h>",
+        "",
+        f"#define {prefix}_FILE_COUNT {len(excel_files)}",
+    ]
+    for index, (name, range_indices) in enumerate(ranges):
+        values, text = stack_ranges(excel_files, dfs, range_indices)
+        if text.any():
+            raise ValueError(f"範圍 {name} 有 {int(text.sum())} 個非數值儲存格，無法輸出為二進位資料")
+        declared = declared_types.get(name) if isinstance(declared_types, dict) else declared_types
+        ctype = blob_ctype(values, name, declared)
+        if ctype_limits(ctype)[2]:
+            values = np.round(values)
+        data = values.astype(BLOB_DTYPES[ctype]).tobytes()
+
+        padding = -offset % alignment
+        chunks.append(b"\0" * padding)
+        offset += padding
+        chunks.append(data)
+
+        macro = f"{prefix}_{c_identifier(name, index)}"
+        _, rows, cols = values.shape
+        lines += [
+            "",
+            f"/* {name} */",
+            f"#define {macro}_OFFSET {offset}",
+            f"#define {macro}_ROWS {rows}",
+            f"#define {macro}_COLS {cols}",
+            f"#define {macro}_TYPE {ctype}",
+            f"#define {macro}_INDEX(file, row, col) "
+            f"((((file) * {macro}_ROWS) + (row)) * {macro}_COLS + (col))",
+            f"#define {macro}_PTR(blob) ((const {macro}_TYPE *)((const uint8_t *)(blob) + {macro}_OFFSET))",
+        ]
+        log(f"範圍 {name}: {len(excel_files)} x {rows} x {cols} {ctype}，位移 {offset}")
+        offset += len(data)
+
+    lines[7:7] = [f"#define {prefix}_BLOB_SIZE {offset}"]
+    results = [(blob_path, write_if_changed(blob_path, b"".join(chunks)))]
+
+    if options.get("incbin"):
+        # 以 .incbin 將資料嵌入目標檔，組譯時需能以檔名找到 .bin (例如 -Wa,-I<輸出目錄>)
+        section = options.get("section") or f".rodata.{blob_name}"
+        incbin_path = base + "_blob.c"
+        incbin_source = "\n".join([
+            f'#include "{os.path.basename(output_path)}"',
+            "",
+            "__asm__(",
+            f'    ".section {section}, \\"a\\"\\n"',
+            f'    ".balign {alignment}\\n"',
+            f'    ".global {blob_name}\\n"',
+            f'    "{blob_name}:\\n"',
+            f'    ".incbin \\"{os.path.basename(blob_path)}\\"\\n"',
+            '    ".previous\\n"',
+            ");",
+            "",
+        ])
+        lines += ["", f"extern const uint8_t {blob_name}[{prefix}_BLOB_SIZE];"]
+        results.append((incbin_path, write_if_changed(incbin_path, incbin_source)))
+
+    lines += ["", f"#endif /* {prefix}_BLOB_H */", ""]
+    results.insert(0, (output_path, write_if_changed(output_path, "\n".join(lines))))
+    log(f"已輸出 {len(ranges)} 個範圍的二進位資料 ({offset} 位元組)")
+    return results
+
+
+def quote_csv_field(text, delimiter):
+    """含分隔符號、引號或換行的文字以雙引號包住 (RFC 4180)"""
+    if delimiter in text or '"' in text or "\n" in text or "\r" in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def write_csv(excel_files, dfs, ranges, output_path, options=None, log_function=None):
+    """
+    將所有檔案的選定範圍寫成分隔文字 (依檔案、再依範圍的順序)
+
+    每個範圍一次格式化為字串矩陣，不經過樣板的逐格處理。
+
+    Args:
+        ranges (list): (範圍名稱, (start_row, start_col, end_row, end_col)) 列表
+        options (dict): delimiter (分隔符號，預設 ",")、orientation ("row" 每行一列，"column" 每欄一列)
+
+    Returns:
+        list: (檔案路徑, 是否有變更) 列表
+
+    Raises:
+        ValueError: 選項無效
+    """
+    log = log_function or (lambda message: None)
+    options = options or {}
+    delimiter = options.get("delimiter", ",")
+    orientation = options.get("orientation", "row")
+    if not delimiter:
+        raise ValueError("分隔符號不可為空")
+    if orientation not in ("row", "column"):
+        raise ValueError(f"無效的方向: {orientation} (可用: row, column)")
+
+    lines = []
+    for file_path in excel_files:
+        df = dfs[file_path]
+        for name, (start_row, start_col, end_row, end_col) in ranges:
+            formatted = format_region(df.iloc[start_row:end_row + 1, start_col:end_col + 1])
+            if orientation == "column":
+                formatted = formatted.T
+            for row in formatted.tolist():
+                lines.append(delimiter.join(quote_csv_field(value, delimiter) for value in row))
+
+    results = [(output_path, write_if_changed(output_path, "\n".join(lines) + "\n" if lines else ""))]
+    log(f"已輸出 {len(excel_files)} 個檔案、{len(ranges)} 個範圍，共 {len(lines)} 行")
+    return results
+
+
+def write_data_output(excel_files, dfs, ranges, output_path, output_format, options=None, log_function=None):
+    """
+    依資料輸出格式直接由範圍資料寫入 (不經過樣板)
+
+    Args:
+        ranges (list): (範圍名稱, (start_row, start_col, end_row, end_col)) 列表
+        output_format (str): DATA_FORMATS 其中之一
+
+    Returns:
+        list: (檔案路徑, 是否有變更) 列表
+
+    Raises:
+        ValueError: 不支援的輸出格式或資料無法輸出
+    """
+    if output_format == "blob":
+        return write_blob(excel_files, dfs, ranges, output_path, options, log_function)
+    if output_format == "csv":
+        return write_csv(excel_files, dfs, ranges, output_path, options, log_function)
+    raise ValueError(f"不支援的資料輸出格式: {output_format} (可用: {', '.join(DATA_FORMATS)})")
@@ -0,0 +1,155 @@
+"""
+內容定址渲染快取 (content-addressed render cache)
+
+以範圍資料雜湊、樣板內容與渲染選項組成快取鍵，
+當一個輸出所依賴的內容完全沒有變更時，可直接取回先前的渲染結果，
+即使 Excel 檔案的修改時間已變動也不需要重新渲染。
+"""
+import hashlib
+import os
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+# 快取格式版本，新增標記或渲染邏輯變更時遞增以讓舊快取 (包含 --cache-dir 的磁碟快取) 失效
+# 2: CTYPE、DEDUP、累加、alias、CSR、layout/SOA、定點數標記
+CACHE_VERSION = "2"
+
+
+def hash_frame_region(df, start_row, start_col, end_row, end_col):
+    """
+    計算資料框中指定範圍的內容雜湊
+
+    Args:
+        df: 資料框
+        start_row, start_col, end_row, end_col: 範圍索引 (包含結束位置)
+
+    Returns:
+        str: 範圍資料的 SHA-256 十六進位雜湊
+    """
+    import pandas as pd
+    region = df.iloc[max(start_row, 0):end_row + 1, max(start_col, 0):end_col + 1]
+    digest = hashlib.sha256()
+    digest.update(repr(region.shape).encode("utf-8"))
+    digest.update(repr([str(dtype) for dtype in region.dtypes]).encode("utf-8"))
+    if not region.empty:
+        # 向量化計算每一列的雜湊，避免逐格轉換字串
+        row_hashes = pd.util.hash_pandas_object(region, index=False)
+        digest.update(row_hashes.values.tobytes())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    渲染結果快取，支援記憶體快取與選用的磁碟快取
+
+    Args:
+        cache_dir (str): 磁碟快取目錄，None 表示只使用記憶體
+        max_memory_entries (int): 記憶體中保留的最多項目數
+        max_memory_bytes (int): 記憶體中項目的總大小上限，None 表示只限制項目數
+        cache_outputs (bool): 是否快取整份輸出；False 時只快取參數區塊的片段
+    """
+
+    def __init__(self, cache_dir=None, max_memory_entries=256, max_memory_bytes=None, cache_outputs=True):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_outputs = cache_outputs
+        self.memory_bytes = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # 可同時被多個生成執行緒使用
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    @staticmethod
+    def make_key(*parts):
+        """將所有依賴項目組合成一個快取鍵"""
+        digest = hashlib.sha256()
+        digest.update(CACHE_VERSION.encode("utf-8"))
+        for part in parts:
+            if not isinstance(part, str):
+                part = json.dumps(part, ensure_ascii=False, sort_keys=True, default=str)
+            digest.update(b"\x00")
+            digest.update(part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        """取得快取內容，未命中時返回 None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.cache_dir:
+            entry_path = self._entry_path(key)
+            if os.path.exists(entry_path):
+                try:
+                    with open(entry_path, "r", encoding="utf-8", newline="") as f:
+                        text = f.read()
+                    self._remember(key, text)
+                    with self._lock:
+                        self.hits += 1
+                    return text
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, text):
+        """儲存渲染結果"""
+        self._remember(key, text)
+
+        if self.cache_dir:
+            entry_path = self._entry_path(key)
+            temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8", newline="") as f:
+                    f.write(text)
+                os.replace(temp_path, entry_path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def _remember(self, key, text):
+        size = sys.getsizeof(text)
+        with self._lock:
+            old_text = self._memory.pop(key, None)
+            if old_text is not None:
+                self.memory_bytes -= sys.getsizeof(old_text)
+            # 單一項目就超過大小上限時不放入記憶體
+            if self.max_memory_bytes is not None and size > self.max_memory_bytes:
+                return
+            self._memory[key] = text
+            self.memory_bytes += size
+            while len(self._memory) > self.max_memory_entries or (
+                    self.max_memory_bytes is not None and self.memory_bytes > self.max_memory_bytes):
+                _, evicted = self._memory.popitem(last=False)
+                self.memory_bytes -= sys.getsizeof(evicted)
+
+    def clear_memory(self):
+        """
+        清除記憶體中的快取項目
+
+        Returns:
+            int: 釋放的大小
+        """
+        with self._lock:
+            freed = self.memory_bytes
+            self._memory.clear()
+            self.memory_bytes = 0
+        return freed
+
+    def usage(self):
+        """返回 (記憶體中項目的總大小, 項目數)"""
+        with self._lock:
+            return self.memory_bytes, len(self._memory)
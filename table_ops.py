@@ -0,0 +1,434 @@
+"""
+範圍資料的向量化運算
+
+提供樣板中資料型別、彙總等衍生標記所需的計算。所有運算都以 numpy 對整個範圍一次完成，
+不逐一格式化儲存格；數值的解讀方式與 format_cell_value 相同 (空白儲存格視為 0，
+可轉為數字的文字視為數字)。pandas 與 numpy 只在實際計算時才匯入。
+"""
+
+# 可推斷的整數型別，依大小排列，同大小時無號型別優先
+INTEGER_CTYPES = [
+    ("uint8_t", 0, 2 ** 8 - 1),
+    ("int8_t", -2 ** 7, 2 ** 7 - 1),
+    ("uint16_t", 0, 2 ** 16 - 1),
+    ("int16_t", -2 ** 15, 2 ** 15 - 1),
+    ("uint32_t", 0, 2 ** 32 - 1),
+    ("int32_t", -2 ** 31, 2 ** 31 - 1),
+    ("uint64_t", 0, 2 ** 64 - 1),
+    ("int64_t", -2 ** 63, 2 ** 63 - 1),
+]
+
+# 宣告型別的別名 (以 32 位元嵌入式目標為準: int 與 long 為 32 位元)
+CTYPE_ALIASES = {
+    "unsigned char": "uint8_t",
+    "signed char": "int8_t",
+    "char": "int8_t",
+    "unsigned short": "uint16_t",
+    "short": "int16_t",
+    "unsigned int": "uint32_t",
+    "unsigned": "uint32_t",
+    "int": "int32_t",
+    "unsigned long": "uint32_t",
+    "long": "int32_t",
+    "unsigned long long": "uint64_t",
+    "long long": "int64_t",
+}
+
+FLOAT_LIMITS = {
+    "float": 3.4028234663852886e38,
+    "double": 1.7976931348623157e308,
+}
+
+# 與 format_cell_value 相同: 與整數相差小於此值時輸出為整數
+INTEGER_TOLERANCE = 1e-10
+
+
+def numeric_array(values):
+    """
+    將儲存格值陣列 (任意維度) 轉為數值陣列
+
+    Returns:
+        tuple: (float64 陣列, 無法轉為數字的文字儲存格遮罩)，文字儲存格的值為 NaN
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = np.asarray(values, dtype=object)
+    blank = pd.isna(values)
+    numeric = pd.to_numeric(pd.Series(values.ravel()), errors="coerce").to_numpy(dtype=float).reshape(values.shape)
+    text = np.isnan(numeric) & ~blank
+    numeric[blank] = 0.0
+    return numeric, text
+
+
+def numeric_matrix(region):
+    """
+    將範圍資料轉為數值矩陣
+
+    Args:
+        region (DataFrame): 範圍資料
+
+    Returns:
+        tuple: (float64 矩陣, 無法轉為數字的文字儲存格遮罩)，文字儲存格的值為 NaN
+    """
+    import numpy as np
+    import pandas as pd
+
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in region.dtypes):
+        matrix = region.to_numpy(dtype=float, na_value=0.0)
+        return matrix, np.zeros(matrix.shape, dtype=bool)
+    return numeric_array(region.to_numpy(dtype=object))
+
+
+def integral_mask(matrix):
+    """數值是否會被輸出為整數"""
+    import numpy as np
+    return np.isfinite(matrix) & (np.abs(matrix - np.round(matrix)) < INTEGER_TOLERANCE)
+
+
+def format_values(values):
+    """
+    將數值陣列格式化為字串列表 (與 format_cell_value 的數值格式相同)
+
+    整數值一次轉為 int64 後輸出，避免逐一判斷與格式化
+    """
+    import numpy as np
+    from utils import format_cell_value
+
+    values = np.asarray(values, dtype=float).ravel()
+    if values.size and integral_mask(values).all() and np.abs(values).max() < 2 ** 63:
+        return [str(value) for value in np.round(values).astype(np.int64).tolist()]
+    return [format_cell_value(value) for value in values.tolist()]
+
+
+def cumulative_sums(region, axis=1):
+    """
+    一次計算範圍中每行 (或每列) 的累積和 (用於二分搜尋的加權隨機表)
+
+    Args:
+        region (DataFrame): 範圍資料
+        axis (int): 1 表示沿每行的各欄累加，0 表示沿每列的各行累加
+
+    Returns:
+        tuple: (累積和矩陣, 每行 (或列) 的文字儲存格數量)，文字儲存格以 0 計算
+    """
+    import numpy as np
+
+    numeric, text = numeric_matrix(region)
+    numeric[text] = 0.0
+    return np.cumsum(numeric, axis=axis), text.sum(axis=axis)
+
+
+def infer_ctype(matrices):
+    """
+    推斷能容納所有數值的最小 C 型別
+
+    Args:
+        matrices (list): 數值矩陣列表 (文字儲存格為 NaN，不列入推斷)
+
+    Returns:
+        str: uint8_t / int16_t / ... / float / double
+    """
+    import numpy as np
+
+    values = np.concatenate([matrix.ravel() for matrix in matrices]) if matrices else np.zeros(0)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return INTEGER_CTYPES[0][0]
+
+    if integral_mask(values).all():
+        low, high = np.round(values.min()), np.round(values.max())
+        for ctype, type_min, type_max in INTEGER_CTYPES:
+            if low >= type_min and high <= type_max:
+                return ctype
+        return "double"
+
+    # 非整數: 所有數值以 7 位有效數字 (float 精度) 表示時不失真才使用 float
+    fractional = np.unique(values[~integral_mask(values)])
+    if np.abs(values).max() <= FLOAT_LIMITS["float"] and \
+            all(float(f"{value:.7g}") == float(f"{value:.10g}") for value in fractional):
+        return "float"
+    return "double"
+
+
+def ctype_limits(ctype):
+    """
+    取得宣告型別的數值範圍
+
+    Returns:
+        tuple: (最小值, 最大值, 是否為整數型別)，不支援的型別返回 None
+    """
+    ctype = " ".join(ctype.split())
+    ctype = CTYPE_ALIASES.get(ctype, ctype)
+    for name, type_min, type_max in INTEGER_CTYPES:
+        if name == ctype:
+            return type_min, type_max, True
+    if ctype in FLOAT_LIMITS:
+        return -FLOAT_LIMITS[ctype], FLOAT_LIMITS[ctype], False
+    return None
+
+
+def find_overflow(matrix, ctype):
+    """
+    找出超出宣告型別的數值
+
+    Args:
+        matrix: 數值矩陣 (文字儲存格為 NaN，不檢查)
+        ctype (str): 宣告的 C 型別
+
+    Returns:
+        tuple: (超出的數量, 第一個超出位置 (行, 列), 該值)，沒有超出時數量為 0
+    """
+    import numpy as np
+
+    limits = ctype_limits(ctype)
+    if limits is None:
+        raise ValueError(f"不支援的型別: {ctype}")
+    type_min, type_max, is_integer = limits
+
+    checked = ~np.isnan(matrix)
+    overflow = checked & ((matrix < type_min) | (matrix > type_max))
+    if is_integer:
+        overflow |= checked & ~integral_mask(matrix)
+
+    count = int(overflow.sum())
+    if count == 0:
+        return 0, None, None
+    row, col = np.argwhere(overflow)[0]
+    return count, (int(row), int(col)), matrix[row, col]
+
+
+def alias_tables(weights):
+    """
+    以整數運算建立 Walker/Vose alias 表 (每一行是一個分布，所有行同時計算)
+
+    每個分布有 n 個項目、總權重 W: 韌體取均勻的 i ∈ [0, n) 與 r ∈ [0, W)，
+    r < prob[i] 時選 i，否則選 alias[i]。各項目的機率恰為 w_i / W，沒有捨入誤差。
+
+    Args:
+        weights: 權重矩陣 (行 x 項目)，必須是非負整數
+
+    Returns:
+        tuple: (prob 矩陣, alias 矩陣, 每行總權重)，皆為 int64
+
+    Raises:
+        ValueError: 權重不是非負整數，或總權重過大無法以 64 位元整數計算
+    """
+    import numpy as np
+
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    if np.isnan(weights).any() or not integral_mask(weights).all():
+        raise ValueError("alias 表的權重必須是整數")
+    if (weights < 0).any():
+        raise ValueError("alias 表的權重不可為負數")
+
+    row_count, item_count = weights.shape
+    totals = np.round(weights).astype(np.int64).sum(axis=1)
+    if item_count and totals.size and item_count * int(totals.max()) >= 2 ** 62:
+        raise ValueError("總權重過大，無法以 64 位元整數建立 alias 表")
+
+    # 每個項目的容量為 n * w_i，每個格子的容量為 W
+    scaled = np.round(weights).astype(np.int64) * item_count
+    capacity = totals[:, None]
+    prob = np.zeros((row_count, item_count), dtype=np.int64)
+    alias = np.tile(np.arange(item_count, dtype=np.int64), (row_count, 1))
+    active = np.ones((row_count, item_count), dtype=bool)
+    active[totals == 0] = False  # 總權重為 0 的分布保持 prob = 0
+    rows = np.arange(row_count)
+
+    # 每一輪在所有行中各完成一個不足容量的項目，最多 n 輪
+    while active.any():
+        small = active & (scaled < capacity)
+        large = active & (scaled >= capacity)
+        paired = small.any(axis=1) & large.any(axis=1)
+
+        # 沒有不足容量的項目時，剩餘項目的容量必定恰為 W
+        finished = active.any(axis=1) & ~paired
+        prob[finished] = np.where(active[finished], capacity[finished], prob[finished])
+        active[finished] = False
+
+        pair_rows = rows[paired]
+        small_idx = small[paired].argmax(axis=1)
+        large_idx = large[paired].argmax(axis=1)
+        small_scaled = scaled[pair_rows, small_idx]
+        prob[pair_rows, small_idx] = small_scaled
+        alias[pair_rows, small_idx] = large_idx
+        scaled[pair_rows, large_idx] -= totals[pair_rows] - small_scaled
+        active[pair_rows, small_idx] = False
+
+    return prob, alias, totals
+
+
+# 非零比例不超過此值時，SPARSE/DENSE 區塊自動選擇稀疏格式
+# (CSR 每個非零值需要值與欄索引兩個項目，再加上每行一個 row_ptr)
+DEFAULT_SPARSE_DENSITY = 1 / 3
+
+
+def csr_structure(matrix, text=None):
+    """
+    計算 CSR (壓縮稀疏列) 結構
+
+    Args:
+        matrix: 數值矩陣 (行 x 欄)
+        text: 文字儲存格遮罩，文字儲存格一律視為非零
+
+    Returns:
+        tuple: (row_ptr, 非零值的行索引, 非零值的欄索引)，非零值依行優先順序排列
+    """
+    import numpy as np
+
+    nonzero = np.nan_to_num(matrix) != 0
+    if text is not None:
+        nonzero |= text
+    rows, cols = np.nonzero(nonzero)
+    row_ptr = np.zeros(matrix.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=matrix.shape[0]), out=row_ptr[1:])
+    return row_ptr, rows, cols
+
+
+# 多範圍資料的軸名稱 ([檔案][範圍][行][欄])
+LAYOUT_AXES = ("FILE", "RANGE", "ROW", "COL")
+
+
+def layout_tensor(blocks, file_count, range_count, row_count, col_count, fill="0"):
+    """
+    將每個檔案、每個範圍的格式化資料組成 [檔案][範圍][行][欄] 陣列，較小的範圍以 fill 補齊
+
+    Args:
+        blocks: {(檔案索引, 範圍索引): (依行優先排列的字串列表, (行數, 欄數))}
+
+    Returns:
+        ndarray: object 陣列
+    """
+    import numpy as np
+
+    tensor = np.full((file_count, range_count, row_count, col_count), fill, dtype=object)
+    for (file_idx, range_idx), (values, (rows, cols)) in blocks.items():
+        block = np.empty(rows * cols, dtype=object)
+        block[:] = values
+        tensor[file_idx, range_idx, :rows, :cols] = block.reshape(rows, cols)
+    return tensor
+
+
+def reorder_axes(tensor, order, axes=LAYOUT_AXES):
+    """
+    依軸名稱順序轉置陣列 (只建立檢視，不複製資料)
+
+    Args:
+        order (list): 軸名稱，例如 ["COL", "FILE", "RANGE", "ROW"]
+        axes (tuple): tensor 目前的軸名稱
+
+    Raises:
+        ValueError: 軸名稱無效或不完整
+    """
+    if sorted(order) != sorted(axes):
+        raise ValueError(f"軸順序必須包含且只包含 {', '.join(axes)}: {', '.join(order)}")
+    return tensor.transpose([axes.index(axis) for axis in order])
+
+
+def nested_initializer(array, indent=""):
+    """將多維陣列輸出為 C 的巢狀初始化列表，最內層一行"""
+    if array.ndim == 1:
+        return "{ " + ", ".join(array.tolist()) + " }"
+    inner_indent = indent + "    "
+    items = [inner_indent + nested_initializer(sub_array, inner_indent) for sub_array in array]
+    return "{\n" + ",\n".join(items) + "\n" + indent + "}"
+
+
+def parse_fixed_scale(spec):
+    """
+    解析定點數比例
+
+    Args:
+        spec (str): "16" 表示乘以 2^16 (Q16)，"D4" 表示乘以 10^4
+
+    Returns:
+        tuple: (比例, 小數位元數)，十進位比例的小數位元數為 None
+
+    Raises:
+        ValueError: 格式無效或比例過大
+    """
+    spec = spec.strip().upper()
+    if spec.isdigit() and int(spec) <= 62:
+        return 2 ** int(spec), int(spec)
+    if spec.startswith("D") and spec[1:].isdigit() and int(spec[1:]) <= 18:
+        return 10 ** int(spec[1:]), None
+    raise ValueError(f"無效的定點數比例: {spec} (二進位 0-62，例如 16；十進位 D0-D18，例如 D4)")
+
+
+def fixed_point(values, scale):
+    """
+    將數值乘以比例後捨入為整數 (四捨五入，.5 遠離 0)
+
+    二進位比例的乘法沒有誤差；十進位比例在乘積接近 .5 時改以分數精確計算，
+    避免浮點乘法的誤差造成錯誤的進位。
+
+    Args:
+        values: 數值陣列 (任意維度，不可含 NaN)
+        scale (int): 比例
+
+    Returns:
+        tuple: (int64 陣列, 最大捨入誤差 (原始單位))
+
+    Raises:
+        ValueError: 有非數值或轉換後超出 64 位元整數
+    """
+    import numpy as np
+    from fractions import Fraction
+
+    values = np.asarray(values, dtype=float)
+    if not np.isfinite(values).all():
+        raise ValueError("定點數轉換的值必須是數字")
+
+    scaled = values * scale
+    if values.size and np.abs(scaled).max() >= 2 ** 63 - 1024:
+        raise ValueError("轉換後的值超出 64 位元整數範圍")
+    fixed = np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)
+
+    # 接近 .5 的乘積逐一以分數重新計算 (二進位比例不需要)
+    if scale & (scale - 1):
+        near_tie = np.abs(np.abs(scaled) % 1.0 - 0.5) < 1e-6
+        for index in zip(*np.nonzero(near_tie)):
+            exact = Fraction(float(values[index])) * scale
+            rounded = int(abs(exact) + Fraction(1, 2))
+            fixed[index] = rounded if exact >= 0 else -rounded
+
+    fixed = fixed.astype(np.int64)
+    if values.size == 0:
+        return fixed, 0.0
+    return fixed, float(np.abs(fixed / scale - values).max())
+
+
+def format_region(region):
+    """
+    將範圍資料格式化為字串矩陣 (結果與逐一呼叫 format_cell_value 相同)
+
+    數值欄位一次格式化；含文字的欄位只對文字與其他非數值儲存格逐一轉換，
+    數字字串保留原文字 (與 format_cell_value 相同，不轉為數值)。
+
+    Returns:
+        ndarray: object 字串矩陣
+    """
+    import numpy as np
+    import pandas as pd
+
+    shape = region.shape
+    numeric_dtypes = all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                         for dtype in region.dtypes)
+    if numeric_dtypes:
+        formatted = np.empty(shape[0] * shape[1], dtype=object)
+        formatted[:] = format_values(region.to_numpy(dtype=float, na_value=0.0))
+        return formatted.reshape(shape)
+
+    values = region.to_numpy(dtype=object)
+    is_number = np.frompyfunc(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+                              1, 1)(values).astype(bool)
+    blank = pd.isna(values)
+    is_number &= ~blank
+
+    formatted = np.empty(shape, dtype=object)
+    formatted[blank] = "0"
+    formatted[is_number] = format_values(values[is_number].astype(float))
+    other = ~(blank | is_number)
+    formatted[other] = [str(value) for value in values[other].tolist()]
+    return formatted
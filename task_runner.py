@@ -0,0 +1,178 @@
+"""
+可取消的背景工作執行器
+
+GUI 的載入與生成工作都交給同一個背景執行緒依序執行。每個工作都有取消標記，
+工作在檔案、範圍與資料列之間檢查標記；送出新工作時會自動取消仍在進行的舊工作，
+避免快速切換工作表時多個載入互相覆寫資料，也讓放棄的工作不再佔用 CPU。
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(BaseException):
+    """
+    工作已被取消
+
+    繼承 BaseException (與 asyncio.CancelledError 相同)，
+    避免被生成引擎中處理個別資料錯誤的 except Exception 攔截而繼續執行。
+    """
+
+
+class CancelToken:
+    """
+    單一工作的取消標記與進度回報
+
+    Args:
+        report_function (callable): 接收 (token, message, fraction) 的進度回報函數
+    """
+
+    def __init__(self, report_function=None):
+        self._event = threading.Event()
+        self._report_function = report_function
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """已取消時引發 TaskCancelled"""
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def report(self, message, fraction=None):
+        """
+        回報進度 (可從背景執行緒呼叫)
+
+        Args:
+            message (str): 進度訊息
+            fraction (float): 完成比例 0-1，None 表示無法估計
+        """
+        if self._report_function and not self._event.is_set():
+            self._report_function(self, message, fraction)
+
+
+class TaskRunner:
+    """
+    單一背景執行緒的工作執行器
+
+    回呼 (on_success / on_error / on_finally / 進度) 一律在 Tk 主執行緒中執行:
+    背景執行緒只把回呼放入佇列，由主執行緒每隔 poll_interval_ms 取出執行
+    (背景執行緒不呼叫任何 Tk 函數，包含 after)。
+    已取消或已被取代的工作不會呼叫 on_success / on_error 與進度回呼，
+    但一定會呼叫 on_finally，讓按鈕與等待畫面等狀態可以還原。
+
+    Args:
+        root: Tk 根視窗 (用於在主執行緒定期執行回呼)
+        progress_callback (callable): 接收 (message, fraction) 的進度顯示函數
+        poll_interval_ms (int): 檢查回呼佇列的間隔 (毫秒)
+    """
+
+    def __init__(self, root, progress_callback=None, poll_interval_ms=50):
+        self.root = root
+        self.progress_callback = progress_callback
+        self.poll_interval_ms = poll_interval_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ExcelCodeTask")
+        self._lock = threading.Lock()
+        self._current = None
+        self._callbacks = queue.Queue()  # 背景執行緒交給主執行緒執行的回呼
+        self._after_id = self.root.after(self.poll_interval_ms, self._poll)
+
+    def submit(self, func, on_success=None, on_error=None, on_finally=None):
+        """
+        送出工作，並取消目前仍在進行或等待中的工作
+
+        Args:
+            func (callable): 在背景執行的函數，接收 CancelToken 作為參數
+            on_success (callable): 成功時以傳回值呼叫
+            on_error (callable): 失敗時以例外呼叫
+            on_finally (callable): 成功、失敗或取消後呼叫
+
+        Returns:
+            CancelToken: 此工作的取消標記
+        """
+        token = CancelToken(self._report)
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+            self._current = token
+        self._executor.submit(self._run, token, func, on_success, on_error, on_finally)
+        return token
+
+    def cancel(self):
+        """取消目前的工作"""
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+                self._current = None
+
+    @property
+    def is_busy(self):
+        with self._lock:
+            return self._current is not None
+
+    def shutdown(self):
+        """取消所有工作並停止執行器 (不等待進行中的工作，也不再執行尚未執行的回呼)"""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _poll(self):
+        """在主執行緒中執行背景執行緒送來的回呼"""
+        try:
+            while True:
+                try:
+                    callback = self._callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                callback()
+        finally:
+            self._after_id = self.root.after(self.poll_interval_ms, self._poll)
+
+    def _run(self, token, func, on_success, on_error, on_finally):
+        result = None
+        error = None
+        cancelled = False
+        try:
+            token.check()
+            result = func(token)
+            token.check()
+        except TaskCancelled:
+            cancelled = True
+        except Exception as e:
+            error = e
+
+        def finish():
+            with self._lock:
+                if self._current is token:
+                    self._current = None
+            try:
+                if cancelled or token.is_cancelled:
+                    return
+                if error is None:
+                    if on_success:
+                        on_success(result)
+                elif on_error:
+                    on_error(error)
+            finally:
+                if on_finally:
+                    on_finally()
+
+        self._callbacks.put(finish)
+
+    def _report(self, token, message, fraction):
+        if not self.progress_callback:
+            return
+
+        def show():
+            with self._lock:
+                is_current = self._current is token
+            if is_current and not token.is_cancelled:
+                self.progress_callback(message, fraction)
+
+        self._callbacks.put(show)
@@ -0,0 +1,487 @@
+"""
+程式碼樣板設定對話框
+
+從 code_generator 分離出來的 Tk 介面，讓生成核心 (console / 程式庫模式)
+不需要匯入 tkinter。
+"""
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from tkinter.scrolledtext import ScrolledText
+
+from code_generator import GenerationContext
+from code_view import ChunkedCodeView
+from task_runner import TaskRunner
+
+
+class TemplateDialog:
+    def __init__(self, gui_instance, code_generator):
+        self.gui = gui_instance  # 保存對主GUI實例的引用
+        self.code_generator = code_generator
+        self.direction_var = None
+        self.preview_cache = gui_instance.preview_cache  # 即時預覽的參數區塊片段快取 (由 GUI 持有並計入記憶體用量)
+        self.preview_runner = None
+        self.preview_after_id = None
+
+    def load_template_from_file(self, file_path):
+        """從檔案載入樣板內容"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                template_content = f.read()
+            return template_content
+        except Exception as e:
+            messagebox.showerror("錯誤", f"無法讀取樣板檔案: {str(e)}")
+            return None
+
+    def show(self):
+        """顯示樣板設定視窗，並提供方向選擇"""
+        # 建立樣板設定窗口
+        template_dialog = tk.Toplevel(self.gui.root)
+        template_dialog.title("設定程式碼樣板")
+        template_dialog.geometry("700x700")  # 增加高度以容納更多說明
+        template_dialog.grab_set()  # 模态窗口
+        template_dialog.minsize(700, 700)  # 設定最小尺寸
+        
+        # 样板说明
+        instruction_frame = ttk.Frame(template_dialog)
+        instruction_frame.pack(fill="x", padx=10, pady=5)
+        
+        ttk.Label(instruction_frame, text="程式碼樣板說明：", font=("Arial", 10, "bold")).pack(anchor="w")
+        instruction_text = """
+在樣板中，您可以使用以下標記：
+
+基本標記:
+- {{LOOP_START}} - 資料迴圈開始 (使用第一個選擇的範圍)
+- {{LOOP_END}} - 資料迴圈結束
+- {{VALUE}} - 當前儲存格值
+- {{ROW_INDEX}} - 當前資料列索引
+- {{COL_INDEX}} - 當前資料行索引
+- {{ALL_COLUMNS}} - 當前行的所有欄位值
+- {{ALL_ROWS}} - 當前列的所有行值 (直向讀取模式)
+
+方向控制標記:
+- {{DIRECTION:ROW}} - 指定為橫向讀取模式 (預設)
+- {{DIRECTION:COLUMN}} - 指定為直向讀取模式
+
+多範圍精確標記:
+- {{RANGE[範圍名稱]_LOOP_START}} - 指定範圍的資料迴圈開始
+- {{RANGE[範圍名稱]_LOOP_END}} - 指定範圍的資料迴圈結束
+- {{RANGE[範圍名稱]_ROW_COUNT}} - 指定範圍的資料列數
+- {{RANGE[範圍名稱]_COL_COUNT}} - 指定範圍的資料行數
+- {{RANGE[範圍名稱]_VALUE[行,列]}} - 指定範圍的特定儲存格值
+
+檔案相關標記:
+- {{FILE_NAME}} - 當前處理的檔案名稱
+- {{FILE_INDEX}} - 當前檔案索引
+- {{FILE_COUNT}} - 總檔案數量
+
+範例: 
+{{RANGE[左上]_VALUE[0,0]}} - 讀取名為"左上"的範圍中第一列第一行的值
+{{RANGE[權重表]_LOOP_START}} - 開始迴圈處理名為"權重表"的範圍
+"""
+            
+        instruction_box = ScrolledText(instruction_frame, height=15, font=("Courier New", 9))
+        instruction_box.pack(fill="x", pady=5)
+        instruction_box.insert("1.0", instruction_text)
+        instruction_box.config(state="disabled")
+        
+        # 讀取方向選擇 (新增)
+        direction_frame = ttk.LabelFrame(template_dialog, text="資料讀取方向")
+        direction_frame.pack(fill="x", padx=10, pady=5)
+        
+        self.direction_var = tk.StringVar(value="row")  # 預設為橫向讀取
+        
+        ttk.Radiobutton(
+            direction_frame, 
+            text="橫向讀取 (Row by Row)",
+            variable=self.direction_var,
+            value="row"
+        ).pack(side="left", padx=20, pady=5)
+        
+        ttk.Radiobutton(
+            direction_frame, 
+            text="直向讀取 (Column by Column)",
+            variable=self.direction_var,
+            value="column"
+        ).pack(side="left", padx=20, pady=5)
+        
+        # 範圍定義區域
+        range_frame = ttk.LabelFrame(template_dialog, text="範圍定義")
+        range_frame.pack(fill="x", padx=10, pady=5)
+        
+        range_list_frame = ttk.Frame(range_frame)
+        range_list_frame.pack(fill="x", padx=5, pady=5)
+        
+        # 顯示已定義的範圍
+        ttk.Label(range_list_frame, text="已定義的範圍:").pack(side="left", padx=5)
+        
+        range_names = tk.StringVar()
+        range_entry = ttk.Entry(range_list_frame, textvariable=range_names, width=40, state="readonly")
+        range_entry.pack(side="left", padx=5, fill="x", expand=True)
+        
+        # 初始化顯示已有的命名範圍
+        if hasattr(self.gui, 'named_ranges'):
+            range_names.set(", ".join(self.gui.named_ranges.keys()))
+        
+        # 範圍定義按鈕
+        def define_range():
+            # 建立範圍定義對話框
+            range_dialog = tk.Toplevel(template_dialog)
+            range_dialog.title("定義範圍")
+            range_dialog.geometry("400x200")
+            range_dialog.grab_set()
+            
+            ttk.Label(range_dialog, text="範圍名稱:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+            name_var = tk.StringVar()
+            name_entry = ttk.Entry(range_dialog, textvariable=name_var, width=20)
+            name_entry.grid(row=0, column=1, padx=5, pady=5, sticky="we")
+            
+            ttk.Label(range_dialog, text="Excel 範圍 (例如: A1:G10):").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+            range_var = tk.StringVar()
+            range_entry = ttk.Entry(range_dialog, textvariable=range_var, width=20)
+            range_entry.grid(row=1, column=1, padx=5, pady=5, sticky="we")
+            
+            # 定義範圍字典 (如果尚未存在)
+            if not hasattr(self.gui, 'named_ranges'):
+                self.gui.named_ranges = {}
+            
+            def save_range():
+                name = name_var.get().strip()
+                range_str = range_var.get().strip()
+                
+                if not name:
+                    messagebox.showerror("錯誤", "請輸入範圍名稱", parent=range_dialog)
+                    return
+                    
+                if not range_str:
+                    messagebox.showerror("錯誤", "請輸入有效的Excel範圍", parent=range_dialog)
+                    return
+                    
+                try:
+                    # 驗證範圍格式
+                    if ":" in range_str:
+                        start, end = range_str.split(":")
+                        # 這裡可以加入更多驗證邏輯
+                    else:
+                        messagebox.showerror("錯誤", "範圍格式不正確，請使用如 A1:G10 的格式", parent=range_dialog)
+                        return
+                    
+                    # 存儲範圍定義
+                    self.gui.named_ranges[name] = range_str
+                    
+                    # 更新範圍列表顯示
+                    range_names.set(", ".join(self.gui.named_ranges.keys()))
+                    
+                    # 關閉對話框
+                    range_dialog.destroy()
+                    
+                except Exception as e:
+                    messagebox.showerror("錯誤", f"處理範圍時出錯: {str(e)}", parent=range_dialog)
+            
+            # 確認和取消按鈕
+            btn_frame = ttk.Frame(range_dialog)
+            btn_frame.grid(row=2, column=0, columnspan=2, pady=10)
+            
+            ttk.Button(btn_frame, text="儲存範圍", command=save_range).pack(side="left", padx=5)
+            ttk.Button(btn_frame, text="取消", command=range_dialog.destroy).pack(side="left", padx=5)
+            
+            # 設置初始焦點
+            name_entry.focus_set()
+        
+        # 刪除範圍功能
+        def delete_range():
+            if not hasattr(self.gui, 'named_ranges') or not self.gui.named_ranges:
+                messagebox.showinfo("提示", "沒有定義的範圍可刪除", parent=template_dialog)
+                return
+                
+            # 建立範圍選擇對話框
+            select_dialog = tk.Toplevel(template_dialog)
+            select_dialog.title("選擇要刪除的範圍")
+            select_dialog.geometry("300x200")
+            select_dialog.grab_set()
+            
+            ttk.Label(select_dialog, text="選擇要刪除的範圍:").pack(padx=5, pady=5, anchor="w")
+            
+            # 建立範圍列表框
+            range_listbox = tk.Listbox(select_dialog)
+            range_listbox.pack(fill="both", expand=True, padx=5, pady=5)
+            
+            # 填充範圍列表
+            for name in self.gui.named_ranges.keys():
+                range_listbox.insert(tk.END, name)
+            
+            def confirm_delete():
+                selected = range_listbox.curselection()
+                if not selected:
+                    messagebox.showinfo("提示", "請選擇要刪除的範圍", parent=select_dialog)
+                    return
+                    
+                # 獲取選擇的範圍名稱
+                selected_idx = selected[0]
+                selected_name = range_listbox.get(selected_idx)
+                
+                # 確認刪除
+                if messagebox.askyesno("確認", f"確定要刪除範圍 '{selected_name}' 嗎?", parent=select_dialog):
+                    # 刪除範圍
+                    del self.gui.named_ranges[selected_name]
+                    
+                    # 更新範圍列表顯示
+                    range_names.set(", ".join(self.gui.named_ranges.keys()))
+                    
+                    # 關閉對話框
+                    select_dialog.destroy()
+            
+            # 確認和取消按鈕
+            btn_frame = ttk.Frame(select_dialog)
+            btn_frame.pack(pady=10)
+            
+            ttk.Button(btn_frame, text="刪除", command=confirm_delete).pack(side="left", padx=5)
+            ttk.Button(btn_frame, text="取消", command=select_dialog.destroy).pack(side="left", padx=5)
+        
+        # 範圍操作按鈕
+        btn_frame = ttk.Frame(range_frame)
+        btn_frame.pack(fill="x", pady=5)
+        
+        ttk.Button(btn_frame, text="定義新範圍", command=define_range).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="刪除範圍", command=delete_range).pack(side="left", padx=5)
+        
+        # 新增「從檔案載入」按鈕
+        load_frame = ttk.Frame(template_dialog)
+        load_frame.pack(fill="x", padx=10, pady=5)
+        
+        def load_template_file():
+            file_path = filedialog.askopenfilename(
+                title="選擇樣板檔案",
+                filetypes=[("文字檔案", "*.txt"), ("C/C++檔案", "*.c;*.cpp;*.h"), ("所有檔案", "*.*")],
+                parent=template_dialog
+            )
+            if file_path:
+                template_content = self.load_template_from_file(file_path)
+                if template_content:
+                    template_text.delete("1.0", tk.END)
+                    template_text.insert("1.0", template_content)
+                    
+        ttk.Button(load_frame, text="從檔案載入樣板", command=load_template_file).pack(side="left", padx=5)
+        
+        # 样板编辑区域标题
+        ttk.Separator(template_dialog, orient="horizontal").pack(fill="x", padx=10, pady=5)
+        ttk.Label(template_dialog, text="請在下方編輯程式碼樣板：", font=("Arial", 10, "bold")).pack(anchor="w", padx=10, pady=5)
+        
+        # 样板编辑区域
+        template_frame = ttk.Frame(template_dialog)
+        template_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        # 編輯區與 (選用的) 即時預覽區並排
+        template_panes = ttk.PanedWindow(template_frame, orient="horizontal")
+        template_panes.pack(fill="both", expand=True)
+        
+        editor_frame = ttk.Frame(template_panes)
+        template_panes.add(editor_frame, weight=1)
+        
+        template_text = ScrolledText(editor_frame, font=("Courier New", 10))
+        template_text.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        # 如果已经有样板，就显示
+        if self.gui.code_template:
+            template_text.insert("1.0", self.gui.code_template)
+        else:
+            # 預設範例樣板 - 添加命名範圍支持和方向控制
+            default_template = """// 資料處理範例 - 支援橫向與直向讀取
+{{DIRECTION:ROW}}  // 設定為橫向讀取模式 (預設，可改為 {{DIRECTION:COLUMN}} 進行直向讀取)
+
+#define LEFT_TOP_ROWS {{RANGE[左上]_ROW_COUNT}}
+#define LEFT_TOP_COLS {{RANGE[左上]_COL_COUNT}}
+
+// 左上角區域數據 - 橫向讀取 (Row by Row)
+unsigned int left_top_area[LEFT_TOP_ROWS][LEFT_TOP_COLS] = {
+{{RANGE[左上]_LOOP_START}}
+    { {{ALL_COLUMNS}} },  // Row {{ROW_INDEX}}
+{{RANGE[左上]_LOOP_END}}
+};
+
+// 特定儲存格值參考
+int first_value = {{RANGE[左上]_VALUE[0,0]}};
+int second_value = {{RANGE[左上]_VALUE[1,1]}};
+
+// 使用 ALL_ROWS 示範直向讀取
+void process_column_data() {
+{{DIRECTION:COLUMN}}  // 切換為直向讀取
+{{RANGE[左上]_LOOP_START}}
+    int column_{{COL_INDEX}}_data[] = { {{ALL_ROWS}} };  // Column {{COL_INDEX}}
+{{RANGE[左上]_LOOP_END}}
+}
+"""
+            template_text.insert("1.0", default_template)
+        
+        self.create_live_preview(template_dialog, load_frame, template_panes, template_text)
+        
+        # 按鈕區域
+        btn_frame = ttk.Frame(template_dialog)
+        btn_frame.pack(fill="x", padx=10, pady=(10, 20))  # 增加底部間距
+        
+        # 儲存到檔案按鈕
+        def save_template_to_file():
+            template_content = template_text.get("1.0", tk.END).strip()
+            if not template_content:
+                messagebox.showerror("錯誤", "樣板不能為空", parent=template_dialog)
+                return
+                
+            file_path = filedialog.asksaveasfilename(
+                title="儲存樣板至檔案",
+                defaultextension=".txt",
+                filetypes=[("文字檔案", "*.txt"), ("C檔案", "*.c"), ("C++檔案", "*.cpp"), ("所有檔案", "*.*")],
+                parent=template_dialog
+            )
+            
+            if file_path:
+                try:
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(template_content)
+                    messagebox.showinfo("成功", f"樣板已儲存至 {file_path}", parent=template_dialog)
+                except Exception as e:
+                    messagebox.showerror("錯誤", f"儲存樣板時發生錯誤: {str(e)}", parent=template_dialog)
+        
+        # 确认按钮
+        def confirm_template():
+            template_content = template_text.get("1.0", tk.END).strip()
+            if not template_content:
+                messagebox.showerror("錯誤", "樣板不能為空", parent=template_dialog)
+                return
+            
+            # Add template validation
+            # 加入模板驗證
+            is_valid, unsupported_tags = self.code_generator.validate_template(template_content)
+            if not is_valid:
+                result = messagebox.askyesno(
+                    "模板驗證警告", 
+                    f"發現不支援的標記: {', '.join(unsupported_tags)}\n\n是否仍要繼續使用此模板？",
+                    parent=template_dialog
+                )
+                if not result:
+                    return
+            
+            # 設定模板内容
+            self.gui.code_template = template_content
+            
+            # 記錄讀取方向設定
+            self.gui.template_direction = self.direction_var.get()
+            self.gui.log(f"已設定模板讀取方向: {self.gui.template_direction}")
+            
+            # 檢查樣板中的方向標記
+            if "{{DIRECTION:ROW}}" in template_content:
+                self.gui.template_direction = "row"
+                self.gui.log("模板中指定橫向讀取模式")
+            elif "{{DIRECTION:COLUMN}}" in template_content:
+                self.gui.template_direction = "column"
+                self.gui.log("模板中指定直向讀取模式")
+            
+            self.gui.template_preview.config(text="已設定自訂樣板")
+            self.gui.generate_button.config(state="normal")
+            template_dialog.destroy()
+        
+        # 儲存至檔案按鈕
+        save_file_btn = ttk.Button(btn_frame, text="儲存至檔案", command=save_template_to_file, width=15)
+        save_file_btn.pack(side="left", padx=5)
+        
+        # 放置明显的确认按钮
+        confirm_btn = ttk.Button(btn_frame, text="確認樣板", command=confirm_template, width=15)
+        confirm_btn.pack(side="right", padx=5)
+        
+        # 取消按钮
+        cancel_btn = ttk.Button(btn_frame, text="取消", command=template_dialog.destroy, width=10)
+        cancel_btn.pack(side="right", padx=5)
+        
+        # 在所有元件都加入後，使視窗自適應內容大小
+        template_dialog.update_idletasks()
+        # 重置視窗大小以適應所有內容
+        template_dialog.geometry("")
+
+    def create_live_preview(self, template_dialog, option_frame, template_panes, template_text):
+        """建立即時預覽區: 編輯樣板後 (延遲 400ms) 以已載入的資料重新生成預覽"""
+        preview_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(option_frame, text="即時預覽", variable=preview_var,
+                        command=lambda: toggle_preview()).pack(side="right", padx=5)
+        
+        preview_frame = ttk.LabelFrame(template_panes, text="預覽")
+        preview_status = ttk.Label(preview_frame, text="")
+        preview_status.pack(anchor="w", padx=5)
+        preview_text = ScrolledText(preview_frame, font=("Courier New", 9), state="disabled")
+        preview_text.pack(fill="both", expand=True, padx=5, pady=5)
+        preview_view = ChunkedCodeView(self.gui.root, preview_text, read_only=True)
+        
+        # 預覽使用獨立的執行器，新的預覽只會取消先前的預覽，不影響載入與生成工作
+        self.preview_runner = TaskRunner(self.gui.root)
+        
+        def render_preview():
+            self.preview_after_id = None
+            if not preview_var.get():
+                return
+            
+            template_content = template_text.get("1.0", "end-1c")
+            if not self.gui.excel_files or not self.gui.dfs or not template_content.strip():
+                preview_status.config(text="尚未載入資料，無法預覽")
+                return
+            
+            # 與確認樣板時相同: 以選擇的方向為準，樣板中的方向標記優先
+            direction = self.direction_var.get()
+            if "{{DIRECTION:ROW}}" in template_content:
+                direction = "row"
+            elif "{{DIRECTION:COLUMN}}" in template_content:
+                direction = "column"
+            
+            errors = []
+            context = GenerationContext(
+                list(self.gui.excel_files),
+                dict(self.gui.dfs),
+                self.gui.selected_ranges,
+                self.gui.selected_range,
+                named_ranges=self.gui.named_ranges,
+                template_direction=direction,
+                error_function=errors.append,
+                render_cache=self.preview_cache
+            )
+            start_time = time.perf_counter()
+            
+            def preview_task(token):
+                context.cancel_token = token
+                return self.code_generator.render(context, template_content)
+            
+            def show_preview(code):
+                preview_view.set_text(code)
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                status = f"預覽已更新 ({elapsed_ms:.0f} ms)"
+                if errors:
+                    status += f" - {errors[0]}"
+                preview_status.config(text=status)
+            
+            def show_preview_error(e):
+                preview_status.config(text=f"預覽失敗: {str(e)}")
+            
+            preview_status.config(text="正在生成預覽...")
+            self.preview_runner.submit(preview_task, on_success=show_preview, on_error=show_preview_error)
+        
+        def schedule_preview(event=None):
+            # <<Modified>> 只觸發一次，需重設修改標記
+            template_text.edit_modified(False)
+            if not preview_var.get():
+                return
+            if self.preview_after_id is not None:
+                template_dialog.after_cancel(self.preview_after_id)
+            self.preview_after_id = template_dialog.after(400, render_preview)
+        
+        def toggle_preview():
+            if preview_var.get():
+                template_panes.add(preview_frame, weight=1)
+                render_preview()
+            else:
+                template_panes.forget(preview_frame)
+                self.preview_runner.cancel()
+        
+        def on_destroy(event):
+            if event.widget is template_dialog:
+                self.preview_runner.shutdown()
+                self.preview_cache.clear_memory()
+        
+        template_text.edit_modified(False)
+        template_text.bind("<<Modified>>", schedule_preview)
+        template_dialog.bind("<Destroy>", on_destroy, add="+")
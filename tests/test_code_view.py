@@ -0,0 +1,126 @@
+"""
+ChunkedCodeView 的分段顯示
+
+每段在行尾結束，全部顯示後元件內容與緩衝相同；顯示期間元件保持唯讀，
+儲存與複製使用緩衝內容，使用者編輯後改用元件中的內容。
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_view import ChunkedCodeView  # noqa: E402
+
+
+class FakeRoot:
+    """記錄閒置排程的 Tk 根視窗替身，由測試逐一執行"""
+
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after_idle(self, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_one(self):
+        after_id = min(self.pending)
+        self.pending.pop(after_id)()
+
+    def run_all(self):
+        while self.pending:
+            self.run_one()
+
+
+class FakeText:
+    """記錄插入內容、狀態與修改標記的文字元件替身"""
+
+    def __init__(self):
+        self.content = ""
+        self.state = "normal"
+        self.modified = False
+        self.inserts = []
+
+    def config(self, state=None):
+        if state is not None:
+            self.state = state
+
+    def delete(self, start, end):
+        assert self.state == "normal"
+        self.content = ""
+
+    def insert(self, index, text):
+        assert self.state == "normal"
+        self.content += text
+        self.inserts.append(text)
+        self.modified = True
+
+    def get(self, start, end):
+        return self.content
+
+    def edit_modified(self, flag=None):
+        if flag is None:
+            return self.modified
+        self.modified = flag
+
+
+CODE = "".join(f"    {{ {index}, {index * 2}, {index * 3} }},\n" for index in range(200))
+
+
+class ChunkedCodeViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.text = FakeText()
+
+    def test_chunks_end_at_line_boundaries(self):
+        done = []
+        view = ChunkedCodeView(self.root, self.text, chunk_size=500)
+        view.set_text(CODE, on_done=lambda: done.append(True))
+        self.assertTrue(view.is_loading)
+        self.assertEqual(self.text.state, "disabled")
+
+        self.root.run_one()
+        self.assertEqual(self.text.state, "disabled")
+        self.assertEqual(view.get_text(), CODE)
+        self.root.run_all()
+
+        self.assertEqual(self.text.content, CODE)
+        self.assertGreater(len(self.text.inserts), 5)
+        for chunk in self.text.inserts:
+            self.assertTrue(chunk.endswith("\n"))
+            self.assertLess(len(chunk), 500 + 40)
+        self.assertEqual(done, [True])
+        self.assertFalse(view.is_loading)
+        self.assertEqual(self.text.state, "normal")
+        self.assertFalse(self.text.modified)
+
+    def test_read_only_and_user_edits(self):
+        view = ChunkedCodeView(self.root, self.text, chunk_size=1000, read_only=True)
+        view.set_text("int a;\nint b;")
+        self.root.run_all()
+        self.assertEqual(self.text.content, "int a;\nint b;")
+        self.assertEqual(self.text.state, "disabled")
+
+        # 使用者編輯後，取得的內容來自元件
+        self.text.content = "int c;"
+        self.text.modified = True
+        self.assertEqual(view.get_text(), "int c;")
+
+    def test_new_text_cancels_pending_chunks(self):
+        view = ChunkedCodeView(self.root, self.text, chunk_size=100)
+        view.set_text(CODE)
+        self.root.run_one()
+        view.set_text("int only;\n")
+        self.root.run_all()
+        self.assertEqual(self.text.content, "int only;\n")
+        self.assertEqual(view.get_text(), "int only;\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+資料輸出格式 (blob、csv)
+
+二進位檔的內容必須與標頭的位移、維度與型別巨集一致，以 C 程式讀回的值必須與範圍資料相同；
+csv 必須能以標準的 CSV 讀取器還原每個儲存格。
+"""
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_writers import write_blob, write_csv, BLOB_DTYPES  # noqa: E402
+
+FRAMES = {
+    "a.xlsx": pd.DataFrame([[1, 2, 3], [4, 5, 300]]),
+    "b.xlsx": pd.DataFrame([[2, 4, 6], [8, 10, 600]]),
+}
+RANGES = [("Small", (0, 0, 0, 1)), ("Wide", (0, 0, 1, 2))]
+
+READER_SOURCE = r'''#include <stdio.h>
+#include <stdlib.h>
+#include "tables.h"
+int main(int argc, char **argv)
+{
+    static uint8_t blob[TBL_BLOB_SIZE] __attribute__((aligned(8)));
+    FILE *file = fopen(argv[1], "rb");
+    if (!file || fread(blob, 1, sizeof(blob), file) != sizeof(blob)) return 1;
+    fclose(file);
+    printf("%d %d %d\n", TBL_SMALL_PTR(blob)[TBL_SMALL_INDEX(1, 0, 1)],
+           TBL_WIDE_PTR(blob)[TBL_WIDE_INDEX(0, 1, 2)], TBL_WIDE_PTR(blob)[TBL_WIDE_INDEX(1, 1, 2)]);
+    return 0;
+}
+'''
+
+
+def header_macros(header):
+    """取得標頭中沒有參數的 #define 巨集"""
+    macros = {}
+    for line in header.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == "#define":
+            macros[parts[1]] = parts[2]
+    return macros
+
+
+class WriteBlobTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.header_path = os.path.join(self.directory, "tables.h")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, ranges=RANGES, options=None, frames=FRAMES):
+        return write_blob(list(frames), frames, ranges, self.header_path, options or {"prefix": "TBL"})
+
+    def test_blob_matches_header_macros(self):
+        results = self.write()
+        self.assertEqual(results, [(self.header_path, True), (os.path.join(self.directory, "tables.bin"), True)])
+        with open(self.header_path, encoding="utf-8") as f:
+            macros = header_macros(f.read())
+        with open(os.path.join(self.directory, "tables.bin"), "rb") as f:
+            blob = f.read()
+        self.assertEqual(int(macros["TBL_BLOB_SIZE"]), len(blob))
+        self.assertEqual(macros["TBL_FILE_COUNT"], "2")
+
+        for name, (start_row, start_col, end_row, end_col) in RANGES:
+            macro = f"TBL_{name.upper()}"
+            offset = int(macros[f"{macro}_OFFSET"])
+            shape = (2, int(macros[f"{macro}_ROWS"]), int(macros[f"{macro}_COLS"]))
+            self.assertEqual(offset % 8, 0)
+            self.assertEqual(shape[1:], (end_row - start_row + 1, end_col - start_col + 1))
+            values = np.frombuffer(blob, dtype=BLOB_DTYPES[macros[f"{macro}_TYPE"]],
+                                   count=int(np.prod(shape)), offset=offset).reshape(shape)
+            expected = [frame.iloc[start_row:end_row + 1, start_col:end_col + 1].values for frame in FRAMES.values()]
+            self.assertEqual(values.tolist(), np.array(expected).tolist())
+
+        self.assertEqual(macros["TBL_SMALL_TYPE"], "uint8_t")
+        self.assertEqual(macros["TBL_WIDE_TYPE"], "uint16_t")
+        self.assertEqual(self.write(), [(self.header_path, False),
+                                        (os.path.join(self.directory, "tables.bin"), False)])
+
+    def test_declared_types_and_errors(self):
+        self.write(options={"prefix": "TBL", "ctype": {"Wide": "int32_t"}})
+        with open(self.header_path, encoding="utf-8") as f:
+            macros = header_macros(f.read())
+        self.assertEqual(macros["TBL_WIDE_TYPE"], "int32_t")
+        self.assertEqual(int(macros["TBL_BLOB_SIZE"]), 8 + 2 * 2 * 3 * 4)
+
+        with self.assertRaises(ValueError) as caught:
+            self.write(options={"prefix": "TBL", "ctype": "uint8_t"})
+        self.assertIn("範圍 Wide 有 2 個值超出 uint8_t (第一個: 300", str(caught.exception))
+        with self.assertRaises(ValueError) as caught:
+            self.write(frames={"a.xlsx": pd.DataFrame([[1, "x"]])}, ranges=[("Small", (0, 0, 0, 1))])
+        self.assertIn("1 個非數值儲存格", str(caught.exception))
+
+    @unittest.skipUnless(shutil.which("gcc"), "需要 gcc")
+    def test_c_reader_reads_the_blob(self):
+        self.write()
+        source_path = os.path.join(self.directory, "reader.c")
+        program_path = os.path.join(self.directory, "reader")
+        with open(source_path, "w", encoding="utf-8") as f:
+            f.write(READER_SOURCE)
+        subprocess.run(["gcc", "-Wall", "-Werror", "-I", self.directory, "-o", program_path, source_path], check=True)
+        output = subprocess.run([program_path, os.path.join(self.directory, "tables.bin")],
+                                check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output, "4 300 600\n")
+
+
+class WriteCsvTest(unittest.TestCase):
+
+    FRAMES = {
+        "a.xlsx": pd.DataFrame([[1, 2.5, "a,b"], ['say "hi"', None, 3]]),
+        "b.xlsx": pd.DataFrame([[7, 8, 9], [10, 11, 12]]),
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_path = os.path.join(self.directory, "data.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_rows(self, delimiter=","):
+        with open(self.output_path, newline="", encoding="utf-8") as f:
+            return list(csv.reader(f, delimiter=delimiter))
+
+    def test_rows_by_file_then_range(self):
+        messages = []
+        results = write_csv(list(self.FRAMES), self.FRAMES, [("X", (0, 0, 1, 2)), ("Y", (1, 1, 1, 2))],
+                            self.output_path, log_function=messages.append)
+        self.assertEqual(results, [(self.output_path, True)])
+        self.assertEqual(self.read_rows(), [
+            ["1", "2.5", "a,b"], ['say "hi"', "0", "3"], ["0", "3"],
+            ["7", "8", "9"], ["10", "11", "12"], ["11", "12"],
+        ])
+        self.assertEqual(messages, ["已輸出 2 個檔案、2 個範圍，共 6 行"])
+
+    def test_column_orientation_and_delimiter(self):
+        frames = {"a.xlsx": self.FRAMES["a.xlsx"]}
+        write_csv(list(frames), frames, [("X", (0, 0, 1, 2))], self.output_path,
+                  {"delimiter": "\t", "orientation": "column"})
+        self.assertEqual(self.read_rows("\t"), [["1", 'say "hi"'], ["2.5", "0"], ["a,b", "3"]])
+        with open(self.output_path, encoding="utf-8") as f:
+            self.assertEqual(f.read().splitlines()[2], "a,b\t3")
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            write_csv([], {}, [], self.output_path, {"delimiter": ""})
+        with self.assertRaises(ValueError):
+            write_csv([], {}, [], self.output_path, {"orientation": "diagonal"})
+
+
+if __name__ == "__main__":
+    unittest.main()
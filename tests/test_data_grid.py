@@ -0,0 +1,163 @@
+"""
+虛擬化資料表格預覽 (DataGrid)
+
+只繪製可見範圍內的儲存格；列號與欄標題使用 Excel 標記，捲動後顯示對應位置的值，
+過長的內容以省略號截斷。以假的 Canvas 記錄繪製的文字，不需要顯示器。
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_grid import DataGrid, cell_text  # noqa: E402
+
+
+class FakeCanvas:
+    """記錄繪製文字的 Canvas 替身，大小固定"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.texts = []
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def delete(self, tag):
+        self.texts = []
+
+    def create_rectangle(self, *coords, **options):
+        pass
+
+    def create_text(self, x, y, text, anchor=None, font=None):
+        self.texts.append((x, y, text, anchor))
+
+
+class FakeScrollbar:
+
+    def __init__(self):
+        self.position = None
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def make_grid(width=500, height=220):
+    """不建立 Tk 視窗的 DataGrid：寬 500 可見 4 欄，高 220 可見 10 列"""
+    grid = DataGrid.__new__(DataGrid)
+    grid.cell_width = 90
+    grid.row_height = 20
+    grid.header_width = 56
+    grid.font = None
+    grid.df = None
+    grid.row_count = grid.col_count = 0
+    grid.top_row = grid.left_col = 0
+    grid.canvas = FakeCanvas(width, height)
+    grid.v_scrollbar = FakeScrollbar()
+    grid.h_scrollbar = FakeScrollbar()
+    return grid
+
+
+def drawn(grid):
+    """(欄標題, 列標題, 儲存格文字的二維列表)"""
+    texts = grid.canvas.texts
+    cells = [(y, x, text) for x, y, text, anchor in texts if anchor == "w"]
+    headers = [(x, y, text) for x, y, text, anchor in texts if anchor is None]
+    column_headers = [text for x, y, text in headers if y < grid.row_height]
+    row_headers = [text for x, y, text in headers if y >= grid.row_height]
+    rows = {}
+    for y, x, text in sorted(cells):
+        rows.setdefault(y, []).append(text)
+    return column_headers, row_headers, list(rows.values())
+
+
+class CellTextTest(unittest.TestCase):
+
+    def test_blank_and_values(self):
+        self.assertEqual(cell_text(None), "")
+        self.assertEqual(cell_text(np.nan), "")
+        self.assertEqual(cell_text(float("nan")), "")
+        self.assertEqual(cell_text(0), "0")
+        self.assertEqual(cell_text(2.5), "2.5")
+        self.assertEqual(cell_text("x"), "x")
+
+
+class ScrollTargetTest(unittest.TestCase):
+
+    def test_moveto_units_and_pages_are_clamped(self):
+        self.assertEqual(DataGrid._scroll_target(("moveto", "0.5"), 0, 1000, 10), 500)
+        self.assertEqual(DataGrid._scroll_target(("moveto", "1.0"), 0, 1000, 10), 990)
+        self.assertEqual(DataGrid._scroll_target(("moveto", "-0.2"), 50, 1000, 10), 0)
+        self.assertEqual(DataGrid._scroll_target(("scroll", "3", "units"), 5, 1000, 10), 8)
+        self.assertEqual(DataGrid._scroll_target(("scroll", "-3", "units"), 1, 1000, 10), 0)
+        self.assertEqual(DataGrid._scroll_target(("scroll", "1", "pages"), 5, 1000, 10), 14)
+        self.assertEqual(DataGrid._scroll_target(("scroll", "1", "pages"), 985, 1000, 10), 990)
+        # 資料比可見區域少時停在開頭
+        self.assertEqual(DataGrid._scroll_target(("scroll", "5", "units"), 0, 3, 10), 0)
+
+
+class DataGridRedrawTest(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(np.arange(10000 * 50).reshape(10000, 50))
+        self.grid = make_grid()
+
+    def test_draws_only_visible_cells(self):
+        self.grid.set_data(self.df)
+        column_headers, row_headers, rows = drawn(self.grid)
+        # 可見 10 列 4 欄，多繪製一列一欄讓邊緣的部分儲存格也有內容
+        self.assertEqual(column_headers, ["A", "B", "C", "D", "E"])
+        self.assertEqual(row_headers, [str(row) for row in range(1, 12)])
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0], ["0", "1", "2", "3", "4"])
+        self.assertEqual(rows[10], ["500", "501", "502", "503", "504"])
+        self.assertEqual(self.grid.v_scrollbar.position, (0.0, 10 / 10000))
+        self.assertEqual(self.grid.h_scrollbar.position, (0.0, 4 / 50))
+
+    def test_range_offset_and_scrolling(self):
+        self.grid.set_data(self.df, start_row=100, start_col=26, end_row=9099, end_col=45)
+        column_headers, row_headers, rows = drawn(self.grid)
+        self.assertEqual(column_headers, ["AA", "AB", "AC", "AD", "AE"])
+        self.assertEqual(row_headers[0], "101")
+        self.assertEqual(rows[0][0], str(100 * 50 + 26))
+
+        self.grid.yview("moveto", "0.5")
+        self.grid.xview("scroll", "1", "pages")
+        column_headers, row_headers, rows = drawn(self.grid)
+        self.assertEqual((self.grid.top_row, self.grid.left_col), (4500, 3))
+        self.assertEqual(column_headers, ["AD", "AE", "AF", "AG", "AH"])
+        self.assertEqual(row_headers[0], "4601")
+        self.assertEqual(rows[0][0], str(4600 * 50 + 29))
+
+        # 捲到結尾時只繪製剩餘的列
+        self.grid.yview("moveto", "1.0")
+        _, row_headers, rows = drawn(self.grid)
+        self.assertEqual(self.grid.top_row, 9000 - 10)
+        self.assertEqual(row_headers[-1], "9100")
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(self.grid.v_scrollbar.position, (8990 / 9000, 1.0))
+
+    def test_blank_truncated_and_out_of_frame_cells(self):
+        df = pd.DataFrame([[np.nan, "a" * 20, 1.5], [None, "short", 2]], dtype=object)
+        self.grid.set_data(df, end_row=3)
+        _, row_headers, rows = drawn(self.grid)
+        self.assertEqual(row_headers, ["1", "2", "3", "4"])
+        self.assertEqual(rows[0], ["", "a" * 10 + "…", "1.5"])
+        self.assertEqual(rows[1], ["", "short", "2"])
+        # 超出資料框的列顯示為空白
+        self.assertEqual(rows[2], ["", "", ""])
+
+        self.grid.clear()
+        self.assertEqual(self.grid.canvas.texts, [])
+        self.assertEqual(self.grid.v_scrollbar.position, (0.0, 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
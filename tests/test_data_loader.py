@@ -0,0 +1,164 @@
+"""
+工作表資料快取 (WorkbookCache) 與背景預先載入 (PrefetchingFrames)
+
+以假的 load_sheet 產生已知大小的資料框，檢查估計大小的累計、LRU 淘汰順序與檔案修改後的重新載入，
+以及預先載入的領先檔案數上限、載入錯誤的回報與串流模式的釋放通知。
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+from data_loader import PrefetchingFrames, WorkbookCache, estimate_frame_bytes  # noqa: E402
+
+
+def fake_frame(file_path):
+    """依檔名長度決定列數的資料框 (a.xlsx 100 列、bb.xlsx 200 列 ...)，大小可預期"""
+    rows = len(os.path.splitext(os.path.basename(file_path))[0])
+    return pd.DataFrame([[float(index)] * 4 for index in range(rows * 100)])
+
+
+class DataLoaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loaded = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_file(self, name):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, "wb") as f:
+            f.write(b"")
+        return file_path
+
+    def patch_load_sheet(self):
+        def load_sheet(file_path, sheet_name):
+            self.loaded.append(os.path.basename(file_path))
+            return fake_frame(file_path)
+        return mock.patch.object(data_loader, "load_sheet", load_sheet)
+
+
+class WorkbookCacheTest(DataLoaderTestCase):
+
+    def test_byte_accounting_and_lru_eviction(self):
+        a, b, c = self.make_file("a.xlsx"), self.make_file("b.xlsx"), self.make_file("c.xlsx")
+        size = estimate_frame_bytes(fake_frame(a))
+        cache = WorkbookCache(max_bytes=2 * size)
+        with self.patch_load_sheet():
+            cache.get(a, "Sheet1")
+            cache.get(b, "Sheet1")
+            self.assertEqual(cache.usage(), (2 * size, 2))
+            cache.get(a, "Sheet1")  # a 成為最近使用
+            cache.get(c, "Sheet1")  # 淘汰最久未使用的 b
+            self.assertEqual(cache.usage(), (2 * size, 2))
+            self.assertEqual(cache.evictions, 1)
+            cache.get(a, "Sheet1")
+            cache.get(b, "Sheet1")
+        self.assertEqual(self.loaded, ["a.xlsx", "b.xlsx", "c.xlsx", "b.xlsx"])
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_modified_file_is_reloaded_without_double_counting(self):
+        a = self.make_file("a.xlsx")
+        cache = WorkbookCache()
+        with self.patch_load_sheet():
+            first = cache.get(a, "Sheet1")
+            mtime = os.path.getmtime(a)
+            os.utime(a, (mtime + 10, mtime + 10))
+            second = cache.get(a, "Sheet1")
+        self.assertIsNot(first, second)
+        self.assertEqual(cache.usage(), (estimate_frame_bytes(second), 1))
+        self.assertEqual(self.loaded, ["a.xlsx", "a.xlsx"])
+
+    def test_oversized_entry_kept_and_limit_changes(self):
+        a, bb = self.make_file("a.xlsx"), self.make_file("bb.xlsx")
+        small, large = estimate_frame_bytes(fake_frame(a)), estimate_frame_bytes(fake_frame(bb))
+        cache = WorkbookCache(max_bytes=small)
+        with self.patch_load_sheet():
+            cache.get(a, "Sheet1")
+            cache.get(bb, "Sheet1")
+        # 最近加入的項目一定保留，即使超過上限
+        self.assertEqual(cache.usage(), (large, 1))
+
+        cache.set_max_bytes(large + small)
+        with self.patch_load_sheet():
+            cache.get(a, "Sheet1")
+        self.assertEqual(cache.usage(), (large + small, 2))
+        cache.set_max_bytes(small)
+        self.assertEqual(cache.usage(), (small, 1))
+        self.assertEqual(cache.clear(), small)
+        self.assertEqual(cache.usage(), (0, 0))
+
+
+class PrefetchingFramesTest(DataLoaderTestCase):
+
+    def wait_for_loads(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.loaded) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_loads_ahead_at_most_max_ahead_files(self):
+        files = [self.make_file(name) for name in ("a.xlsx", "bb.xlsx", "ccc.xlsx", "dddd.xlsx")]
+        with self.patch_load_sheet():
+            frames = PrefetchingFrames(files, "Sheet1", max_ahead=1)
+            try:
+                self.assertEqual(len(frames[files[0]]), 100)
+                self.wait_for_loads(2)
+                time.sleep(0.1)
+                self.assertEqual(self.loaded, ["a.xlsx", "bb.xlsx"])
+
+                self.assertEqual([len(frames[file_path]) for file_path in files], [100, 200, 300, 400])
+                self.assertEqual(self.loaded, ["a.xlsx", "bb.xlsx", "ccc.xlsx", "dddd.xlsx"])
+                self.assertEqual(frames.reload_count, 0)
+            finally:
+                frames.close()
+
+    def test_load_errors_are_reported_per_file(self):
+        files = [self.make_file(name) for name in ("a.xlsx", "bad.xlsx", "ccc.xlsx")]
+        error = ValueError("壞掉的檔案")
+
+        def load_sheet(file_path, sheet_name):
+            if "bad" in file_path:
+                raise error
+            return fake_frame(file_path)
+
+        with mock.patch.object(data_loader, "load_sheet", load_sheet):
+            frames = PrefetchingFrames(files, "Sheet1", max_ahead=2)
+            try:
+                self.assertEqual(len(frames[files[0]]), 100)
+                with self.assertRaises(ValueError):
+                    frames[files[1]]
+                self.assertEqual(len(frames[files[2]]), 300)
+                self.assertEqual(frames.errors, {files[1]: error})
+            finally:
+                frames.close()
+
+    def test_stream_release_notifies_and_refuses_reload(self):
+        files = [self.make_file(name) for name in ("a.xlsx", "bb.xlsx", "ccc.xlsx")]
+        released = []
+        with self.patch_load_sheet():
+            frames = PrefetchingFrames(files, "Sheet1", max_ahead=1, release_consumed=True,
+                                       allow_reload=False, on_release=released.append)
+            try:
+                frames[files[0]]
+                frames[files[2]]
+                self.assertEqual(released, files[:2])
+                with self.assertRaises(data_loader.ReleasedFrameError):
+                    frames[files[0]]
+                self.assertEqual(frames.refused_reloads, [files[0]])
+            finally:
+                frames.close()
+        self.assertEqual(self.loaded, ["a.xlsx", "bb.xlsx", "ccc.xlsx"])
+
+
+if __name__ == "__main__":
+    unittest.main()
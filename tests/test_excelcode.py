@@ -0,0 +1,79 @@
+"""
+程式庫介面 (excelcode) 的生成與錯誤回報
+
+不經過 GUI 直接以資料框生成程式碼；設定錯誤以 GenerationError 回報，多個執行緒可同時生成。
+"""
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excelcode  # noqa: E402
+from code_generator import CodeGenerator  # noqa: E402
+
+TEMPLATE = """unsigned int table[{{ROW_COUNT}}][{{COL_COUNT}}] = {
+{{LOOP_START}}
+    { {{ALL_COLUMNS}} },
+{{LOOP_END}}
+};"""
+
+
+class ExcelCodeTest(unittest.TestCase):
+
+    def test_render_with_frames(self):
+        df = pd.DataFrame([[1, 2], [3, 4], [5, 6]])
+        request = excelcode.GenerationRequest(["book.xlsx"], "Sheet1", TEMPLATE,
+                                              named_ranges={"Table": "A2:B3"})
+        code = excelcode.render(request, dfs={"book.xlsx": df})
+        self.assertIn("table[2][2]", code)
+        self.assertIn("{ 3, 4 },", code)
+        self.assertIn("{ 5, 6 },", code)
+        self.assertNotIn("{ 1, 2 }", code)
+
+    def test_concurrent_renders_share_one_generator(self):
+        # 程式庫介面共用同一個 CodeGenerator，每次生成的狀態都在各自的 context 中
+        template = ("{{ARGUMENT_START:T}}\n// 範圍名稱=Table\nint t[] = { {{RANGE[Table]_LOOP_START}}"
+                    "{{ALL_%s_CUMSUM}}, {{RANGE[Table]_LOOP_END}}};\n{{ARGUMENT_END:T}}")
+
+        def render_case(index):
+            df = pd.DataFrame([[index * 10 + col for col in range(200)] for _ in range(50)])
+            direction = "column" if index % 2 else "row"
+            axis = "ROWS" if index % 2 else "COLUMNS"
+            request = excelcode.GenerationRequest(["book.xlsx"], "Sheet1", template % axis,
+                                                  named_ranges={"Table": f"A1:{'CDEFGH'[index % 6]}{index + 2}"},
+                                                  template_direction=direction)
+            return excelcode.render(request, dfs={"book.xlsx": df})
+
+        serial = [render_case(index) for index in range(12)]
+        self.assertEqual(len(set(serial)), 12)
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            for _ in range(3):
+                self.assertEqual(list(executor.map(render_case, range(12))), serial)
+
+    def test_config_errors(self):
+        with self.assertRaises(excelcode.GenerationError) as caught:
+            excelcode.GenerationRequest.from_config({"excel_files": []})
+        self.assertEqual(caught.exception.stage, "config")
+
+        config = {"excel_files": ["book.xlsx"], "selected_sheet": "Sheet1",
+                  "named_ranges": {"Table": "A1:B2"}, "code_template": TEMPLATE,
+                  "output_format": "unknown"}
+        with self.assertRaises(excelcode.GenerationError):
+            excelcode.GenerationRequest.from_config(config, check_files=False)
+
+    def test_validate_template_without_gui(self):
+        messages = []
+        code_generator = CodeGenerator()
+        self.assertEqual(code_generator.validate_template(TEMPLATE), (True, []))
+        is_valid, unsupported_tags = code_generator.validate_template("{{NOT_A_TAG}}", log_function=messages.append)
+        self.assertFalse(is_valid)
+        self.assertEqual(unsupported_tags, ["NOT_A_TAG"])
+        self.assertEqual(len(messages), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+命令行版本的匯入時間檢查
+
+console 只應匯入生成引擎本身；tkinter、pandas 與 numpy 必須等到實際使用時才載入，
+否則每次執行命令行版本 (例如建置系統中逐一生成多個設定) 都要多花數百毫秒。
+GUI 先顯示主視窗，再於背景匯入 pandas、numpy 與 openpyxl，因此匯入 gui 時也不可載入這些模組。
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 不可在匯入 console 時載入的模組
+HEAVY_MODULES = ("tkinter", "pandas", "numpy")
+
+# 不可在匯入 gui 時載入的模組 (視窗顯示後才在背景匯入)
+GUI_DEFERRED_MODULES = ("pandas", "numpy", "openpyxl")
+
+# 匯入 console 的累計時間上限 (微秒)
+IMPORT_BUDGET_US = 400000
+
+
+def import_times(module):
+    """
+    以 python -X importtime 匯入模組
+
+    Returns:
+        dict: 模組名稱對應累計匯入時間 (微秒)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # 標題行
+        times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def loaded_modules(times, prefixes):
+    """times 中屬於 prefixes 任一套件的模組名稱"""
+    return [name for name in times
+            if any(name == prefix or name.startswith(prefix + ".") for prefix in prefixes)]
+
+
+class ImportBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.times = import_times("console")
+
+    def test_heavy_modules_not_imported(self):
+        self.assertEqual(loaded_modules(self.times, HEAVY_MODULES), [])
+
+    def test_import_time_within_budget(self):
+        self.assertIn("console", self.times)
+        self.assertLess(self.times["console"], IMPORT_BUDGET_US,
+                        f"匯入 console 花費 {self.times['console'] / 1000:.0f} ms，"
+                        f"超過 {IMPORT_BUDGET_US / 1000:.0f} ms")
+
+
+class GuiStartupImportTest(unittest.TestCase):
+
+    def test_gui_defers_data_modules(self):
+        times = import_times("gui")
+        self.assertIn("gui", times)
+        self.assertEqual(loaded_modules(times, GUI_DEFERRED_MODULES), [])
+
+    def test_preload_modules_imports_in_process(self):
+        result = subprocess.run(
+            [sys.executable, "-c",
+             "import sys, data_loader\n"
+             "before = 'pandas' in sys.modules\n"
+             "messages = []\n"
+             "data_loader.preload_modules(messages.append)\n"
+             "print(before, all(name in sys.modules for name in ('pandas', 'numpy', 'openpyxl')))\n"
+             "print(messages[0])"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        )
+        state, message = result.stdout.splitlines()
+        self.assertEqual(state, "False True")
+        self.assertTrue(message.startswith("資料處理模組已在背景載入 ("), message)
+
+
+if __name__ == "__main__":
+    unittest.main()
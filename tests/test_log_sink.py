@@ -0,0 +1,72 @@
+"""
+BatchedLogSink 的批次輸出
+
+兩次更新之間的訊息超過顯示上限時，文字元件只保留最新的行，日誌檔案仍記錄全部訊息。
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_sink import BatchedLogSink  # noqa: E402
+
+
+class FakeRoot:
+    """只記錄排程的 Tk 根視窗替身，由測試手動執行排程的函數"""
+
+    def after(self, delay, callback):
+        return "after"
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class FakeText:
+    """以字串模擬 Tk 文字元件的 insert/index/delete"""
+
+    def __init__(self):
+        self.content = ""
+
+    def config(self, **options):
+        pass
+
+    def insert(self, index, text):
+        self.content += text
+
+    def index(self, index):
+        return f"{self.content.count(chr(10)) + 1}.0"
+
+    def delete(self, start, end):
+        line = int(end.split(".")[0])
+        self.content = "".join(self.content.splitlines(True)[line - 1:])
+
+    def see(self, index):
+        pass
+
+
+class BatchedLogSinkTest(unittest.TestCase):
+
+    def test_overflow_is_spilled_not_dropped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "log.txt")
+            sink = BatchedLogSink(FakeRoot(), max_lines=10, spill_path=spill_path)
+            text = FakeText()
+            sink.attach(text)
+            for index in range(25):
+                sink.write(f"message {index}")
+            sink.flush()
+
+            with open(spill_path, encoding="utf-8") as file:
+                spilled = file.read().splitlines()
+            self.assertEqual(len(spilled), 25)
+            self.assertTrue(spilled[0].endswith("message 0"))
+
+            shown = text.content.splitlines()
+            self.assertLessEqual(len(shown), 10)
+            self.assertTrue(shown[-1].endswith("message 24"))
+
+
+if __name__ == "__main__":
+    unittest.main()
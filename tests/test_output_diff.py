@@ -0,0 +1,98 @@
+"""
+生成結果的結構化差異 (output_diff)
+
+變更必須對應到正確的區塊、標籤與行號，範圍資料的比較必須指出變更的儲存格。
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import output_diff  # noqa: E402
+from output_diff import diff_outputs, diff_range_data, format_changes  # noqa: E402
+
+
+def tables(values_by_name):
+    """以空白行分隔的多個陣列定義"""
+    return "\n\n".join(
+        f"static const int {name}[] = {{\n" + "".join(f"    {value},\n" for value in values) + "};"
+        for name, values in values_by_name.items()
+    ) + "\n"
+
+
+class DiffOutputsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old = {f"table_{index}": list(range(index, index + 5)) for index in range(50)}
+
+    def test_identical_outputs(self):
+        text = tables(self.old)
+        self.assertEqual(diff_outputs(text, text), [])
+        self.assertEqual(format_changes([]), "輸出沒有差異")
+
+    def test_changed_table_reports_block_and_lines(self):
+        new = dict(self.old)
+        new["table_30"] = [30, 31, 99, 33, 34]
+        old_text, new_text = tables(self.old), tables(new)
+        changes = diff_outputs(old_text, new_text)
+        self.assertEqual(len(changes), 1)
+        change = changes[0]
+        self.assertEqual(change.label, "static const int table_30[] = {")
+
+        line_no = new_text.splitlines().index("    99,") + 1
+        self.assertEqual(change.line_changes, [("-", line_no, "    32,"), ("+", line_no, "    99,")])
+        self.assertEqual(change.first_changed_line, line_no)
+        self.assertEqual((change.removed_count, change.added_count), (1, 1))
+        self.assertIn(f"第 {line_no} 行: static const int table_30[] = {{ [-1 +1]", format_changes(changes))
+
+    def test_inserted_and_removed_tables(self):
+        new = {}
+        for name, values in self.old.items():
+            if name != "table_10":
+                new[name] = values
+            if name == "table_20":
+                new["table_extra"] = [1, 2]
+        changes = diff_outputs(tables(self.old), tables(new))
+        self.assertEqual([change.label for change in changes],
+                         ["static const int table_10[] = {", "static const int table_extra[] = {"])
+        self.assertEqual([(change.removed_count, change.added_count) for change in changes], [(8, 0), (0, 5)])
+
+    def test_large_block_skips_line_diff(self):
+        new = dict(self.old)
+        new["table_5"] = list(range(100))
+        with mock.patch.object(output_diff, "MAX_INNER_DIFF_LINES", 20):
+            changes = diff_outputs(tables(self.old), tables(new))
+        self.assertEqual(len(changes), 1)
+        self.assertIsNone(changes[0].line_changes)
+        self.assertEqual((changes[0].removed_count, changes[0].added_count), (8, 103))
+        self.assertIn("(區塊過大，略過逐行比較)", format_changes(changes))
+
+
+class DiffRangeDataTest(unittest.TestCase):
+
+    def test_reports_changed_cells(self):
+        old = pd.DataFrame([[1, np.nan, 3], [4, 5, 6]])
+        new = pd.DataFrame([[1, np.nan, 3], [4, 50, "x"]])
+        changes = diff_range_data({"a.xlsx": old}, {"a.xlsx": new}, [("T", (0, 0, 1, 2))])
+        self.assertEqual(changes, [("a.xlsx", "T", "B2", 5, 50), ("a.xlsx", "T", "C2", 6, "x")])
+
+    def test_shape_change_and_limit(self):
+        old = pd.DataFrame(np.zeros((3, 3)))
+        changes = diff_range_data({"a.xlsx": old}, {"a.xlsx": old.iloc[:2]}, [("T", (0, 0, 2, 2))])
+        self.assertEqual(changes, [("a.xlsx", "T", "(範圍大小)", (3, 3), (2, 3))])
+
+        changes = diff_range_data({"a.xlsx": old}, {"a.xlsx": old + 1}, [("T", (0, 0, 2, 2))], max_cells=4)
+        self.assertEqual([cell for _, _, cell, _, _ in changes], ["A1", "B1", "C1", "A2"])
+
+    def test_skips_unchanged_frames(self):
+        df = pd.DataFrame([[1]])
+        self.assertEqual(diff_range_data({"a.xlsx": df}, {"a.xlsx": df, "b.xlsx": df}, [("T", (0, 0, 0, 0))]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+shards 輸出格式
+
+標頭檔的 extern 宣告必須與分片中的定義一致，非 static 的定義只能出現在一個分片，
+分片數減少時只移除先前生成的分片，同名的手寫檔案不可刪除。
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_writers import write_shards, parse_output, ArrayDefinition, SHARD_MARKER  # noqa: E402
+
+LINKED_CODE = r'''#include <stdint.h>
+typedef struct {
+    int id;
+    const char *label;
+} entry_t;
+enum mode { MODE_A, MODE_B };
+static const int table_0[] = { 1, 2, 3 };
+static const char *names[] = { "a;b}", "c" };
+const entry_t entries[] = { {1, "x,}"}, {2, "y"} };
+int counter;
+int total = 3, limit = 4;
+int lookup(int i);
+int lookup(int i)
+{
+    return table_0[i] + counter;
+}
+uint32_t name_count(void) { return (uint32_t)(sizeof(names) / sizeof(names[0])); }
+'''
+
+MAIN_SOURCE = r'''#include <stdio.h>
+#include "tables.h"
+int main(void)
+{
+    printf("%d %u %d %d\n", lookup(1), name_count(), (int)(sizeof(entries) / sizeof(entries[0])), total + limit);
+    return 0;
+}
+'''
+
+CODE = "".join(f"static const int table_{index}[] = {{ {index}, {index + 1} }};\n" for index in range(4))
+
+
+def extern_declarations(code):
+    return [part.extern_declaration() for part in parse_output(code) if isinstance(part, ArrayDefinition)]
+
+
+class WriteShardsTest(unittest.TestCase):
+
+    def test_extern_dims_skip_literals_and_comments(self):
+        self.assertEqual(extern_declarations('static const char *names[] = { "a;b}", "c" };'),
+                         ["extern const char * names[2];"])
+        self.assertEqual(extern_declarations("static const char marks[] = { '}', ',', '{' };"),
+                         ["extern const char marks[3];"])
+        self.assertEqual(extern_declarations("int t[] = {\n    1,  // a, b\n    2 /* {, */\n};"),
+                         ["extern int t[2];"])
+        self.assertEqual(extern_declarations("static const int m[][2] = { {1, 2}, {3, 4}, };"),
+                         ["extern const int m[2][2];"])
+        self.assertEqual(extern_declarations('static const char s[] = "a,b";'),
+                         ["extern const char s[];"])
+
+    def test_external_definitions_move_to_first_shard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "tables.h")
+            write_shards(LINKED_CODE, output_path, shard_count=2)
+            with open(output_path, encoding='utf-8') as file:
+                header = file.read()
+            self.assertIn("extern int counter;", header)
+            self.assertIn("extern int total, limit;", header)
+            self.assertIn("uint32_t name_count(void);", header)
+            self.assertIn("typedef struct {", header)
+            self.assertNotIn("return", header)
+
+            shards = []
+            for index in range(2):
+                with open(os.path.join(directory, f"tables_{index}.c"), encoding='utf-8') as file:
+                    shards.append(file.read())
+            self.assertIn("int counter;", shards[0])
+            self.assertIn("return table_0[i] + counter;", shards[0])
+            self.assertNotIn("counter", shards[1])
+
+    @unittest.skipUnless(shutil.which("gcc"), "需要 gcc")
+    def test_shards_compile_and_link(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_shards(LINKED_CODE, os.path.join(directory, "tables.h"), shard_count=3)
+            with open(os.path.join(directory, "main.c"), 'w', encoding='utf-8') as file:
+                file.write(MAIN_SOURCE)
+            sources = sorted(name for name in os.listdir(directory) if name.endswith(".c"))
+            subprocess.run(["gcc", "-o", "program"] + sources, cwd=directory, check=True)
+            result = subprocess.run([os.path.join(directory, "program")], capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.split(), ["2", "2", "2", "7"])
+
+    def test_surplus_cleanup_keeps_hand_written_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "tables.h")
+            write_shards(CODE, output_path, shard_count=4)
+            with open(os.path.join(directory, "tables_3.c"), encoding='utf-8') as file:
+                self.assertEqual(file.readline().rstrip("\n"), SHARD_MARKER)
+
+            hand_written = os.path.join(directory, "tables_7.c")
+            with open(hand_written, 'w', encoding='utf-8') as file:
+                file.write("int hand_written(void) { return 0; }\n")
+
+            write_shards(CODE, output_path, shard_count=2)
+            self.assertFalse(os.path.exists(os.path.join(directory, "tables_2.c")))
+            self.assertFalse(os.path.exists(os.path.join(directory, "tables_3.c")))
+            self.assertTrue(os.path.exists(hand_written))
+
+
+if __name__ == "__main__":
+    unittest.main()
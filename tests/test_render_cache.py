@@ -0,0 +1,78 @@
+"""
+渲染快取的失效檢查
+
+快取鍵必須涵蓋輸出實際讀取的所有資料；資料變更後不可再使用先前的結果。
+"""
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excelcode  # noqa: E402
+from render_cache import RenderCache  # noqa: E402
+
+# 參數區塊只列出 Listed，Weights 只由區塊內的衍生表格標記 (alias 表) 使用
+TEMPLATE = """{{ARGUMENT_START:table}}
+// 參數定義：範圍名稱=Listed
+{{FILES_LOOP_START}}
+static const int listed_{{FILE_INDEX}}[] = { {{RANGE[Listed]_VALUE}} };
+static const unsigned int weight_total_{{FILE_INDEX}}[] = { {{RANGE[Weights]_ALIAS_TOTAL}} };
+{{FILES_LOOP_END}}
+{{ARGUMENT_END:table}}
+"""
+
+
+class RenderCacheTest(unittest.TestCase):
+
+    def render(self, df, render_cache):
+        request = excelcode.GenerationRequest(
+            ["book.xlsx"], "Sheet1", TEMPLATE,
+            named_ranges={"Listed": "A1:A1", "Weights": "A3:C3"},
+        )
+        return excelcode.render(request, dfs={"book.xlsx": df}, render_cache=render_cache)
+
+    def test_derived_tag_range_change_invalidates_argument_fragment(self):
+        df = pd.DataFrame([[7, 0, 0], [0, 0, 0], [1, 2, 3]])
+        render_cache = RenderCache()
+        first = self.render(df, render_cache)
+        self.assertIn("{ 6 }", first)
+
+        # 只修改衍生表格標記使用的儲存格
+        changed = df.copy()
+        changed.iat[2, 2] = 10
+        second = self.render(changed, render_cache)
+        self.assertIn("{ 13 }", second)
+        self.assertNotEqual(first, second)
+
+    def test_fragment_only_cache(self):
+        df = pd.DataFrame([[7, 0, 0], [0, 0, 0], [1, 2, 3]])
+        render_cache = RenderCache(cache_outputs=False)
+        code = self.render(df, render_cache)
+        # 只快取參數區塊的片段，不快取整份輸出
+        self.assertEqual(render_cache.usage()[1], 1)
+        self.assertEqual(self.render(df, render_cache), code)
+        self.assertEqual(render_cache.hits, 1)
+
+    def test_memory_byte_limit(self):
+        render_cache = RenderCache(max_memory_bytes=3000)
+        for index in range(4):
+            render_cache.put(f"key{index}", str(index) * 1000)
+        memory_bytes, entries = render_cache.usage()
+        self.assertLessEqual(memory_bytes, 3000)
+        self.assertEqual(entries, 2)
+        self.assertIsNone(render_cache.get("key0"))
+        self.assertEqual(render_cache.get("key3"), "3" * 1000)
+
+        # 單一項目超過上限時不放入記憶體
+        render_cache.put("large", "x" * 5000)
+        self.assertIsNone(render_cache.get("large"))
+
+        self.assertEqual(render_cache.clear_memory(), memory_bytes)
+        self.assertEqual(render_cache.usage(), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
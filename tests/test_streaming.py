@@ -0,0 +1,144 @@
+"""
+串流模式 (excelcode.render(stream=True)) 的檔案讀取順序、暫存釋放與樣板檢查
+
+以實際的 .xlsx 檔案生成，並計算 load_sheet 的呼叫次數確認每個檔案只讀取一次。
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+import excelcode  # noqa: E402
+from code_generator import GenerationContext  # noqa: E402
+from render_cache import RenderCache  # noqa: E402
+
+TEMPLATE = """{{ARGUMENT_START:Left}}
+// 範圍名稱=Left
+int left[{{FILE_COUNT}}][2] = {
+{{FILES_LOOP_START}}
+    { {{RANGE[Left]_LOOP_START}}{{ALL_COLUMNS}}, {{RANGE[Left]_LOOP_END}}},
+{{FILES_LOOP_END}}
+};
+{{ARGUMENT_END:Left}}
+{{ARGUMENT_START:Right}}
+// 範圍名稱=Right
+int right[] = {
+{{FILES_LOOP_START}}
+    /* {{FILE_NAME}} */ {{RANGE[Right]_LOOP_START}}{{ALL_COLUMNS}}, {{RANGE[Right]_LOOP_END}}
+{{FILES_LOOP_END}}
+};
+{{ARGUMENT_END:Right}}
+{{ARGUMENT_START:First}}
+// 範圍名稱=Left
+int first[] = { {{RANGE[Left]_LOOP_START}}{{ALL_COLUMNS}}, {{RANGE[Left]_LOOP_END}}};
+{{ARGUMENT_END:First}}
+"""
+
+FILE_COUNT = 4
+
+
+class StreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.excel_files = []
+        for index in range(FILE_COUNT):
+            file_path = os.path.join(self.directory, f"book{index}.xlsx")
+            pd.DataFrame([[index, index + 1, index + 2],
+                          [index + 10, index + 11, index + 12]]).to_excel(file_path, header=False, index=False)
+            self.excel_files.append(file_path)
+        self.loaded = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_request(self, template=TEMPLATE):
+        return excelcode.GenerationRequest.from_config({
+            "excel_files": self.excel_files,
+            "selected_sheet": "Sheet1",
+            "named_ranges": {"Left": "A1:A2", "Right": "B2:C2"},
+            "code_template": template,
+        })
+
+    def counting_load_sheet(self):
+        load_sheet = data_loader.load_sheet
+
+        def counting(file_path, sheet_name):
+            self.loaded.append(os.path.basename(file_path))
+            return load_sheet(file_path, sheet_name)
+        return mock.patch.object(data_loader, "load_sheet", counting)
+
+    def test_each_file_loaded_once_for_several_blocks(self):
+        request = self.make_request()
+        with self.counting_load_sheet():
+            code = excelcode.render(request, stream=True)
+        self.assertEqual(self.loaded, [f"book{index}.xlsx" for index in range(FILE_COUNT)])
+
+        self.assertEqual(code, excelcode.render(request))
+        self.assertIn("    { 1,11,},", code)
+        self.assertIn("    { 3,13,}\n", code)
+        self.assertIn("/* book2.xlsx */ 13, 14,", code)
+        self.assertIn("int first[] = { 0,10,};", code)
+
+    def test_stream_uses_per_file_fragment_cache(self):
+        request = self.make_request()
+        render_cache = RenderCache()
+        messages = []
+        with self.counting_load_sheet():
+            first = excelcode.render(request, render_cache=render_cache, stream=True,
+                                     log_function=messages.append)
+            second = excelcode.render(request, render_cache=render_cache, stream=True)
+
+        # 沒有整份輸出的快取: 兩個檔案循環區塊各 4 個檔案片段，加上只用第一個檔案的區塊
+        self.assertEqual(render_cache.usage()[1], 2 * FILE_COUNT + 1)
+        self.assertEqual(render_cache.hits, 2 * FILE_COUNT + 1)
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.loaded), 2 * FILE_COUNT)
+        self.assertIn("串流模式: 不使用整份輸出的渲染快取", messages)
+
+    def test_released_files_drop_memo_entries(self):
+        template = TEMPLATE.replace("{{FILES_LOOP_START}}\n    /*",
+                                    "{{FILES_LOOP_START}}\n    /* {{RANGE[Left]_ALIAS_TOTAL}} */ /*")
+        release_file = GenerationContext.release_file
+        released = []
+
+        def checked_release(context, file_path):
+            release_file(context, file_path)
+            released.append(os.path.basename(file_path))
+            for memo in (context.range_hash_memo, context.numeric_memo, context.table_memo):
+                self.assertFalse([key for key in memo if isinstance(key, tuple) and file_path in key])
+            self.assertNotIn("cumulative", context.numeric_memo)
+
+        with mock.patch.object(GenerationContext, "release_file", checked_release):
+            code = excelcode.render(self.make_request(template), stream=True)
+        self.assertEqual(released, [f"book{index}.xlsx" for index in range(FILE_COUNT - 1)])
+        self.assertIn("/* 3, 13 */ /* book3.xlsx */ 14, 15", code)
+
+    def test_refuses_template_read_after_all_files(self):
+        template = "{{DEDUP_START:Table}}int {{DEDUP_NAME}};\n{{DEDUP_END:Table}}" + TEMPLATE
+        with self.counting_load_sheet():
+            with self.assertRaises(excelcode.GenerationError) as caught:
+                excelcode.render(self.make_request(template), stream=True)
+        self.assertEqual(caught.exception.stage, "config")
+        self.assertEqual(caught.exception.details["passes"], ["DEDUP", "ARGUMENT"])
+        self.assertEqual(self.loaded, [])
+
+    def test_refuses_reloading_released_file(self):
+        # 沒有範圍名稱= 的區塊，範圍迴圈留到所有檔案讀取之後才以第一個檔案處理
+        template = TEMPLATE.replace("// 範圍名稱=Left\nint first", "int first")
+        with self.assertRaises(excelcode.GenerationError) as caught:
+            excelcode.render(self.make_request(template), stream=True)
+        self.assertEqual(caught.exception.stage, "render")
+        self.assertEqual(caught.exception.details["file_path"], self.excel_files[0])
+        self.assertIn("int first[] = { 0,10,};", excelcode.render(self.make_request(template)))
+
+
+if __name__ == "__main__":
+    unittest.main()
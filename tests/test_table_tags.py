@@ -0,0 +1,281 @@
+"""
+範圍資料衍生標記的輸出
+
+以程式庫介面直接由資料框生成，檢查型別推斷、去除重複區塊、累積和、alias、稀疏格式、資料排列與定點數等標記的實際輸出。
+"""
+import ast
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excelcode  # noqa: E402
+
+
+def render(df, template, named_ranges, template_direction="row", messages=None):
+    return render_files([df], template, named_ranges, template_direction, messages)
+
+
+def render_files(frames, template, named_ranges, template_direction="row", messages=None):
+    """以多個資料框 (依序為 book0.xlsx、book1.xlsx ...) 生成"""
+    excel_files = [f"book{index}.xlsx" for index in range(len(frames))]
+    request = excelcode.GenerationRequest(excel_files, "Sheet1", template, named_ranges=named_ranges,
+                                          template_direction=template_direction)
+    log_function = messages.append if messages is not None else None
+    return excelcode.render(request, dfs=dict(zip(excel_files, frames)), log_function=log_function)
+
+
+class CTypeTagTest(unittest.TestCase):
+
+    def test_infers_narrowest_type_across_files(self):
+        small = pd.DataFrame([[1, 2], [3, 200]])
+        negative = pd.DataFrame([[-1, 2], [3, 4]])
+        large = pd.DataFrame([[1, 70000], [3, 4]])
+        template = "{{RANGE[W]_CTYPE}} | {{FILES_CTYPE}}"
+        self.assertEqual(render_files([small], template, {"W": "A1:B2"}), "uint8_t | uint8_t")
+        self.assertEqual(render_files([negative], template, {"W": "A1:B2"}), "int8_t | int8_t")
+        self.assertEqual(render_files([small, negative], template, {"W": "A1:B2"}), "int16_t | int16_t")
+        self.assertEqual(render_files([small, large], template, {"W": "A1:B2"}), "uint32_t | uint32_t")
+        self.assertEqual(render_files([pd.DataFrame([[1, 2.5]])], template, {"W": "A1:B1"}), "float | float")
+
+    def test_text_cells_are_not_inferred(self):
+        df = pd.DataFrame([[1, ""], ["x", 4]])
+        self.assertEqual(render(df, "{{RANGE[W]_CTYPE}}", {"W": "A1:B2"}), "uint8_t")
+
+    def test_declared_type_overflow_names_the_cell(self):
+        small = pd.DataFrame([[1, 2], [3, 200]])
+        large = pd.DataFrame([[1, 70000], [3, 4]])
+        self.assertEqual(render(small, "{{RANGE[W]_CTYPE:uint8_t}}", {"W": "A1:B2"}), "uint8_t")
+        with self.assertRaises(excelcode.GenerationError) as caught:
+            render_files([small, large], "{{RANGE[W]_CTYPE:uint16_t}}", {"W": "A1:B2"})
+        self.assertIn("book1.xlsx 的 B1 = 70000", str(caught.exception))
+        with self.assertRaises(excelcode.GenerationError) as caught:
+            render(pd.DataFrame([[1, 2.5]]), "{{RANGE[W]_CTYPE:int}}", {"W": "A1:B1"})
+        self.assertIn("B1 = 2.5", str(caught.exception))
+
+
+class DedupBlockTest(unittest.TestCase):
+
+    def test_identical_files_share_one_table(self):
+        first = pd.DataFrame([[1, 2], [3, 4]])
+        second = pd.DataFrame([[5, 6], [7, 8]])
+        template = (
+            "{{DEDUP_START:w}}static const int {{DEDUP_NAME}}[] = { "
+            "{{RANGE[W]_LOOP_START}}{{ALL_COLUMNS}}, {{RANGE[W]_LOOP_END}}};\n{{DEDUP_END:w}}"
+            "static const int *w[{{FILE_COUNT}}] = { {{DEDUP_NAME_LIST:w}} }; "
+            "/* {{DEDUP_INDEX_LIST:w}} | {{DEDUP_COUNT:w}} */"
+        )
+        messages = []
+        code = render_files([first, second, first.copy(), second.copy()], template, {"W": "A1:B2"},
+                            messages=messages)
+        self.assertEqual(code, (
+            "static const int w_0[] = { 1, 2,3, 4,};\n"
+            "static const int w_1[] = { 5, 6,7, 8,};\n"
+            "static const int *w[4] = { w_0, w_1, w_0, w_1 }; /* 0, 1, 0, 1 | 2 */"
+        ))
+        self.assertIn("去除重複區塊 w: 4 個實例中有 2 個不重複", messages)
+
+    def test_dedup_per_selected_range(self):
+        template = ("{{DEDUP_START:r}}int {{DEDUP_NAME}}[] = { {{RANGE_LOOP_START}}{{ALL_COLUMNS}}, "
+                    "{{RANGE_LOOP_END}}};\n{{DEDUP_END:r}}{{DEDUP_INDEX_LIST:r}}")
+        code = render_files([pd.DataFrame([[1, 2], [3, 4]]), pd.DataFrame([[3, 4], [1, 2]])], template,
+                            {"X": "A1:B1", "Y": "A2:B2"})
+        self.assertEqual(code, "int r_0[] = { 1, 2,};\nint r_1[] = { 3, 4,};\n0, 1, 1, 0")
+
+
+class CumulativeTagTest(unittest.TestCase):
+
+    def test_row_cumulative_sums(self):
+        df = pd.DataFrame([[1, 2, 3, 4], [5, "x", 7.5, 8], [0, 0, 0, 1]])
+        messages = []
+        code = render(df, "{{LOOP_START}}{ {{ALL_COLUMNS_CUMSUM}} } /* {{ROW_TOTAL}} */\n{{LOOP_END}}",
+                      {"Weights": "A1:D3"}, messages=messages)
+        self.assertIn("{ 1, 3, 6, 10 } /* 10 */", code)
+        self.assertIn("{ 5, 5, 12.5, 20.5 } /* 20.5 */", code)
+        self.assertIn("{ 0, 0, 0, 1 } /* 1 */", code)
+        warnings = [message for message in messages if "非數值" in message]
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("行 1", warnings[0])
+
+    def test_column_cumulative_sums(self):
+        df = pd.DataFrame([[1, 2], [3, 4], [5, 6]])
+        code = render(df, "{{LOOP_START}}{ {{ALL_ROWS_CUMSUM}} } /* {{COL_TOTAL}} */\n{{LOOP_END}}",
+                      {"Weights": "A1:B3"}, template_direction="column")
+        self.assertIn("{ 1, 4, 9 } /* 9 */", code)
+        self.assertIn("{ 2, 6, 12 } /* 12 */", code)
+
+
+def parse_rows(text):
+    """將 '{ 1, 2 },\n{ 3, 4 }' 形式的多行初始化內容轉為整數列表"""
+    return [[int(value) for value in line.strip().strip(",").strip("{} ").split(",")]
+            for line in text.strip().splitlines()]
+
+
+class AliasTagTest(unittest.TestCase):
+
+    TEMPLATE = ("{{RANGE[W]_ALIAS_PROB}}\n---\n{{RANGE[W]_ALIAS_INDEX}}\n---\n"
+                "{{RANGE[W]_ALIAS_TOTAL}}|{{RANGE[W]_ALIAS_SIZE}}|{{RANGE[W]_ALIAS_COUNT}}")
+
+    def render_tables(self, df, template_direction="row"):
+        prob, alias, meta = render(df, self.TEMPLATE, {"W": "A1:D3"}, template_direction).split("\n---\n")
+        totals, size, count = meta.split("|")
+        return parse_rows(prob), parse_rows(alias), [int(total) for total in totals.split(",")], int(size), int(count)
+
+    def assert_exact(self, weights, prob, alias, total):
+        # 項目 i 被選中的次數 (乘上 n * W) 必須恰為 n * w_i
+        item_count = len(weights)
+        for item in range(item_count):
+            hits = sum((prob[slot] if slot == item else 0) + (total - prob[slot] if alias[slot] == item else 0)
+                       for slot in range(item_count))
+            self.assertEqual(hits, item_count * weights[item])
+
+    def test_alias_tables_are_exact(self):
+        df = pd.DataFrame([[1, 1, 2, 0], [5, 0, 0, 3], [7, 11, 13, 17]])
+        prob, alias, totals, size, count = self.render_tables(df)
+        self.assertEqual((totals, size, count), ([4, 8, 48], 4, 3))
+        for row_idx, weights in enumerate(df.values.tolist()):
+            self.assert_exact(weights, prob[row_idx], alias[row_idx], totals[row_idx])
+
+    def test_column_mode_uses_columns_as_distributions(self):
+        df = pd.DataFrame([[1, 1, 2, 0], [5, 0, 0, 3], [7, 11, 13, 17]])
+        prob, alias, totals, size, count = self.render_tables(df, template_direction="column")
+        self.assertEqual((totals, size, count), ([13, 12, 15, 20], 3, 4))
+        for col_idx, weights in enumerate(df.T.values.tolist()):
+            self.assert_exact(weights, prob[col_idx], alias[col_idx], totals[col_idx])
+
+    def test_rejects_text_cells(self):
+        with self.assertRaises(excelcode.GenerationError) as caught:
+            render(pd.DataFrame([[1, "x"]]), "{{RANGE[W]_ALIAS_PROB}}", {"W": "A1:B1"})
+        self.assertIn("無法建立 alias 表", str(caught.exception))
+
+
+def split_items(text):
+    """將逗號分隔 (可跨行) 的初始化內容轉為字串列表"""
+    return [item.strip() for item in text.replace("\n", "").split(",") if item.strip()]
+
+
+class CsrTagTest(unittest.TestCase):
+
+    TEMPLATE = ("{{RANGE[S]_CSR_DEFINES:SYM}}\n---\n{{RANGE[S]_CSR_VALUES}}\n---\n"
+                "{{RANGE[S]_CSR_COL_INDEX}}\n---\n{{RANGE[S]_CSR_ROW_PTR}}\n---\n{{RANGE[S]_NNZ}}")
+
+    def to_dense(self, code):
+        defines, values, cols, row_ptr, nnz = code.split("\n---\n")
+        values = split_items(values)
+        cols = [int(col) for col in split_items(cols)]
+        row_ptr = [int(ptr) for ptr in split_items(row_ptr)]
+        macros = dict(line.split()[1:] for line in defines.splitlines())
+        dense = [["0"] * int(macros["SYM_COLS"]) for _ in range(int(macros["SYM_ROWS"]))]
+        for row_idx in range(len(row_ptr) - 1):
+            for position in range(row_ptr[row_idx], row_ptr[row_idx + 1]):
+                dense[row_idx][cols[position]] = values[position]
+        return dense, int(nnz), int(macros["SYM_NNZ"])
+
+    def test_csr_rebuilds_the_range(self):
+        df = pd.DataFrame([[0, 0, 3, 0], [0, 0, 0, 0], [1, "A", 0, 0]])
+        dense, nnz, nnz_macro = self.to_dense(render(df, self.TEMPLATE, {"S": "A1:D3"}))
+        self.assertEqual(dense, [["0", "0", "3", "0"], ["0", "0", "0", "0"], ["1", "A", "0", "0"]])
+        self.assertEqual((nnz, nnz_macro), (3, 3))
+
+        dense, nnz, _ = self.to_dense(render(df, self.TEMPLATE, {"S": "A1:D3"}, template_direction="column"))
+        self.assertEqual(dense, [["0", "0", "1"], ["0", "0", "A"], ["3", "0", "0"], ["0", "0", "0"]])
+        self.assertEqual(nnz, 3)
+
+    def test_all_zero_range_pads_arrays(self):
+        code = render(pd.DataFrame([[0, 0]]), self.TEMPLATE, {"S": "A1:B1"})
+        self.assertEqual(code.split("\n---\n")[1:], ["0", "0", "0, 0", "0"])
+        self.assertIn("#define SYM_NNZ 1", code)
+
+    def test_sparse_or_dense_block_selection(self):
+        template = ("{{RANGE[S]_SPARSE_START}}sparse{{RANGE[S]_SPARSE_END}}"
+                    "{{RANGE[S]_DENSE_START}}dense{{RANGE[S]_DENSE_END}}")
+        self.assertEqual(render(pd.DataFrame([[0, 0, 3], [0, 1, 0]]), template, {"S": "A1:C2"}), "sparse")
+        self.assertEqual(render(pd.DataFrame([[1, 2, 0]]), template, {"S": "A1:C1"}), "dense")
+        self.assertEqual(render(pd.DataFrame([[1, 2, 0]]), template.replace("SPARSE_START}}", "SPARSE_START:0.7}}"),
+                                {"S": "A1:C1"}), "sparse")
+
+
+def parse_initializer(text):
+    """將巢狀的 C 初始化列表轉為 Python 列表"""
+    return ast.literal_eval(text.replace("{", "[").replace("}", "]"))
+
+
+class LayoutTagTest(unittest.TestCase):
+
+    FRAMES = [pd.DataFrame([[1, 2], [3, 4], [5, 6], [7, 8]]),
+              pd.DataFrame([[11, 12], [13, 14], [15, 16], [17, 18]])]
+    NAMED_RANGES = {"X": "A1:B2", "Y": "A3:B4"}
+
+    def test_axis_orders_transpose_the_tensor(self):
+        tensor = np.array([frame.values.reshape(2, 2, 2) for frame in self.FRAMES])  # [檔案][範圍][行][欄]
+        code = render_files(self.FRAMES, "{{LAYOUT_DATA:FILE,RANGE,ROW,COL}}", self.NAMED_RANGES)
+        self.assertEqual(parse_initializer(code), tensor.tolist())
+        code = render_files(self.FRAMES, "{{LAYOUT_DATA:COL,FILE,RANGE,ROW}}", self.NAMED_RANGES)
+        self.assertEqual(parse_initializer(code), tensor.transpose(3, 0, 1, 2).tolist())
+
+    def test_smaller_ranges_are_padded_with_zero(self):
+        code = render_files(self.FRAMES[:1], "{{LAYOUT_DATA:RANGE,ROW,COL,FILE}}", {"X": "A1:B2", "Y": "A3:A3"})
+        self.assertEqual(parse_initializer(code), [[[[1], [2]], [[3], [4]]], [[[5], [0]], [[0], [0]]]])
+
+    def test_soa_blocks_and_defines(self):
+        template = ("{{LAYOUT_DEFINES:PAY}}\n{{SOA_START}}int c{{SOA_COL}}[] = "
+                    "{{LAYOUT_DATA:FILE,RANGE,ROW}};\n{{SOA_END}}")
+        code = render_files(self.FRAMES, template, self.NAMED_RANGES)
+        self.assertIn("#define PAY_FILE_COUNT 2\n#define PAY_RANGE_COUNT 2\n#define PAY_ROW_COUNT 2\n"
+                      "#define PAY_COL_COUNT 2\n", code)
+        self.assertIn("#define PAY_SOA_INDEX(file, range, row) "
+                      "((((file) * PAY_RANGE_COUNT) + (range)) * PAY_ROW_COUNT + (row))", code)
+        columns = [parse_initializer(block.split(" = ", 1)[1].rstrip(";\n"))
+                   for block in code.split("int c")[1:]]
+        self.assertEqual(columns, [[[[1, 3], [5, 7]], [[11, 13], [15, 17]]],
+                                   [[[2, 4], [6, 8]], [[12, 14], [16, 18]]]])
+
+    def test_rejects_invalid_axis_order(self):
+        for axes in ("FILE,ROW", "FILE,FILE,ROW,COL"):
+            with self.assertRaises(excelcode.GenerationError) as caught:
+                render_files(self.FRAMES, f"{{{{LAYOUT_DATA:{axes}}}}}", self.NAMED_RANGES)
+            self.assertIn("軸順序必須包含且只包含 FILE, RANGE, ROW, COL", str(caught.exception))
+
+
+class FixedPointTagTest(unittest.TestCase):
+
+    DATA = pd.DataFrame([[0.5, 1.25], [-0.1, 2]])
+
+    def test_binary_and_decimal_scales(self):
+        messages = []
+        code = render(self.DATA, "{{RANGE[M]_FIXED_DEFINES:MUL:16}}\n{{RANGE[M]_FIXED:16}}\n{{RANGE[M]_FIXED:D2}}",
+                      {"M": "A1:B2"}, messages=messages)
+        self.assertEqual(code, (
+            "#define MUL_SCALE 65536\n#define MUL_FRAC_BITS 16\n"
+            "{ 32768, 81920 },\n{ -6554, 131072 }\n"
+            "{ 50, 125 },\n{ -10, 200 }"
+        ))
+        self.assertIn("範圍 M 已轉為定點數 (比例 65536，最大捨入誤差 6.10352e-06，book0.xlsx)", messages)
+
+    def test_rounds_half_away_from_zero(self):
+        code = render(pd.DataFrame([[2.5, -2.5, 0.5, -0.1]]), "{{RANGE[M]_FIXED:0}}", {"M": "A1:D1"})
+        self.assertEqual(code, "{ 3, -3, 1, 0 }")
+
+    def test_column_mode_and_loop_tags(self):
+        code = render(self.DATA, "{{RANGE[M]_FIXED:16}}", {"M": "A1:B2"}, template_direction="column")
+        self.assertEqual(code, "{ 32768, -6554 },\n{ 81920, 131072 }")
+        code = render(self.DATA, "{{LOOP_START}}{ {{ALL_COLUMNS_FIXED:D2}} }\n{{LOOP_END}}", {"M": "A1:B2"})
+        self.assertIn("{ 50, 125 }", code)
+        self.assertIn("{ -10, 200 }", code)
+
+    def test_invalid_scale_and_text_cells(self):
+        for scale in ("abc", "63"):
+            with self.assertRaises(excelcode.GenerationError) as caught:
+                render(self.DATA, f"{{{{RANGE[M]_FIXED:{scale}}}}}", {"M": "A1:B2"})
+            self.assertIn("無效的定點數比例", str(caught.exception))
+        with self.assertRaises(excelcode.GenerationError) as caught:
+            render(pd.DataFrame([[1, "x"]]), "{{RANGE[M]_FIXED:16}}", {"M": "A1:B1"})
+        self.assertIn("非數值儲存格", str(caught.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
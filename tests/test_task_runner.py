@@ -0,0 +1,94 @@
+"""
+TaskRunner 的回呼排程與取消
+
+背景執行緒不可呼叫 Tk 函數；回呼由主執行緒輪詢佇列後執行，
+取消或被取代的工作不呼叫 on_success，但一定呼叫 on_finally。
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_runner import TaskRunner  # noqa: E402
+
+
+class FakeRoot:
+    """記錄呼叫執行緒的 Tk 根視窗替身，排程的函數由測試手動執行"""
+
+    def __init__(self):
+        self.caller_threads = set()
+
+    def after(self, delay, callback):
+        self.caller_threads.add(threading.current_thread())
+        return "after"
+
+    def after_cancel(self, after_id):
+        self.caller_threads.add(threading.current_thread())
+
+
+class TaskRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.runner = TaskRunner(self.root)
+        self.addCleanup(self.runner.shutdown)
+
+    def poll_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "等待回呼逾時")
+            self.runner._poll()
+            time.sleep(0.01)
+
+    def test_callbacks_run_on_polling_thread(self):
+        events = []
+        self.runner.submit(lambda token: 42, on_success=events.append,
+                           on_finally=lambda: events.append("finally"))
+        self.poll_until(lambda: "finally" in events)
+        self.assertEqual(events, [42, "finally"])
+        self.assertFalse(self.runner.is_busy)
+        self.assertEqual(self.root.caller_threads, {threading.current_thread()})
+
+    def test_cancelled_task_still_runs_on_finally(self):
+        events = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def task(token):
+            started.set()
+            release.wait(5)
+            token.check()
+            return "done"
+
+        self.runner.submit(task, on_success=events.append, on_finally=lambda: events.append("finally"))
+        started.wait(5)
+        self.runner.cancel()
+        release.set()
+        self.poll_until(lambda: "finally" in events)
+        self.assertEqual(events, ["finally"])
+
+    def test_superseded_task_runs_on_finally(self):
+        events = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_task(token):
+            started.set()
+            release.wait(5)
+            return "old"
+
+        self.runner.submit(slow_task, on_success=events.append, on_finally=lambda: events.append("old finally"))
+        started.wait(5)
+        self.runner.submit(lambda token: "new", on_success=events.append,
+                           on_finally=lambda: events.append("new finally"))
+        release.set()
+        self.poll_until(lambda: "new finally" in events)
+        self.assertEqual(events, ["old finally", "new", "new finally"])
+        self.assertEqual(self.root.caller_threads, {threading.current_thread()})
+
+
+if __name__ == "__main__":
+    unittest.main()
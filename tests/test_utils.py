@@ -0,0 +1,67 @@
+"""
+write_if_changed 的寫入行為
+
+內容相同時不重寫檔案；新檔案的權限與一般 open() 建立的相同，既有檔案保留原權限。
+"""
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import write_if_changed  # noqa: E402
+
+
+class WriteIfChangedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_unchanged_content_is_not_rewritten(self):
+        path = self.path("out.h")
+        self.assertTrue(write_if_changed(path, "int a;\n"))
+        mtime = os.stat(path).st_mtime_ns
+        self.assertFalse(write_if_changed(path, "int a;\n"))
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        self.assertTrue(write_if_changed(path, "int b;\n"))
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(file.read(), "int b;\n")
+
+    def test_bytes_content(self):
+        path = self.path("out.bin")
+        self.assertTrue(write_if_changed(path, b"\x00\x01\n"))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b"\x00\x01\n")
+        self.assertFalse(write_if_changed(path, b"\x00\x01\n"))
+
+    def test_new_file_mode_matches_open(self):
+        reference = self.path("reference")
+        with open(reference, 'w'):
+            pass
+        path = self.path("out.h")
+        write_if_changed(path, "int a;\n")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), stat.S_IMODE(os.stat(reference).st_mode))
+
+    @unittest.skipIf(os.name == 'nt', "POSIX 權限")
+    def test_existing_file_mode_is_kept(self):
+        path = self.path("out.h")
+        write_if_changed(path, "int a;\n")
+        os.chmod(path, 0o640)
+        write_if_changed(path, "int b;\n")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o640)
+
+    def test_no_temp_files_left(self):
+        path = self.path("out.h")
+        write_if_changed(path, "int a;\n")
+        write_if_changed(path, "int b;\n")
+        self.assertEqual(os.listdir(self.directory.name), ["out.h"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import re
-import pandas as pd
 import json
 import os
+import hashlib
+import secrets
 
 def excel_notation_to_index(notation, gui=None):
     """
@@ -31,6 +32,15 @@ def excel_notation_to_index(notation, gui=None):
     
     return row_idx, col_idx
 
+def get_column_letter(col_idx):
+    """將數字欄索引轉換為 Excel 欄標記 (例如: 0->A, 1->B, 26->AA)"""
+    result = ""
+    temp = col_idx + 1  # 轉為 1-based 索引
+    while temp > 0:
+        temp, remainder = divmod(temp - 1, 26)
+        result = chr(65 + remainder) + result
+    return result
+
 def format_cell_value(value, add_quotes=False):
     """
     Format cell value to appropriate string format
@@ -43,6 +53,7 @@ def format_cell_value(value, add_quotes=False):
         value: The value to format
         add_quotes: Whether to add quotes for text values, default is False
     """
+    import pandas as pd
     if pd.isna(value):
         return "0"
     elif isinstance(value, (int, float)):
@@ -80,6 +91,73 @@ def replace_template_placeholders(template, replacements):
         result = result.replace(f"{{{{{placeholder}}}}}", str(value))
     return result
 
+def create_temp_file(directory):
+    """
+    在指定目錄建立暫存檔
+
+    以 0o666 建立並由系統套用 umask，權限與一般 open() 建立的檔案相同，
+    不需要讀取或更改整個程序的 umask。
+
+    Returns:
+        tuple: (檔案描述元, 暫存檔路徑)
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        temp_path = os.path.join(directory, f".excelcode-{secrets.token_hex(8)}.tmp")
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+def write_if_changed(file_path, content, encoding='utf-8', chunk_size=1024 * 1024):
+    """
+    只在內容變更時寫入檔案，避免更新修改時間而觸發下游重新編譯
+    
+    先比較檔案大小，大小相同時再以串流方式比較內容雜湊；
+    內容不同時透過暫存檔與 rename 以原子方式寫入。
+    換行字元的處理與文字模式 open(..., 'w') 相同；bytes 內容則原樣寫入。
+    
+    Args:
+        file_path (str): 輸出檔案路徑
+        content (str | bytes): 要寫入的內容
+        encoding (str): 檔案編碼
+        chunk_size (int): 串流比較時每次讀取的位元組數
+        
+    Returns:
+        bool: 檔案有變更 (已寫入) 返回 True，內容相同 (未寫入) 返回 False
+    """
+    if isinstance(content, bytes):
+        data = content
+    else:
+        if os.linesep != "\n":
+            content = content.replace("\n", os.linesep)
+        data = content.encode(encoding)
+    
+    # 先比較大小，再以串流雜湊比較內容
+    if os.path.isfile(file_path) and os.path.getsize(file_path) == len(data):
+        existing_hash = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                existing_hash.update(chunk)
+        if existing_hash.digest() == hashlib.sha256(data).digest():
+            return False
+    
+    # 寫入同一目錄下的暫存檔後再取代，確保輸出檔案不會處於寫了一半的狀態
+    output_dir = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = create_temp_file(output_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # 保留原檔案的權限設定；新檔案維持建立時的預設權限
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
 def save_config(config_data, file_path, gui=None):
     """
     將設定資料儲存為 JSON 檔案